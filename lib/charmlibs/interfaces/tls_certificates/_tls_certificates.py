@@ -0,0 +1,3765 @@
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Source code of ``tls_certificates_interface.tls_certificates`` v4.22."""
+
+from __future__ import annotations
+
+import ipaddress
+import json
+import logging
+import subprocess
+import uuid
+import warnings
+from contextlib import suppress
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta, timezone
+from enum import Enum
+from typing import (
+    TYPE_CHECKING,
+    Literal,
+    TypeAlias,
+)
+
+import pydantic
+from cryptography import x509
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec, rsa
+from cryptography.x509.oid import ExtensionOID, NameOID
+from ops import (
+    BoundEvent,
+    CharmBase,
+    CharmEvents,
+    RelationBrokenEvent,
+    Secret,
+    SecretExpiredEvent,
+    SecretRemoveEvent,
+)
+from ops.framework import EventBase, EventSource, Handle, Object
+from ops.model import (
+    Application,
+    ModelError,
+    Relation,
+    SecretNotFoundError,
+    TooManyRelatedAppsError,
+    Unit,
+)
+
+from . import _backwards_compatibility
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Collection, Mapping, MutableMapping
+
+# legacy Charmhub-hosted lib ID, used at runtime in this lib for labels
+LIBID = "afd8c2bccf834997afce12c2706d2ede"
+
+
+IS_PYDANTIC_V1 = int(pydantic.version.VERSION.split(".")[0]) < 2
+
+logger = logging.getLogger(__name__)
+
+NESTED_JSON_KEY = "owasp_event"
+
+CertificateIssuerPrivateKeyTypes: TypeAlias = rsa.RSAPrivateKey | ec.EllipticCurvePrivateKey
+
+
+@dataclass
+class _OWASPLogEvent:
+    """OWASP-compliant log event."""
+
+    datetime: str
+    event: str
+    level: str
+    description: str
+    type: str = "security"
+    labels: dict[str, str] = field(default_factory=dict[str, str])
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), ensure_ascii=False)
+
+    def to_dict(self) -> dict[str, str]:
+        log_event = dict(asdict(self), **self.labels)
+        log_event.pop("labels", None)
+        return {k: v for k, v in log_event.items() if v is not None}
+
+
+class _OWASPLogger:
+    """OWASP-compliant logger for security events."""
+
+    def __init__(self, application: str | None = None):
+        self.application = application
+        self._logger = logging.getLogger(__name__)
+
+    def log_event(self, event: str, level: int, description: str, **labels: str):
+        if self.application and "application" not in labels:
+            labels["application"] = self.application
+        log = _OWASPLogEvent(
+            datetime=datetime.now(timezone.utc).astimezone().isoformat(),
+            event=event,
+            level=logging.getLevelName(level),
+            description=description,
+            labels=labels,
+        )
+        self._logger.log(level, log.to_json(), extra={NESTED_JSON_KEY: log.to_dict()})
+
+
+class TLSCertificatesError(Exception):
+    """Base class for custom errors raised by this library."""
+
+
+class DataValidationError(TLSCertificatesError):
+    """Raised when data validation fails."""
+
+
+class _DatabagModel(pydantic.BaseModel):
+    """Base databag model.
+
+    Supports both pydantic v1 and v2.
+    """
+
+    if IS_PYDANTIC_V1:
+
+        class Config:
+            """Pydantic config."""
+
+            # ignore any extra fields in the databag
+            extra = "ignore"
+            """Ignore any extra fields in the databag."""
+            allow_population_by_field_name = True
+            """Allow instantiating this class by field name (instead of forcing alias)."""
+
+        _NEST_UNDER = None
+
+    model_config = pydantic.ConfigDict(
+        # tolerate additional keys in databag
+        extra="ignore",
+        # Allow instantiating this class by field name (instead of forcing alias).
+        populate_by_name=True,
+        # Custom config key: whether to nest the whole datastructure (as json)
+        # under a field or spread it out at the toplevel.
+        _NEST_UNDER=None,
+    )  # type: ignore
+    """Pydantic config."""
+
+    @classmethod
+    def load(cls, databag: Mapping[str, str]):
+        """Load this model from a Juju databag."""
+        if IS_PYDANTIC_V1:
+            return cls._load_v1(databag)
+        nest_under = cls.model_config.get("_NEST_UNDER")
+        if nest_under:
+            return cls.model_validate(json.loads(databag[nest_under]))
+
+        try:
+            data = {
+                k: json.loads(v)
+                for k, v in databag.items()
+                # Don't attempt to parse model-external values
+                if k in {(f.alias or n) for n, f in cls.model_fields.items()}
+            }
+        except json.JSONDecodeError as e:
+            msg = f"invalid databag contents: expecting json. {databag}"
+            logger.error(msg)
+            raise DataValidationError(msg) from e
+
+        try:
+            return cls.model_validate_json(json.dumps(data))
+        except pydantic.ValidationError as e:
+            msg = f"failed to validate databag: {databag}"
+            logger.debug(msg, exc_info=True)
+            raise DataValidationError(msg) from e
+
+    @classmethod
+    def _load_v1(cls, databag: Mapping[str, str]):
+        """Load implementation for pydantic v1."""
+        if cls._NEST_UNDER:
+            return cls.parse_obj(json.loads(databag[cls._NEST_UNDER]))  # pyright: ignore[reportDeprecated]
+
+        try:
+            data = {
+                k: json.loads(v)
+                for k, v in databag.items()
+                # Don't attempt to parse model-external values
+                if k in {f.alias for f in cls.__fields__.values()}  # pyright: ignore[reportDeprecated]
+            }
+        except json.JSONDecodeError as e:
+            msg = f"invalid databag contents: expecting json. {databag}"
+            logger.error(msg)
+            raise DataValidationError(msg) from e
+
+        try:
+            return cls.parse_raw(json.dumps(data))  # type: ignore
+        except pydantic.ValidationError as e:
+            msg = f"failed to validate databag: {databag}"
+            logger.debug(msg, exc_info=True)
+            raise DataValidationError(msg) from e
+
+    def dump(self, databag: MutableMapping[str, str] | None = None, clear: bool = True):
+        """Write the contents of this model to Juju databag.
+
+        Args:
+            databag: The databag to write to.
+            clear: Whether to clear the databag before writing.
+
+        Returns:
+            MutableMapping: The databag.
+        """
+        if IS_PYDANTIC_V1:
+            return self._dump_v1(databag, clear)
+        if clear and databag:
+            databag.clear()
+
+        if databag is None:
+            databag = {}
+        nest_under = self.model_config.get("_NEST_UNDER")
+        if nest_under:
+            databag[nest_under] = self.model_dump_json(
+                by_alias=True,
+                # skip keys whose values are default
+                exclude_defaults=True,
+            )
+            return databag
+
+        dct = self.model_dump(mode="json", by_alias=True, exclude_defaults=True)
+        databag.update({k: json.dumps(v) for k, v in dct.items()})
+        return databag
+
+    def _dump_v1(self, databag: MutableMapping[str, str] | None = None, clear: bool = True):
+        """Dump implementation for pydantic v1."""
+        if clear and databag:
+            databag.clear()
+
+        if databag is None:
+            databag = {}
+
+        if self._NEST_UNDER:
+            databag[self._NEST_UNDER] = self.json(by_alias=True, exclude_defaults=True)  # pyright: ignore[reportDeprecated]
+            return databag
+
+        dct = json.loads(self.json(by_alias=True, exclude_defaults=True))  # pyright: ignore[reportDeprecated]
+        databag.update({k: json.dumps(v) for k, v in dct.items()})
+
+        return databag
+
+
+class CertificateRequestErrorCode(int, Enum):
+    """Error codes for failed certificate requests.
+
+    1XX: CSR errors - Errors related to the certificate request itself
+    2XX: Server errors - Server-related errors
+    9XX: Other errors - Other errors not covered by the above categories
+    """
+
+    # 1XX: CSR errors
+    IP_NOT_ALLOWED = 101
+    DOMAIN_NOT_ALLOWED = 102
+    WILDCARD_NOT_ALLOWED = 103
+
+    # 2XX: Server errors
+    SERVER_NOT_AVAILABLE = 201
+
+    # 9XX: Other
+    OTHER = 999
+
+
+class CertificateError(pydantic.BaseModel):
+    """Error object reported by the provider for a CSR."""
+
+    code: int
+    name: str
+    message: str
+    reason: str | None = None
+    provider: str | None = None
+    endpoint: str | None = None
+
+
+class _Certificate(pydantic.BaseModel):
+    """Certificate model."""
+
+    ca: str
+    certificate_signing_request: str
+    certificate: str
+    chain: list[str] | None = None
+    revoked: bool | None = None
+
+    def to_provider_certificate(self, relation_id: int) -> ProviderCertificate:
+        """Convert to a ProviderCertificate."""
+        return ProviderCertificate(
+            relation_id=relation_id,
+            certificate=Certificate.from_string(self.certificate),
+            certificate_signing_request=CertificateSigningRequest.from_string(
+                self.certificate_signing_request
+            ),
+            ca=Certificate.from_string(self.ca),
+            chain=[Certificate.from_string(certificate) for certificate in self.chain]
+            if self.chain
+            else [],
+            revoked=self.revoked,
+        )
+
+
+class _CertificateSigningRequest(pydantic.BaseModel):
+    """Certificate signing request model."""
+
+    certificate_signing_request: str
+    ca: bool | None
+
+
+class _RequestError(pydantic.BaseModel):
+    """Error model."""
+
+    csr: str
+    error: CertificateError
+
+
+class ProviderCapabilities(pydantic.BaseModel):
+    """Best-effort description of what a provider's certificate server supports.
+
+    Capabilities are disambiguated at two levels, so a requirer can tell "the provider
+    hasn't told us yet" from "the provider told us, and it's unsupported":
+
+    - Whole object: :meth:`TLSCertificatesRequiresV4.get_provider_capabilities` (and the
+      capabilities argument passed to a ``certificate_requests`` callable) is ``None`` when
+      the provider has **not advertised any capabilities yet**. A requirer should treat this
+      as "not known yet / defer", not as "nothing is supported". Once the provider advertises
+      capabilities, a non-``None`` object is returned (even if it carries no fields).
+    - Per field: on a non-``None`` object, each attribute is independently optional.
+      ``True`` means supported, ``False`` means **advertised as unsupported**, and ``None``
+      means the provider advertised capabilities but left this one unspecified. A ``None``
+      field MUST NOT be interpreted as an assumed default by the requirer.
+    """
+
+    #: Whether IP addresses are accepted in SANs.
+    supports_ip_sans: bool | None = None
+    #: Whether wildcard DNS entries are accepted.
+    supports_wildcard_dns: bool | None = None
+    #: Whether subdomain certificates can be issued.
+    supports_subdomain: bool | None = None
+    #: Whether CA certificates can be issued.
+    supports_ca_certificates: bool | None = None
+    #: Optional list of allowed DNS domains.
+    allowed_domains: list[str] | None = None
+    #: Optional provider-type hint (e.g. "acme", "vault", "self-signed").
+    provider_type: str | None = None
+
+
+class _ProviderApplicationData(_DatabagModel):
+    """Provider application data model."""
+
+    certificates: list[_Certificate] = []
+    request_errors: list[_RequestError] = []
+    capabilities: ProviderCapabilities | None = None
+
+
+class _RequirerData(_DatabagModel):
+    """Requirer data model.
+
+    The same model is used for the unit and application data.
+    """
+
+    certificate_signing_requests: list[_CertificateSigningRequest] = []
+
+
+class Mode(Enum):
+    """Enum representing the mode of the certificate request.
+
+    UNIT (default): Request a certificate for the unit.
+        Each unit will manage its private key,
+        certificate signing request and certificate.
+    APP: Request a certificate for the application.
+        Only the leader unit will manage the private key, certificate signing request
+        and certificate.
+    APP_AND_UNIT: Request certificates for the application and the unit.
+        Each unit will have its own private key and certificate, but the application
+        will have a shared private key and certificate.
+    """
+
+    UNIT = 1
+    APP = 2
+    APP_AND_UNIT = 3
+
+
+class KeyAlgorithm(str, Enum):
+    """Enum representing the algorithm of a private key.
+
+    RSA (default): RSA key. Supported sizes are 2048 (default), 3072 and 4096 bits.
+    ECDSA: Elliptic curve key. Supported sizes are 256 (P-256, default) and 384 (P-384) bits.
+    """
+
+    RSA = "rsa"
+    ECDSA = "ecdsa"
+
+
+_DEFAULT_KEY_SIZES: dict[KeyAlgorithm, int] = {KeyAlgorithm.RSA: 2048, KeyAlgorithm.ECDSA: 256}
+_SUPPORTED_KEY_SIZES: dict[KeyAlgorithm, tuple[int, ...]] = {
+    KeyAlgorithm.RSA: (2048, 3072, 4096),
+    KeyAlgorithm.ECDSA: (256, 384),
+}
+
+
+def _signature_hash_algorithm(
+    private_key: CertificateIssuerPrivateKeyTypes,
+) -> hashes.SHA256 | hashes.SHA384:
+    """Return the hash to sign with: SHA-384 for P-384 keys, SHA-256 otherwise."""
+    if isinstance(private_key, ec.EllipticCurvePrivateKey) and isinstance(
+        private_key.curve, ec.SECP384R1
+    ):
+        return hashes.SHA384()
+    return hashes.SHA256()
+
+
+class PrivateKey:
+    """This class represents a private key."""
+
+    def __init__(
+        self, raw: str | None = None, x509_object: CertificateIssuerPrivateKeyTypes | None = None
+    ) -> None:
+        """Initialize the PrivateKey object.
+
+        If both raw and x509_object are provided, x509_object takes precedence.
+        """
+        if x509_object:
+            self._private_key = x509_object
+        elif raw:
+            self._private_key = serialization.load_pem_private_key(
+                raw.encode(),
+                password=None,
+            )
+        else:
+            raise ValueError("Either raw private key string or x509_object must be provided")
+
+    @property
+    def raw(self) -> str:
+        """Return the PEM-formatted string representation of the private key."""
+        return str(self)
+
+    def __str__(self):
+        """Return the private key as a string in PEM format."""
+        return (
+            self._private_key.private_bytes(
+                encoding=serialization.Encoding.PEM,
+                format=serialization.PrivateFormat.TraditionalOpenSSL,
+                encryption_algorithm=serialization.NoEncryption(),
+            )
+            .decode()
+            .strip()
+        )
+
+    @classmethod
+    def from_string(cls, private_key: str) -> PrivateKey:
+        """Create a PrivateKey object from a private key."""
+        return cls(raw=private_key)
+
+    @property
+    def algorithm(self) -> KeyAlgorithm:
+        """Return the algorithm of the private key.
+
+        Raises:
+            TLSCertificatesError: If the key is neither RSA nor ECDSA.
+        """
+        if isinstance(self._private_key, rsa.RSAPrivateKey):
+            return KeyAlgorithm.RSA
+        if isinstance(self._private_key, ec.EllipticCurvePrivateKey):
+            return KeyAlgorithm.ECDSA
+        raise TLSCertificatesError("Unsupported private key algorithm")
+
+    @property
+    def key_size(self) -> int:
+        """Return the key size in bits (RSA modulus size or EC curve size).
+
+        This describes any loaded RSA or EC key, not only supported ones. For example, a
+        P-521 key reports 521 and an RSA-1024 key reports 1024. Use :meth:`is_valid` to
+        check whether the key is acceptable.
+
+        Raises:
+            TLSCertificatesError: If the key is neither RSA nor ECDSA.
+        """
+        if isinstance(self._private_key, rsa.RSAPrivateKey | ec.EllipticCurvePrivateKey):
+            return self._private_key.key_size
+        raise TLSCertificatesError("Unsupported private key algorithm")
+
+    def is_valid(self) -> bool:
+        """Validate an RSA key (at least 2048 bits) or ECDSA P-256/P-384 key."""
+        if isinstance(self._private_key, rsa.RSAPrivateKey):
+            if self._private_key.key_size < 2048:
+                logger.warning("RSA key size is less than 2048 bits")
+                return False
+            return True
+        if isinstance(self._private_key, ec.EllipticCurvePrivateKey):
+            if isinstance(self._private_key.curve, (ec.SECP256R1, ec.SECP384R1)):
+                return True
+            logger.warning("Unsupported ECDSA curve: %s", self._private_key.curve.name)
+            return False
+        logger.warning("Private key must be RSA or ECDSA P-256/P-384")
+        return False
+
+    @classmethod
+    def generate(
+        cls,
+        key_size: int | None = None,
+        public_exponent: int = 65537,
+        key_algorithm: KeyAlgorithm | str = KeyAlgorithm.RSA,
+    ) -> PrivateKey:
+        """Generate a new RSA or ECDSA private key.
+
+        Args:
+            key_size: The size of the key in bits. Defaults to 2048 for RSA and 256 for ECDSA.
+                ECDSA supports 256 (P-256) and 384 (P-384).
+            public_exponent: The public exponent of the key (RSA only).
+            key_algorithm: The key algorithm, :attr:`KeyAlgorithm.RSA` (default) or
+                :attr:`KeyAlgorithm.ECDSA`. Plain strings (``"rsa"``, ``"ecdsa"``) are accepted.
+
+        Returns:
+            PrivateKey: The generated private key.
+
+        Raises:
+            ValueError: If the algorithm is unsupported, or the ECDSA size is not 256 or 384.
+        """
+        algorithm = KeyAlgorithm(key_algorithm)
+        if key_size is None:
+            key_size = _DEFAULT_KEY_SIZES[algorithm]
+        private_key: CertificateIssuerPrivateKeyTypes
+        if algorithm == KeyAlgorithm.RSA:
+            private_key = rsa.generate_private_key(
+                public_exponent=public_exponent, key_size=key_size
+            )
+        else:
+            curves = {256: ec.SECP256R1, 384: ec.SECP384R1}
+            if key_size not in curves:
+                raise ValueError("ECDSA key size must be 256 or 384 bits")
+            private_key = ec.generate_private_key(curves[key_size]())
+        _OWASPLogger().log_event(
+            event="private_key_generated",
+            level=logging.INFO,
+            description="Private key generated",
+            key_size=str(key_size),
+        )
+        return PrivateKey(x509_object=private_key)
+
+    def __eq__(self, other: object) -> bool:
+        """Check if two PrivateKey objects are equal."""
+        if not isinstance(other, PrivateKey):
+            return NotImplemented
+        return self.raw == other.raw
+
+    def __hash__(self) -> int:
+        """Return hash of the PrivateKey object."""
+        return hash(self.raw)
+
+
+class Certificate:
+    """This class represents a certificate."""
+
+    _cert: x509.Certificate
+
+    def __init__(
+        self,
+        raw: str | None = None,  # Must remain first argument for backwards compatibility
+        # Old Interface fields (ignored)
+        common_name: str | None = None,
+        expiry_time: datetime | None = None,
+        validity_start_time: datetime | None = None,
+        is_ca: bool | None = None,
+        sans_dns: set[str] | None = None,
+        sans_ip: set[str] | None = None,
+        sans_oid: set[str] | None = None,
+        email_address: str | None = None,
+        organization: str | None = None,
+        organizational_unit: str | None = None,
+        country_name: str | None = None,
+        state_or_province_name: str | None = None,
+        locality_name: str | None = None,
+        # End Old Interface fields
+        x509_object: x509.Certificate | None = None,
+    ) -> None:
+        """Initialize the Certificate object.
+
+        This initializer must maintain the old interface while also allowing
+        instantiation from an existing x509_object. It ignores all fields
+        other than raw and x509_object, preferring x509_object.
+        """
+        if x509_object:
+            self._cert = x509_object
+        elif raw:
+            self._cert = x509.load_pem_x509_certificate(data=raw.encode())
+        else:
+            raise ValueError("Either raw certificate string or x509_object must be provided")
+
+    @property
+    def raw(self) -> str:
+        """Return the PEM-formatted string representation of the certificate."""
+        return str(self)
+
+    @property
+    def common_name(self) -> str:
+        """Return the common name of the certificate."""
+        # We maintain compatibility with the old interface by returning
+        # an empty string if no common name is set.
+        common_name = self._cert.subject.get_attributes_for_oid(NameOID.COMMON_NAME)
+        return str(common_name[0].value) if common_name else ""
+
+    @property
+    def expiry_time(self) -> datetime:
+        """Return the expiry time of the certificate."""
+        return self._cert.not_valid_after_utc
+
+    @property
+    def validity_start_time(self) -> datetime:
+        """Return the validity start time of the certificate."""
+        return self._cert.not_valid_before_utc
+
+    @property
+    def is_ca(self) -> bool:
+        """Return whether the certificate is a CA certificate."""
+        try:
+            return self._cert.extensions.get_extension_for_oid(
+                ExtensionOID.BASIC_CONSTRAINTS
+            ).value.ca  # type: ignore[reportAttributeAccessIssue]
+        except x509.ExtensionNotFound:
+            return False
+
+    @property
+    def sans_dns(self) -> set[str] | None:
+        """Return the DNS Subject Alternative Names of the certificate."""
+        with suppress(x509.ExtensionNotFound):
+            sans = self._cert.extensions.get_extension_for_class(x509.SubjectAlternativeName).value
+            return {str(san) for san in sans.get_values_for_type(x509.DNSName)}
+        return None
+
+    @property
+    def sans_ip(self) -> set[str] | None:
+        """Return the IP Subject Alternative Names of the certificate."""
+        with suppress(x509.ExtensionNotFound):
+            sans = self._cert.extensions.get_extension_for_class(x509.SubjectAlternativeName).value
+            return {str(san) for san in sans.get_values_for_type(x509.IPAddress)}
+        return None
+
+    @property
+    def sans_oid(self) -> set[str] | None:
+        """Return the OID Subject Alternative Names of the certificate."""
+        with suppress(x509.ExtensionNotFound):
+            sans = self._cert.extensions.get_extension_for_class(x509.SubjectAlternativeName).value
+            return {str(san.dotted_string) for san in sans.get_values_for_type(x509.RegisteredID)}
+        return None
+
+    @property
+    def email_address(self) -> str | None:
+        """Return the email address of the certificate."""
+        email_address = self._cert.subject.get_attributes_for_oid(NameOID.EMAIL_ADDRESS)
+        return str(email_address[0].value) if email_address else None
+
+    @property
+    def organization(self) -> str | None:
+        """Return the organization name of the certificate."""
+        organization = self._cert.subject.get_attributes_for_oid(NameOID.ORGANIZATION_NAME)
+        return str(organization[0].value) if organization else None
+
+    @property
+    def organizational_unit(self) -> str | None:
+        """Return the organizational unit name of the certificate."""
+        organizational_unit = self._cert.subject.get_attributes_for_oid(
+            NameOID.ORGANIZATIONAL_UNIT_NAME
+        )
+        return str(organizational_unit[0].value) if organizational_unit else None
+
+    @property
+    def country_name(self) -> str | None:
+        """Return the country name of the certificate."""
+        country_name = self._cert.subject.get_attributes_for_oid(NameOID.COUNTRY_NAME)
+        return str(country_name[0].value) if country_name else None
+
+    @property
+    def state_or_province_name(self) -> str | None:
+        """Return the state or province name of the certificate."""
+        state_or_province_name = self._cert.subject.get_attributes_for_oid(
+            NameOID.STATE_OR_PROVINCE_NAME
+        )
+        return str(state_or_province_name[0].value) if state_or_province_name else None
+
+    @property
+    def locality_name(self) -> str | None:
+        """Return the locality name of the certificate."""
+        locality_name = self._cert.subject.get_attributes_for_oid(NameOID.LOCALITY_NAME)
+        return str(locality_name[0].value) if locality_name else None
+
+    def __str__(self) -> str:
+        """Return the certificate as a string."""
+        return self._cert.public_bytes(serialization.Encoding.PEM).decode().strip()
+
+    def __eq__(self, other: object) -> bool:
+        """Check if two Certificate objects are equal."""
+        if not isinstance(other, Certificate):
+            return NotImplemented
+        return self.raw == other.raw
+
+    def __hash__(self) -> int:
+        """Return hash of the Certificate object."""
+        return hash(self.raw)
+
+    @classmethod
+    def from_string(cls, certificate: str) -> Certificate:
+        """Create a Certificate object from a certificate."""
+        try:
+            certificate_object = x509.load_pem_x509_certificate(data=certificate.encode())
+        except ValueError as e:
+            logger.error("Could not load certificate: %s", e)
+            raise TLSCertificatesError("Could not load certificate")
+
+        return cls(x509_object=certificate_object)
+
+    def matches_private_key(self, private_key: PrivateKey) -> bool:
+        """Check if this certificate matches a given private key.
+
+        Args:
+            private_key (PrivateKey): The private key to validate against.
+
+        Returns:
+            bool: True if the certificate matches the private key, False otherwise.
+        """
+        try:
+            cert_public_key = self._cert.public_key()
+            key_public_key = private_key._private_key.public_key()
+
+            if isinstance(cert_public_key, rsa.RSAPublicKey) and isinstance(
+                key_public_key, rsa.RSAPublicKey
+            ):
+                return cert_public_key.public_numbers() == key_public_key.public_numbers()
+            if isinstance(cert_public_key, ec.EllipticCurvePublicKey) and isinstance(
+                key_public_key, ec.EllipticCurvePublicKey
+            ):
+                return cert_public_key.public_numbers() == key_public_key.public_numbers()
+            return False
+        except Exception as e:
+            logger.warning("Failed to validate certificate and private key match: %s", e)
+            return False
+
+    @classmethod
+    def generate(
+        cls,
+        csr: CertificateSigningRequest,
+        ca: Certificate,
+        ca_private_key: PrivateKey,
+        validity: timedelta,
+        is_ca: bool = False,
+    ) -> Certificate:
+        """Generate a certificate from a CSR signed by the given CA and CA private key.
+
+        Args:
+            csr: The certificate signing request.
+            ca: The CA certificate.
+            ca_private_key: The CA private key.
+            validity: The validity period of the certificate.
+            is_ca: Whether the generated certificate is a CA certificate.
+
+        Returns:
+            Certificate: The generated certificate.
+        """
+        # Ideally, this would be the constructor, but we can't add new
+        # required parameters to the constructor without breaking backwards
+        # compatibility.
+        private_key = serialization.load_pem_private_key(
+            str(ca_private_key).encode(), password=None
+        )
+        assert isinstance(private_key, CertificateIssuerPrivateKeyTypes)
+
+        # Create a certificate builder
+        cert_builder = x509.CertificateBuilder(
+            subject_name=csr._csr.subject,
+            # issuer_name=ca._cert.subject,
+            # TODO: Validate this is correct, the old code used `issuer`
+            issuer_name=ca._cert.issuer,
+            public_key=csr._csr.public_key(),
+            serial_number=x509.random_serial_number(),
+            not_valid_before=datetime.now(timezone.utc),
+            not_valid_after=datetime.now(timezone.utc) + validity,
+        )
+        extensions = _generate_certificate_request_extensions(
+            authority_key_identifier=ca._cert.extensions.get_extension_for_class(
+                x509.SubjectKeyIdentifier
+            ).value.key_identifier,
+            csr=csr._csr,
+            is_ca=is_ca,
+        )
+        for extension in extensions:
+            try:
+                cert_builder = cert_builder.add_extension(extension.value, extension.critical)
+            except ValueError as e:
+                logger.error("Could not add extension to certificate: %s", e)
+                raise TLSCertificatesError("Could not add extension to certificate") from e
+
+        # Sign the certificate with the CA's private key
+        cert = cert_builder.sign(
+            private_key=private_key, algorithm=_signature_hash_algorithm(private_key)
+        )
+        _OWASPLogger().log_event(
+            event="certificate_generated",
+            level=logging.INFO,
+            description="Certificate generated from CSR",
+            common_name=csr.common_name,
+            is_ca=str(is_ca),
+            validity_days=str(validity.days),
+        )
+
+        return cls(x509_object=cert)
+
+    @classmethod
+    def generate_self_signed_ca(
+        cls,
+        attributes: CertificateRequestAttributes,
+        private_key: PrivateKey,
+        validity: timedelta,
+    ) -> Certificate:
+        """Generate a self-signed CA certificate.
+
+        Args:
+            attributes: The certificate request attributes.
+            private_key: The private key to sign the CA certificate.
+            validity: The validity period of the CA certificate.
+
+        Returns:
+            Certificate: The generated CA certificate.
+        """
+        assert isinstance(private_key._private_key, CertificateIssuerPrivateKeyTypes)
+
+        public_key = private_key._private_key.public_key()
+
+        builder = x509.CertificateBuilder(
+            public_key=public_key,
+            serial_number=x509.random_serial_number(),
+            not_valid_before=datetime.now(timezone.utc),
+            not_valid_after=datetime.now(timezone.utc) + validity,
+        )
+
+        if subject_name := _extract_subject_name_attributes(attributes):
+            builder = builder.subject_name(subject_name).issuer_name(subject_name)
+
+        builder = (
+            builder.add_extension(
+                x509.SubjectKeyIdentifier.from_public_key(public_key), critical=False
+            )
+            .add_extension(x509.BasicConstraints(ca=True, path_length=None), critical=True)
+            .add_extension(
+                x509.KeyUsage(
+                    digital_signature=True,
+                    key_encipherment=isinstance(private_key._private_key, rsa.RSAPrivateKey),
+                    key_cert_sign=True,
+                    key_agreement=False,
+                    content_commitment=False,
+                    data_encipherment=False,
+                    crl_sign=False,
+                    encipher_only=False,
+                    decipher_only=False,
+                ),
+                critical=True,
+            )
+        )
+
+        if san_extension := _san_extension(
+            email_address=attributes.email_address,
+            sans_dns=attributes.sans_dns,
+            sans_ip=attributes.sans_ip,
+            sans_oid=attributes.sans_oid,
+        ):
+            builder = builder.add_extension(san_extension, critical=False)
+
+        cert = cls(
+            x509_object=builder.sign(
+                private_key._private_key,
+                algorithm=_signature_hash_algorithm(private_key._private_key),
+            )
+        )
+
+        _OWASPLogger().log_event(
+            event="ca_certificate_generated",
+            level=logging.INFO,
+            description="CA certificate generated",
+            common_name=cert.common_name,
+            validity_days=str(validity.days),
+        )
+
+        return cert
+
+
+class CertificateSigningRequest:
+    """A representation of the certificate signing request."""
+
+    _csr: x509.CertificateSigningRequest
+
+    def __init__(
+        self,
+        raw: str | None = None,  # Must remain first argument for backwards compatibility
+        # Old Interface fields (ignored)
+        common_name: str | None = None,
+        sans_dns: set[str] | None = None,
+        sans_ip: set[str] | None = None,
+        sans_oid: set[str] | None = None,
+        email_address: str | None = None,
+        organization: str | None = None,
+        organizational_unit: str | None = None,
+        country_name: str | None = None,
+        state_or_province_name: str | None = None,
+        locality_name: str | None = None,
+        has_unique_identifier: bool | None = None,
+        # End Old Interface fields
+        x509_object: x509.CertificateSigningRequest | None = None,
+    ):
+        """Initialize the CertificateSigningRequest object.
+
+        This initializer must maintain the old interface while also allowing
+        instantiation from an existing x509_object. It ignores all fields
+        other than raw and x509_object, preferring x509_object.
+        """
+        if x509_object:
+            self._csr = x509_object
+            return
+        elif raw:
+            try:
+                self._csr = x509.load_pem_x509_csr(raw.encode())
+            except ValueError as e:
+                logger.error("Could not load CSR: %s", e)
+                raise TLSCertificatesError("Could not load CSR")
+            return
+        raise ValueError("Either raw CSR string or x509_object must be provided")
+
+    @property
+    def common_name(self) -> str:
+        """Return the common name of the CSR."""
+        common_name = self._csr.subject.get_attributes_for_oid(NameOID.COMMON_NAME)
+        return str(common_name[0].value) if common_name else ""
+
+    @property
+    def sans_dns(self) -> set[str]:
+        """Return the DNS Subject Alternative Names of the CSR."""
+        with suppress(x509.ExtensionNotFound):
+            sans = self._csr.extensions.get_extension_for_class(x509.SubjectAlternativeName).value
+            return {str(san) for san in sans.get_values_for_type(x509.DNSName)}
+        return set()
+
+    @property
+    def sans_ip(self) -> set[str]:
+        """Return the IP Subject Alternative Names of the CSR."""
+        with suppress(x509.ExtensionNotFound):
+            sans = self._csr.extensions.get_extension_for_class(x509.SubjectAlternativeName).value
+            return {str(san) for san in sans.get_values_for_type(x509.IPAddress)}
+        return set()
+
+    @property
+    def sans_oid(self) -> set[str]:
+        """Return the OID Subject Alternative Names of the CSR."""
+        with suppress(x509.ExtensionNotFound):
+            sans = self._csr.extensions.get_extension_for_class(x509.SubjectAlternativeName).value
+            return {str(san.dotted_string) for san in sans.get_values_for_type(x509.RegisteredID)}
+        return set()
+
+    @property
+    def email_address(self) -> str | None:
+        """Return the email address of the CSR."""
+        email_address = self._csr.subject.get_attributes_for_oid(NameOID.EMAIL_ADDRESS)
+        return str(email_address[0].value) if email_address else None
+
+    @property
+    def organization(self) -> str | None:
+        """Return the organization name of the CSR."""
+        organization = self._csr.subject.get_attributes_for_oid(NameOID.ORGANIZATION_NAME)
+        return str(organization[0].value) if organization else None
+
+    @property
+    def organizational_unit(self) -> str | None:
+        """Return the organizational unit name of the CSR."""
+        organizational_unit = self._csr.subject.get_attributes_for_oid(
+            NameOID.ORGANIZATIONAL_UNIT_NAME
+        )
+        return str(organizational_unit[0].value) if organizational_unit else None
+
+    @property
+    def country_name(self) -> str | None:
+        """Return the country name of the CSR."""
+        country_name = self._csr.subject.get_attributes_for_oid(NameOID.COUNTRY_NAME)
+        return str(country_name[0].value) if country_name else None
+
+    @property
+    def state_or_province_name(self) -> str | None:
+        """Return the state or province name of the CSR."""
+        state_or_province_name = self._csr.subject.get_attributes_for_oid(
+            NameOID.STATE_OR_PROVINCE_NAME
+        )
+        return str(state_or_province_name[0].value) if state_or_province_name else None
+
+    @property
+    def locality_name(self) -> str | None:
+        """Return the locality name of the CSR."""
+        locality_name = self._csr.subject.get_attributes_for_oid(NameOID.LOCALITY_NAME)
+        return str(locality_name[0].value) if locality_name else None
+
+    @property
+    def has_unique_identifier(self) -> bool:
+        """Return whether the CSR has a unique identifier."""
+        unique_identifier = self._csr.subject.get_attributes_for_oid(
+            NameOID.X500_UNIQUE_IDENTIFIER
+        )
+        return bool(unique_identifier)
+
+    @property
+    def raw(self) -> str:
+        """Return the PEM-formatted string representation of the CSR."""
+        return self.__str__()
+
+    def __str__(self) -> str:
+        """Return the CSR as a string."""
+        return self._csr.public_bytes(serialization.Encoding.PEM).decode().strip()
+
+    @property
+    def additional_critical_extensions(self) -> list[x509.ExtensionType]:
+        """Return additional critical extensions present on the CSR (excluding SAN)."""
+        return [
+            extension.value
+            for extension in self._csr.extensions
+            if extension.critical and extension.oid != ExtensionOID.SUBJECT_ALTERNATIVE_NAME
+        ]
+
+    @classmethod
+    def from_string(cls, csr: str) -> CertificateSigningRequest:
+        """Create a CertificateSigningRequest object from a CSR."""
+        return cls(raw=csr)
+
+    @classmethod
+    def from_csr(cls, csr: x509.CertificateSigningRequest) -> CertificateSigningRequest:
+        """Create a CertificateSigningRequest object from a CSR."""
+        return cls(x509_object=csr)
+
+    def __eq__(self, other: object) -> bool:
+        """Check if two CertificateSigningRequest objects are equal."""
+        if not isinstance(other, CertificateSigningRequest):
+            return NotImplemented
+        return self.raw == other.raw
+
+    def __hash__(self) -> int:
+        """Return hash of the CertificateSigningRequest object."""
+        return hash(self.raw)
+
+    def matches_certificate(self, certificate: Certificate) -> bool:
+        """Check if this CSR matches a given certificate.
+
+        Args:
+            certificate (Certificate): The certificate to validate against.
+
+        Returns:
+            bool: True if the CSR matches the certificate, False otherwise.
+        """
+        return self._csr.public_key() == certificate._cert.public_key()
+
+    def matches_private_key(self, key: PrivateKey) -> bool:
+        """Check if a CSR matches a private key.
+
+        Args:
+            key (PrivateKey): Private key
+        Returns:
+            bool: True/False depending on whether the CSR matches the private key.
+        """
+        try:
+            key_object_public_key = key._private_key.public_key()
+            csr_object_public_key = self._csr.public_key()
+            if isinstance(key_object_public_key, rsa.RSAPublicKey) and isinstance(
+                csr_object_public_key, rsa.RSAPublicKey
+            ):
+                return (
+                    csr_object_public_key.public_numbers()
+                    == key_object_public_key.public_numbers()
+                )
+            if isinstance(key_object_public_key, ec.EllipticCurvePublicKey) and isinstance(
+                csr_object_public_key, ec.EllipticCurvePublicKey
+            ):
+                return (
+                    csr_object_public_key.public_numbers()
+                    == key_object_public_key.public_numbers()
+                )
+            return False
+        except ValueError:
+            logger.warning("Could not load certificate or CSR.")
+            return False
+
+    def get_sha256_hex(self) -> str:
+        """Calculate the hash of the provided data and return the hexadecimal representation."""
+        digest = hashes.Hash(hashes.SHA256())
+        digest.update(self.raw.encode())
+        return digest.finalize().hex()
+
+    def sign(
+        self, ca: Certificate, ca_private_key: PrivateKey, validity: timedelta, is_ca: bool = False
+    ) -> Certificate:
+        """Sign this CSR with the given CA and CA private key.
+
+        Args:
+            ca: The CA certificate.
+            ca_private_key: The CA private key.
+            validity: The validity period of the certificate.
+            is_ca: Whether the generated certificate is a CA certificate.
+
+        Returns:
+            Certificate: The signed certificate.
+        """
+        return Certificate.generate(
+            csr=self,
+            ca=ca,
+            ca_private_key=ca_private_key,
+            validity=validity,
+            is_ca=is_ca,
+        )
+
+    @classmethod
+    def generate(
+        cls,
+        attributes: CertificateRequestAttributes,
+        private_key: PrivateKey,
+    ) -> CertificateSigningRequest:
+        """Generate a CSR using the supplied attributes and private key.
+
+        Args:
+            attributes (CertificateRequestAttributes): Certificate request attributes
+            private_key (PrivateKey): Private key
+        Returns:
+            CertificateSigningRequest: CSR
+        """
+        signing_key = private_key._private_key
+        assert isinstance(signing_key, CertificateIssuerPrivateKeyTypes)
+
+        csr_builder = x509.CertificateSigningRequestBuilder()
+        if subject_name := _extract_subject_name_attributes(attributes):
+            csr_builder = csr_builder.subject_name(subject_name)
+
+        sans: list[x509.GeneralName] = []
+        if attributes.sans_oid:
+            sans.extend([
+                x509.RegisteredID(x509.ObjectIdentifier(san)) for san in attributes.sans_oid
+            ])
+        if attributes.sans_ip:
+            sans.extend([x509.IPAddress(ipaddress.ip_address(san)) for san in attributes.sans_ip])
+        if attributes.sans_dns:
+            sans.extend([x509.DNSName(san) for san in attributes.sans_dns])
+        if sans:
+            csr_builder = csr_builder.add_extension(
+                x509.SubjectAlternativeName(set(sans)), critical=False
+            )
+        if attributes.additional_critical_extensions:
+            for extension in attributes.additional_critical_extensions:
+                csr_builder = csr_builder.add_extension(extension, critical=True)
+        signed_certificate_request = csr_builder.sign(
+            signing_key, _signature_hash_algorithm(signing_key)
+        )
+        return cls(x509_object=signed_certificate_request)
+
+
+class CertificateRequestAttributes:
+    """A representation of the certificate request attributes."""
+
+    def __init__(
+        self,
+        common_name: str | None = None,
+        sans_dns: Collection[str] | None = None,
+        sans_ip: Collection[str] | None = None,
+        sans_oid: Collection[str] | None = None,
+        email_address: str | None = None,
+        organization: str | None = None,
+        organizational_unit: str | None = None,
+        country_name: str | None = None,
+        state_or_province_name: str | None = None,
+        locality_name: str | None = None,
+        is_ca: bool = False,
+        add_unique_id_to_subject_name: bool = True,
+        additional_critical_extensions: Collection[x509.ExtensionType] | None = None,
+    ):
+        if not common_name and not sans_dns and not sans_ip and not sans_oid:
+            raise ValueError(
+                "At least one of common_name, sans_dns, sans_ip, or sans_oid must be provided"
+            )
+        self._common_name = common_name
+        self._sans_dns = set(sans_dns) if sans_dns else None
+        self._sans_ip = set(sans_ip) if sans_ip else None
+        self._sans_oid = set(sans_oid) if sans_oid else None
+        self._email_address = email_address
+        self._organization = organization
+        self._organizational_unit = organizational_unit
+        self._country_name = country_name
+        self._state_or_province_name = state_or_province_name
+        self._locality_name = locality_name
+        self._is_ca = is_ca
+        self._add_unique_id_to_subject_name = add_unique_id_to_subject_name
+        self._additional_critical_extensions = list(additional_critical_extensions or [])
+
+    @property
+    def common_name(self) -> str:
+        """Return the common name."""
+        # For legacy interface compatibility, return empty string if not set
+        return self._common_name if self._common_name else ""
+
+    @property
+    def sans_dns(self) -> set[str] | None:
+        """Return the DNS Subject Alternative Names."""
+        return self._sans_dns
+
+    @property
+    def sans_ip(self) -> set[str] | None:
+        """Return the IP Subject Alternative Names."""
+        return self._sans_ip
+
+    @property
+    def sans_oid(self) -> set[str] | None:
+        """Return the OID Subject Alternative Names."""
+        return self._sans_oid
+
+    @property
+    def email_address(self) -> str | None:
+        """Return the email address."""
+        return self._email_address
+
+    @property
+    def organization(self) -> str | None:
+        """Return the organization name."""
+        return self._organization
+
+    @property
+    def organizational_unit(self) -> str | None:
+        """Return the organizational unit name."""
+        return self._organizational_unit
+
+    @property
+    def country_name(self) -> str | None:
+        """Return the country name."""
+        return self._country_name
+
+    @property
+    def state_or_province_name(self) -> str | None:
+        """Return the state or province name."""
+        return self._state_or_province_name
+
+    @property
+    def locality_name(self) -> str | None:
+        """Return the locality name."""
+        return self._locality_name
+
+    @property
+    def is_ca(self) -> bool:
+        """Return whether the certificate is a CA certificate."""
+        return self._is_ca
+
+    @property
+    def add_unique_id_to_subject_name(self) -> bool:
+        """Return whether to add a unique identifier to the subject name."""
+        return self._add_unique_id_to_subject_name
+
+    @property
+    def additional_critical_extensions(self) -> list[x509.ExtensionType]:
+        """Return additional critical extensions to be added to the CSR."""
+        return self._additional_critical_extensions
+
+    @classmethod
+    def from_csr(cls, csr: CertificateSigningRequest, is_ca: bool) -> CertificateRequestAttributes:
+        """Create CertificateRequestAttributes from a CertificateSigningRequest.
+
+        Args:
+            csr: The CSR to extract attributes from.
+            is_ca: Whether a CA certificate is being requested.
+
+        Returns:
+            CertificateRequestAttributes: The extracted attributes.
+        """
+        return cls(
+            common_name=csr.common_name,
+            sans_dns=csr.sans_dns,
+            sans_ip=csr.sans_ip,
+            sans_oid=csr.sans_oid,
+            email_address=csr.email_address,
+            organization=csr.organization,
+            organizational_unit=csr.organizational_unit,
+            country_name=csr.country_name,
+            state_or_province_name=csr.state_or_province_name,
+            locality_name=csr.locality_name,
+            is_ca=is_ca,
+            add_unique_id_to_subject_name=csr.has_unique_identifier,
+            additional_critical_extensions=csr.additional_critical_extensions,
+        )
+
+    def __eq__(self, other: object) -> bool:
+        """Check if two CertificateRequestAttributes objects are equal."""
+        if not isinstance(other, CertificateRequestAttributes):
+            return NotImplemented
+        return (
+            self.common_name == other.common_name
+            and self.sans_dns == other.sans_dns
+            and self.sans_ip == other.sans_ip
+            and self.sans_oid == other.sans_oid
+            and self.email_address == other.email_address
+            and self.organization == other.organization
+            and self.organizational_unit == other.organizational_unit
+            and self.country_name == other.country_name
+            and self.state_or_province_name == other.state_or_province_name
+            and self.locality_name == other.locality_name
+            and self.is_ca == other.is_ca
+            and self.add_unique_id_to_subject_name == other.add_unique_id_to_subject_name
+            and self.additional_critical_extensions == other.additional_critical_extensions
+        )
+
+    def __hash__(self) -> int:
+        """Return hash of the CertificateRequestAttributes object."""
+        return hash((
+            self.common_name,
+            frozenset(self.sans_dns) if self.sans_dns else None,
+            frozenset(self.sans_ip) if self.sans_ip else None,
+            frozenset(self.sans_oid) if self.sans_oid else None,
+            self.email_address,
+            self.organization,
+            self.organizational_unit,
+            self.country_name,
+            self.state_or_province_name,
+            self.locality_name,
+            self.is_ca,
+            self.add_unique_id_to_subject_name,
+            tuple(self.additional_critical_extensions),
+        ))
+
+    def is_valid(self) -> bool:
+        """Validate the attributes of the certificate request.
+
+        Returns:
+            bool: True if the attributes are valid, False otherwise.
+        """
+        if not self.common_name and not self.sans_dns and not self.sans_ip and not self.sans_oid:
+            logger.warning(
+                "At least one of common_name, sans_dns, sans_ip, or sans_oid must be provided"
+            )
+            return False
+        return True
+
+    def generate_csr(
+        self,
+        private_key: PrivateKey,
+    ) -> CertificateSigningRequest:
+        """Generate a CSR using the current attributes and a private key.
+
+        Args:
+            private_key (PrivateKey): Private key to sign the CSR.
+
+        Returns:
+            CertificateSigningRequest: The generated CSR.
+        """
+        return CertificateSigningRequest.generate(self, private_key)
+
+
+@dataclass(frozen=True)
+class ProviderCertificate:
+    """This class represents a certificate provided by the TLS provider."""
+
+    relation_id: int
+    certificate: Certificate
+    certificate_signing_request: CertificateSigningRequest
+    ca: Certificate
+    chain: list[Certificate]
+    revoked: bool | None = None
+
+    def to_json(self) -> str:
+        """Return the object as a JSON string.
+
+        Returns:
+            str: JSON representation of the object
+        """
+        return json.dumps({
+            "csr": str(self.certificate_signing_request),
+            "certificate": str(self.certificate),
+            "ca": str(self.ca),
+            "chain": [str(cert) for cert in self.chain],
+            "revoked": self.revoked,
+        })
+
+
+@dataclass(frozen=True)
+class RequirerCertificateRequest:
+    """This class represents a certificate signing request requested by a specific TLS requirer."""
+
+    relation_id: int
+    certificate_signing_request: CertificateSigningRequest
+    is_ca: bool
+
+
+@dataclass(frozen=True)
+class ProviderCertificateError:
+    """This class represents a failed issuance for a CSR reported by the TLS provider."""
+
+    relation_id: int
+    certificate_signing_request: CertificateSigningRequest
+    error: CertificateError
+
+
+class CertificateAvailableEvent(EventBase):
+    """Charm Event triggered when a TLS certificate is available."""
+
+    def __init__(
+        self,
+        handle: Handle,
+        certificate: Certificate,
+        certificate_signing_request: CertificateSigningRequest,
+        ca: Certificate,
+        chain: list[Certificate],
+    ):
+        super().__init__(handle)
+        self.certificate = certificate
+        self.certificate_signing_request = certificate_signing_request
+        self.ca = ca
+        self.chain = chain
+
+    def snapshot(self) -> dict[str, str]:
+        """Return snapshot."""
+        return {
+            "certificate": str(self.certificate),
+            "certificate_signing_request": str(self.certificate_signing_request),
+            "ca": str(self.ca),
+            "chain": json.dumps([str(certificate) for certificate in self.chain]),
+        }
+
+    def restore(self, snapshot: dict[str, str]):
+        """Restore snapshot."""
+        self.certificate = Certificate.from_string(snapshot["certificate"])
+        self.certificate_signing_request = CertificateSigningRequest.from_string(
+            snapshot["certificate_signing_request"]
+        )
+        self.ca = Certificate.from_string(snapshot["ca"])
+        chain_strs = json.loads(snapshot["chain"])
+        self.chain = [Certificate.from_string(chain_str) for chain_str in chain_strs]
+
+    def chain_as_pem(self) -> str:
+        """Return full certificate chain as a PEM string."""
+        return "\n\n".join([str(cert) for cert in self.chain])
+
+
+class CertificateDeniedEvent(EventBase):
+    """Charm Event triggered when a TLS certificate cannot be issued for a CSR."""
+
+    def __init__(
+        self,
+        handle: Handle,
+        certificate_signing_request: CertificateSigningRequest,
+        error: CertificateError,
+    ):
+        super().__init__(handle)
+        self.certificate_signing_request = certificate_signing_request
+        self.error = error
+
+    def snapshot(self) -> dict[str, str]:
+        """Return snapshot."""
+        error_json = self.error.json() if IS_PYDANTIC_V1 else self.error.model_dump_json()  # type: ignore[attr-defined]
+        return {
+            "certificate_signing_request": str(self.certificate_signing_request),
+            "error": error_json,
+        }
+
+    def restore(self, snapshot: dict[str, str]):
+        """Restore snapshot."""
+        self.certificate_signing_request = CertificateSigningRequest.from_string(
+            snapshot["certificate_signing_request"]
+        )
+        if IS_PYDANTIC_V1:
+            self.error = CertificateError.parse_raw(snapshot["error"])  # type: ignore[attr-defined]
+        else:
+            self.error = CertificateError.model_validate_json(snapshot["error"])
+
+
+def generate_private_key(
+    key_size: int = 2048,
+    public_exponent: int = 65537,
+) -> PrivateKey:
+    """Generate a private key with the RSA algorithm.
+
+    Args:
+        key_size (int): Key size in bits, must be at least 2048 bits
+        public_exponent: Public exponent.
+
+    Returns:
+        PrivateKey: Private Key
+    """
+    warnings.warn(  # noqa: B028
+        "generate_private_key() is deprecated. Use PrivateKey.generate() instead.",
+        DeprecationWarning,
+    )
+    return PrivateKey.generate(key_size=key_size, public_exponent=public_exponent)
+
+
+def calculate_relative_datetime(target_time: datetime, fraction: float) -> datetime:
+    """Calculate a datetime that is a given percentage from now to a target time.
+
+    Args:
+        target_time (datetime): The future datetime to interpolate towards.
+        fraction (float): Fraction of the interval from now to target_time (0.0-1.0).
+            1.0 means return target_time,
+            0.9 means return the time after 90% of the interval has passed,
+            and 0.0 means return now.
+    """
+    if fraction <= 0.0 or fraction > 1.0:
+        raise ValueError("Invalid fraction. Must be between 0.0 and 1.0")
+    now = datetime.now(timezone.utc)
+    time_until_target = target_time - now
+    return now + time_until_target * fraction
+
+
+def chain_has_valid_order(chain: list[str]) -> bool:
+    """Check if the chain has a valid order.
+
+    Validates that each certificate in the chain is properly signed by the next certificate.
+    The chain should be ordered from leaf to root, where each certificate is signed by
+    the next one in the chain.
+
+    Args:
+        chain (List[str]): List of certificates in PEM format, ordered from leaf to root
+
+    Returns:
+        bool: True if the chain has a valid order, False otherwise.
+    """
+    if len(chain) < 2:
+        return True
+
+    try:
+        for i in range(len(chain) - 1):
+            cert = x509.load_pem_x509_certificate(chain[i].encode())
+            issuer = x509.load_pem_x509_certificate(chain[i + 1].encode())
+            cert.verify_directly_issued_by(issuer)
+        return True
+    except (ValueError, TypeError, InvalidSignature):
+        return False
+
+
+def generate_csr(
+    private_key: PrivateKey,
+    common_name: str,
+    sans_dns: frozenset[str] | None = frozenset(),
+    sans_ip: frozenset[str] | None = frozenset(),
+    sans_oid: frozenset[str] | None = frozenset(),
+    organization: str | None = None,
+    organizational_unit: str | None = None,
+    email_address: str | None = None,
+    country_name: str | None = None,
+    locality_name: str | None = None,
+    state_or_province_name: str | None = None,
+    add_unique_id_to_subject_name: bool = True,
+) -> CertificateSigningRequest:
+    """Generate a CSR using private key and subject.
+
+    Args:
+        private_key (PrivateKey): Private key
+        common_name (str): Common name
+        sans_dns (FrozenSet[str]): DNS Subject Alternative Names
+        sans_ip (FrozenSet[str]): IP Subject Alternative Names
+        sans_oid (FrozenSet[str]): OID Subject Alternative Names
+        organization (Optional[str]): Organization name
+        organizational_unit (Optional[str]): Organizational unit name
+        email_address (Optional[str]): Email address
+        country_name (Optional[str]): Country name
+        state_or_province_name (Optional[str]): State or province name
+        locality_name (Optional[str]): Locality name
+        add_unique_id_to_subject_name (bool): Whether a unique ID must be added to the CSR's
+            subject name. Always leave to "True" when the CSR is used to request certificates
+            using the tls-certificates relation.
+
+    Returns:
+        CertificateSigningRequest: CSR
+    """
+    warnings.warn(  # noqa: B028
+        (
+            "generate_csr() is deprecated. Use "
+            "CertificateRequestAttributes.generate_csr() or "
+            "CertificateSigningRequest.generate() instead."
+        ),
+        DeprecationWarning,
+    )
+    return CertificateRequestAttributes(
+        common_name=common_name,
+        sans_dns=sans_dns,
+        sans_ip=sans_ip,
+        sans_oid=sans_oid,
+        organization=organization,
+        organizational_unit=organizational_unit,
+        email_address=email_address,
+        country_name=country_name,
+        state_or_province_name=state_or_province_name,
+        locality_name=locality_name,
+        add_unique_id_to_subject_name=add_unique_id_to_subject_name,
+    ).generate_csr(private_key=private_key)
+
+
+def generate_ca(
+    private_key: PrivateKey,
+    validity: timedelta,
+    common_name: str,
+    sans_dns: frozenset[str] | None = frozenset(),
+    sans_ip: frozenset[str] | None = frozenset(),
+    sans_oid: frozenset[str] | None = frozenset(),
+    organization: str | None = None,
+    organizational_unit: str | None = None,
+    email_address: str | None = None,
+    country_name: str | None = None,
+    state_or_province_name: str | None = None,
+    locality_name: str | None = None,
+) -> Certificate:
+    """Generate a self signed CA Certificate.
+
+    Args:
+        private_key: Private key
+        validity: Certificate validity time
+        common_name: Common Name that can be an IP or a Full Qualified Domain Name (FQDN).
+        sans_dns: DNS Subject Alternative Names
+        sans_ip: IP Subject Alternative Names
+        sans_oid: OID Subject Alternative Names
+        organization: Organization name
+        organizational_unit: Organizational unit name
+        email_address: Email address
+        country_name: Certificate Issuing country
+        state_or_province_name: Certificate Issuing state or province
+        locality_name: Certificate Issuing locality
+
+    Returns:
+        CA Certificate.
+    """
+    warnings.warn(  # noqa: B028
+        "generate_ca() is deprecated. Use Certificate.generate_self_signed_ca() instead.",
+        DeprecationWarning,
+    )
+    attributes = CertificateRequestAttributes(
+        common_name=common_name,
+        sans_dns=sans_dns,
+        sans_ip=sans_ip,
+        sans_oid=sans_oid,
+        organization=organization,
+        organizational_unit=organizational_unit,
+        email_address=email_address,
+        country_name=country_name,
+        state_or_province_name=state_or_province_name,
+        locality_name=locality_name,
+        is_ca=True,
+    )
+    return Certificate.generate_self_signed_ca(attributes, private_key, validity)
+
+
+def _san_extension(
+    email_address: str | None = None,
+    sans_dns: Collection[str] | None = frozenset(),
+    sans_ip: Collection[str] | None = frozenset(),
+    sans_oid: Collection[str] | None = frozenset(),
+) -> x509.SubjectAlternativeName | None:
+    sans: list[x509.GeneralName] = []
+    if email_address:
+        # If an e-mail address was provided, it should always be in the SAN
+        sans.append(x509.RFC822Name(email_address))
+    if sans_dns:
+        sans.extend([x509.DNSName(san) for san in sans_dns])
+    if sans_ip:
+        sans.extend([x509.IPAddress(ipaddress.ip_address(san)) for san in sans_ip])
+    if sans_oid:
+        sans.extend([x509.RegisteredID(x509.ObjectIdentifier(san)) for san in sans_oid])
+    if not sans:
+        return None
+    return x509.SubjectAlternativeName(sans)
+
+
+def generate_certificate(
+    csr: CertificateSigningRequest,
+    ca: Certificate,
+    ca_private_key: PrivateKey,
+    validity: timedelta,
+    is_ca: bool = False,
+) -> Certificate:
+    """Generate a TLS certificate based on a CSR.
+
+    Args:
+        csr (CertificateSigningRequest): CSR
+        ca (Certificate): CA Certificate
+        ca_private_key (PrivateKey): CA private key
+        validity (timedelta): Certificate validity time
+        is_ca (bool): Whether the certificate is a CA certificate
+
+    Returns:
+        Certificate: Certificate
+    """
+    warnings.warn(  # noqa: B028
+        "generate_certificate() is deprecated. Use Certificate.generate() instead.",
+        DeprecationWarning,
+    )
+    return Certificate.generate(
+        csr=csr,
+        ca=ca,
+        ca_private_key=ca_private_key,
+        validity=validity,
+        is_ca=is_ca,
+    )
+
+
+def _extract_subject_name_attributes(
+    attributes: CertificateRequestAttributes,
+) -> x509.Name | None:
+    subject_name_attributes: list[x509.NameAttribute[str | bytes]] = []
+    if attributes.common_name:
+        subject_name_attributes.append(
+            x509.NameAttribute(x509.NameOID.COMMON_NAME, attributes.common_name)
+        )
+    if attributes.add_unique_id_to_subject_name:
+        unique_identifier = uuid.uuid4()
+        subject_name_attributes.append(
+            x509.NameAttribute(x509.NameOID.X500_UNIQUE_IDENTIFIER, str(unique_identifier))
+        )
+    if attributes.organization:
+        subject_name_attributes.append(
+            x509.NameAttribute(x509.NameOID.ORGANIZATION_NAME, attributes.organization)
+        )
+    if attributes.organizational_unit:
+        subject_name_attributes.append(
+            x509.NameAttribute(
+                x509.NameOID.ORGANIZATIONAL_UNIT_NAME,
+                attributes.organizational_unit,
+            )
+        )
+    if attributes.email_address:
+        subject_name_attributes.append(
+            x509.NameAttribute(x509.NameOID.EMAIL_ADDRESS, attributes.email_address)
+        )
+    if attributes.country_name:
+        subject_name_attributes.append(
+            x509.NameAttribute(x509.NameOID.COUNTRY_NAME, attributes.country_name)
+        )
+    if attributes.state_or_province_name:
+        subject_name_attributes.append(
+            x509.NameAttribute(
+                x509.NameOID.STATE_OR_PROVINCE_NAME,
+                attributes.state_or_province_name,
+            )
+        )
+    if attributes.locality_name:
+        subject_name_attributes.append(
+            x509.NameAttribute(x509.NameOID.LOCALITY_NAME, attributes.locality_name)
+        )
+
+    if subject_name_attributes:
+        return x509.Name(subject_name_attributes)
+
+    return None
+
+
+def _generate_certificate_request_extensions(
+    authority_key_identifier: bytes,
+    csr: x509.CertificateSigningRequest,
+    is_ca: bool,
+) -> list[x509.Extension[x509.ExtensionType]]:
+    """Generate a list of certificate extensions from a CSR and other known information.
+
+    Args:
+        authority_key_identifier (bytes): Authority key identifier
+        csr (x509.CertificateSigningRequest): CSR
+        is_ca (bool): Whether the certificate is a CA certificate
+
+    Returns:
+        List[x509.Extension]: List of extensions
+    """
+    cert_extensions_list: list[x509.Extension[x509.ExtensionType]] = [
+        x509.Extension(
+            oid=ExtensionOID.AUTHORITY_KEY_IDENTIFIER,
+            value=x509.AuthorityKeyIdentifier(
+                key_identifier=authority_key_identifier,
+                authority_cert_issuer=None,
+                authority_cert_serial_number=None,
+            ),
+            critical=False,
+        ),
+        x509.Extension(
+            oid=ExtensionOID.SUBJECT_KEY_IDENTIFIER,
+            value=x509.SubjectKeyIdentifier.from_public_key(csr.public_key()),
+            critical=False,
+        ),
+        x509.Extension(
+            oid=ExtensionOID.BASIC_CONSTRAINTS,
+            critical=True,
+            value=x509.BasicConstraints(ca=is_ca, path_length=None),
+        ),
+    ]
+    if sans := _generate_subject_alternative_name_extension(csr):
+        cert_extensions_list.append(sans)
+
+    if is_ca:
+        cert_extensions_list.append(
+            x509.Extension(
+                ExtensionOID.KEY_USAGE,
+                critical=True,
+                value=x509.KeyUsage(
+                    digital_signature=False,
+                    content_commitment=False,
+                    key_encipherment=False,
+                    data_encipherment=False,
+                    key_agreement=False,
+                    key_cert_sign=True,
+                    crl_sign=True,
+                    encipher_only=False,
+                    decipher_only=False,
+                ),
+            )
+        )
+    elif isinstance(csr.public_key(), ec.EllipticCurvePublicKey) and (
+        ExtensionOID.KEY_USAGE not in {ext.oid for ext in csr.extensions}
+    ):
+        cert_extensions_list.append(
+            x509.Extension(
+                ExtensionOID.KEY_USAGE,
+                critical=True,
+                value=x509.KeyUsage(
+                    digital_signature=True,
+                    content_commitment=False,
+                    key_encipherment=False,
+                    data_encipherment=False,
+                    key_agreement=False,
+                    key_cert_sign=False,
+                    crl_sign=False,
+                    encipher_only=False,
+                    decipher_only=False,
+                ),
+            )
+        )
+
+    existing_oids = {ext.oid for ext in cert_extensions_list}
+    for extension in csr.extensions:
+        if extension.oid == ExtensionOID.SUBJECT_ALTERNATIVE_NAME:
+            continue
+        if extension.oid in existing_oids:
+            logger.warning("Extension %s is managed by the TLS provider, ignoring.", extension.oid)
+            continue
+        cert_extensions_list.append(extension)
+
+    return cert_extensions_list
+
+
+def _generate_subject_alternative_name_extension(
+    csr: x509.CertificateSigningRequest,
+) -> x509.Extension[x509.ExtensionType] | None:
+    sans: list[x509.GeneralName] = []
+    try:
+        loaded_san_ext = csr.extensions.get_extension_for_class(x509.SubjectAlternativeName)
+        sans.extend([
+            x509.DNSName(name) for name in loaded_san_ext.value.get_values_for_type(x509.DNSName)
+        ])
+        sans.extend([
+            x509.IPAddress(ip) for ip in loaded_san_ext.value.get_values_for_type(x509.IPAddress)
+        ])
+        sans.extend([
+            x509.RegisteredID(oid)
+            for oid in loaded_san_ext.value.get_values_for_type(x509.RegisteredID)
+        ])
+        sans.extend([
+            x509.RFC822Name(name)
+            for name in loaded_san_ext.value.get_values_for_type(x509.RFC822Name)
+        ])
+    except x509.ExtensionNotFound:
+        pass
+    # If email is present in the CSR Subject, make sure it is also in the SANS
+    # to conform to RFC 5280.
+    email = csr.subject.get_attributes_for_oid(NameOID.EMAIL_ADDRESS)
+    if email:
+        email_rfc822 = x509.RFC822Name(str(email[0].value))
+        if email_rfc822 not in sans:
+            sans.append(email_rfc822)
+
+    return (
+        x509.Extension(
+            oid=ExtensionOID.SUBJECT_ALTERNATIVE_NAME,
+            critical=False,
+            value=x509.SubjectAlternativeName(sans),
+        )
+        if sans
+        else None
+    )
+
+
+class CertificatesRequirerCharmEvents(CharmEvents):
+    """List of events that the TLS Certificates requirer charm can leverage."""
+
+    certificate_available = EventSource(CertificateAvailableEvent)
+    certificate_denied = EventSource(CertificateDeniedEvent)
+
+
+if TYPE_CHECKING:
+    _CertificateRequestsByMode: TypeAlias = dict[
+        Literal[Mode.APP, Mode.UNIT], list[CertificateRequestAttributes]
+    ]
+    # Each request input may be supplied either statically or as a capability-aware
+    # callable invoked with the provider's advertised ProviderCapabilities (or None).
+    _CertificateRequestsArg: TypeAlias = (
+        list[CertificateRequestAttributes]
+        | Callable[[ProviderCapabilities | None], list[CertificateRequestAttributes]]
+        | None
+    )
+    _CertificateRequestsByModeArg: TypeAlias = (
+        _CertificateRequestsByMode
+        | Callable[[ProviderCapabilities | None], _CertificateRequestsByMode]
+        | None
+    )
+
+
+class TLSCertificatesRequiresV4(Object):
+    """A class to manage the TLS certificates interface for a unit or app."""
+
+    on = CertificatesRequirerCharmEvents()  # type: ignore[reportAssignmentType]
+
+    def __init__(
+        self,
+        charm: CharmBase,
+        relationship_name: str,
+        certificate_requests: _CertificateRequestsArg = None,
+        mode: Mode = Mode.UNIT,
+        refresh_events: list[BoundEvent] | None = None,
+        private_key: PrivateKey | None = None,
+        renewal_relative_time: float = 0.9,
+        certificate_requests_by_mode: _CertificateRequestsByModeArg = None,
+        key_algorithm: KeyAlgorithm | str = KeyAlgorithm.RSA,
+        key_size: int | None = None,
+    ):
+        """Create a new instance of the TLSCertificatesRequiresV4 class.
+
+        Args:
+            charm (CharmBase): The charm instance to relate to.
+            relationship_name (str): The name of the relation that provides the certificates.
+            certificate_requests (List[CertificateRequestAttributes] | Callable):
+                The attributes of the certificate requests.
+                - Use this when mode is Mode.UNIT or Mode.APP (single mode).
+                - Must be None or empty when using mode=Mode.APP_AND_UNIT.
+                - Mutually exclusive with certificate_requests_by_mode.
+                - May be supplied as a list, or as a capability-aware callable returning a
+                  list. The callable is invoked with the provider's currently advertised
+                  ``ProviderCapabilities`` (or ``None`` when none are advertised yet) and is
+                  resolved on every hook that builds requests (reconcile and renewal). Keep it
+                  a pure read with no side effects; gating churn is the charm's responsibility.
+                  Until the first resolution, the public ``certificate_requests`` attribute is
+                  empty.
+            mode (Mode): Whether to use UNIT, APP or APP_AND_UNIT certificates mode. Default is
+                Mode.UNIT.
+                In UNIT mode the requirer will place the csr in the unit relation data.
+                Each unit will manage its private key,
+                certificate signing request and certificate.
+                UNIT mode is for use cases where each unit has its own identity.
+                If you don't know which mode to use, you likely need UNIT.
+                In APP mode the leader unit will place the csr in the app relation databag.
+                APP mode is for use cases where the underlying application needs the certificate
+                for example using it as an intermediate CA to sign other certificates.
+                The certificate can only be accessed by the leader unit.
+                APP_AND_UNIT mode is a hybrid mode where the leader unit places the csr in the
+                app relation databag and all units place the csr in the unit relation databag.
+                This mode allows to share one integration for the certificates that are similar
+                in nature but vary in scope.
+            refresh_events (List[BoundEvent]): A list of events to trigger a refresh of
+              the certificates.
+            private_key (Optional[PrivateKey]): The private key to use for the certificates.
+                If provided, it will be used instead of generating a new one.
+                In APP_AND_UNIT mode, the same key is used for both scopes.
+                If the key is not valid an exception will be raised.
+                Using this parameter is discouraged,
+                having to pass around private keys manually can be a security concern.
+                Allowing the library to generate and manage the key is the more secure approach.
+            renewal_relative_time (float): The time to renew the certificate relative to its
+                expiry.
+                Default is 0.9, meaning 90% of the validity period.
+                The minimum value is 0.5, meaning 50% of the validity period.
+                If an invalid value is provided, an exception will be raised.
+            key_algorithm (KeyAlgorithm | str): Algorithm for library-generated keys,
+                :attr:`KeyAlgorithm.RSA` (default) or :attr:`KeyAlgorithm.ECDSA`.
+                Plain strings (``"rsa"``, ``"ecdsa"``) are accepted.
+            key_size (int | None): Size of library-generated keys in bits. RSA supports 2048,
+                3072 and 4096; ECDSA supports 256 (P-256) and 384 (P-384). Defaults to 2048 for
+                RSA and 256 for ECDSA. Applies to newly generated and regenerated keys, not to
+                persisted or imported keys; compare :attr:`PrivateKey.algorithm` and
+                :attr:`PrivateKey.key_size` and call :meth:`regenerate_private_key` to rotate.
+            certificate_requests_by_mode
+                (Dict[Literal[Mode.APP, Mode.UNIT], List[CertificateRequestAttributes]]):
+                A dictionary mapping modes to their certificate request lists.
+                - Required when mode=Mode.APP_AND_UNIT.
+                - Must be None when mode is Mode.UNIT or Mode.APP.
+                - Keys must be Mode.APP and/or Mode.UNIT (not Mode.APP_AND_UNIT).
+                - Mutually exclusive with certificate_requests.
+                - May also be supplied as a capability-aware callable returning the dictionary
+                  (same resolution semantics as the callable form of certificate_requests),
+                  so APP_AND_UNIT requests can react to provider capabilities too.
+
+        Example:
+                    certificate_requests_by_mode={
+                        Mode.APP: [CertificateRequestAttributes(common_name="app.example.com")],
+                        Mode.UNIT: [CertificateRequestAttributes(common_name="unit.example.com")],
+                    }
+        """
+        if refresh_events is None:
+            refresh_events = []
+        if certificate_requests is None:
+            certificate_requests = []
+        super().__init__(charm, relationship_name)
+        if not self.model.juju_version.has_secrets:
+            logger.warning("This version of the TLS library requires Juju secrets (Juju >= 3.0)")
+        if not self._mode_is_valid(mode):
+            raise TLSCertificatesError(
+                "Invalid mode. Must be Mode.UNIT, Mode.APP, or Mode.APP_AND_UNIT"
+            )
+        try:
+            algorithm = KeyAlgorithm(key_algorithm)
+        except ValueError:
+            raise TLSCertificatesError(
+                "Invalid key algorithm or size: use RSA 2048/3072/4096 or ECDSA 256/384"
+            ) from None
+        if key_size is None:
+            key_size = _DEFAULT_KEY_SIZES[algorithm]
+        if key_size not in _SUPPORTED_KEY_SIZES[algorithm]:
+            raise TLSCertificatesError(
+                "Invalid key algorithm or size: use RSA 2048/3072/4096 or ECDSA 256/384"
+            )
+        self.charm = charm
+        self.relationship_name = relationship_name
+        self.mode = mode
+        self.key_algorithm = algorithm
+        self.key_size = key_size
+        self._certificate_requests_input = certificate_requests
+        self._certificate_requests_by_mode = certificate_requests_by_mode
+        if callable(certificate_requests) or callable(certificate_requests_by_mode):
+            # A capability-aware callable is resolved on every hook that builds requests
+            # (reconcile and renewal), since it depends on relation data (the provider's
+            # advertised capabilities) that isn't readable at construction time. The
+            # mode/parameter pairing is validated eagerly; the callable's (deferred) content
+            # is validated each time it is resolved. Until then, certificate_requests is empty.
+            if mode == Mode.APP_AND_UNIT and certificate_requests:
+                raise TLSCertificatesError(
+                    "certificate_requests must be None in APP_AND_UNIT mode; "
+                    "use certificate_requests_by_mode."
+                )
+            if mode != Mode.APP_AND_UNIT and certificate_requests_by_mode is not None:
+                raise TLSCertificatesError(
+                    "certificate_requests_by_mode must be None when the mode is UNIT or APP."
+                )
+            self.certificate_requests: list[CertificateRequestAttributes] = []
+            self._certificate_mode_map: dict[
+                CertificateRequestAttributes, Literal[Mode.APP, Mode.UNIT]
+            ] = {}
+        else:
+            self.certificate_requests, self._certificate_mode_map = (
+                self._validate_and_map_certificate_requests(
+                    mode, certificate_requests_by_mode, certificate_requests
+                )
+            )
+        if private_key and not private_key.is_valid():
+            raise TLSCertificatesError("Invalid private key")
+        if renewal_relative_time <= 0.5 or renewal_relative_time > 1.0:
+            raise TLSCertificatesError(
+                "Invalid renewal relative time. Must be between 0.5 and 1.0"
+            )
+        self._private_key = private_key
+        self._private_key_cache: dict[Mode, PrivateKey | None] = {}
+        self.renewal_relative_time = renewal_relative_time
+        self.framework.observe(charm.on[relationship_name].relation_created, self._configure)
+        self.framework.observe(charm.on[relationship_name].relation_changed, self._configure)
+        self.framework.observe(charm.on.leader_elected, self._configure)
+        self.framework.observe(
+            charm.on[relationship_name].relation_broken, self._on_relation_broken
+        )
+        self.framework.observe(charm.on.secret_expired, self._on_secret_expired)
+        self.framework.observe(charm.on.secret_remove, self._on_secret_remove)
+        for event in refresh_events:
+            self.framework.observe(event, self._configure)
+        self._security_logger = _OWASPLogger(application=f"tls-certificates-{charm.app.name}")
+
+    def _validate_app_and_unit_mode_requests(
+        self,
+        multi_mode_certificate_requests: dict[
+            Literal[Mode.APP, Mode.UNIT], list[CertificateRequestAttributes]
+        ],
+    ) -> None:
+        """Validate certificate requests for APP_AND_UNIT mode.
+
+        Args:
+            multi_mode_certificate_requests: Dictionary mapping modes to certificate requests.
+
+        Raises:
+            TLSCertificatesError: If validation fails.
+        """
+        invalid_keys = {
+            key for key in multi_mode_certificate_requests if key not in (Mode.APP, Mode.UNIT)
+        }
+        if invalid_keys:
+            raise TLSCertificatesError(
+                "Invalid certificate_requests_by_mode keys. Only Mode.APP and Mode.UNIT are "
+                "supported in APP_AND_UNIT mode."
+            )
+
+        app_csrs = multi_mode_certificate_requests.get(Mode.APP, [])
+        unit_csrs = multi_mode_certificate_requests.get(Mode.UNIT, [])
+        for app_csr in app_csrs:
+            if app_csr in unit_csrs:
+                raise TLSCertificatesError(
+                    f"Duplicate certificate request found in both APP and UNIT modes. "
+                    f"Common name: '{app_csr.common_name}'. "
+                    "Provide distinct requests per mode, or use Mode.UNIT if the same "
+                    "request is needed for all units."
+                )
+
+        for mode_csrs in multi_mode_certificate_requests.values():
+            for csr in mode_csrs:
+                if not csr.is_valid():
+                    raise TLSCertificatesError("Invalid certificate request")
+
+    def _validate_and_map_certificate_requests(
+        self,
+        mode: Mode,
+        multi_mode_certificate_requests: dict[
+            Literal[Mode.APP, Mode.UNIT], list[CertificateRequestAttributes]
+        ]
+        | None,
+        certificate_requests: list[CertificateRequestAttributes],
+    ) -> tuple[
+        list[CertificateRequestAttributes],
+        dict[CertificateRequestAttributes, Literal[Mode.APP, Mode.UNIT]],
+    ]:
+        csrs: list[CertificateRequestAttributes] = []
+        mode_map: dict[CertificateRequestAttributes, Literal[Mode.APP, Mode.UNIT]] = {}
+
+        if mode == Mode.APP_AND_UNIT:
+            if not multi_mode_certificate_requests:
+                raise TLSCertificatesError("Multi mode certificate requests must be provided")
+            if certificate_requests:
+                raise TLSCertificatesError(
+                    "Certificate requests must be provided in certificate_requests_by_mode "
+                    "when the mode is APP_AND_UNIT"
+                )
+
+            self._validate_app_and_unit_mode_requests(multi_mode_certificate_requests)
+
+            if not multi_mode_certificate_requests.get(
+                Mode.APP
+            ) and not multi_mode_certificate_requests.get(Mode.UNIT):
+                logger.warning("APP_AND_UNIT mode enabled but no certificate requests provided")
+
+            for m, mode_csrs in multi_mode_certificate_requests.items():
+                for csr in mode_csrs:
+                    csrs.append(csr)
+                    mode_map[csr] = m
+        else:
+            if multi_mode_certificate_requests:
+                raise TLSCertificatesError(
+                    "certificate_requests_by_mode must be None when the mode is UNIT or APP"
+                )
+            target_mode: Literal[Mode.APP, Mode.UNIT] = Mode.APP if mode == Mode.APP else Mode.UNIT
+
+            for certificate_request in certificate_requests:
+                if not certificate_request.is_valid():
+                    raise TLSCertificatesError("Invalid certificate request")
+                csrs.append(certificate_request)
+                mode_map[certificate_request] = target_mode
+
+        return csrs, mode_map
+
+    def _configure(self, _: EventBase | None = None):
+        """Handle TLS Certificates Relation Data.
+
+        This method is called during any TLS relation event.
+        It will generate a private key if it doesn't exist yet.
+        It will send certificate requests if they haven't been sent yet.
+        It will find available certificates and emit events.
+        """
+        if not self.model.get_relation(self.relationship_name):
+            logger.debug("TLS relation not created yet.")
+            return
+        self._resolve_certificate_requests()
+        self._ensure_private_key()
+        self._cleanup_certificate_requests()
+        self._send_certificate_requests()
+        self._find_available_certificates()
+        self._renew_expiring_certificates()
+
+    def _resolve_certificate_requests(self) -> None:
+        """Resolve callable ``certificate_requests``/``certificate_requests_by_mode``.
+
+        When either request input was provided as a capability-aware callable, invoke it
+        with the provider's currently-advertised capabilities (or ``None`` when none are
+        advertised yet) and update ``self.certificate_requests`` and
+        ``self._certificate_mode_map``.
+
+        This is a no-op when both inputs were static, in which case they were validated and
+        mapped once in ``__init__``. It must be called from every code path that builds and
+        sends requests (both the reconcile path in ``_configure`` and the renewal path in
+        ``_renew_certificate_request``), so that renewals don't iterate an empty request set
+        when a callable is used.
+        """
+        if not (
+            callable(self._certificate_requests_input)
+            or callable(self._certificate_requests_by_mode)
+        ):
+            return
+        capabilities = self.get_provider_capabilities()
+        requests = self._certificate_requests_input
+        if callable(requests):
+            requests = requests(capabilities)
+        requests_by_mode = self._certificate_requests_by_mode
+        if callable(requests_by_mode):
+            requests_by_mode = requests_by_mode(capabilities)
+        self.certificate_requests, self._certificate_mode_map = (
+            self._validate_and_map_certificate_requests(
+                self.mode, requests_by_mode, requests or []
+            )
+        )
+
+    def _mode_is_valid(self, mode: Mode) -> bool:
+        return mode in [Mode.UNIT, Mode.APP, Mode.APP_AND_UNIT]
+
+    def _flatten_modes(self) -> list[Literal[Mode.APP, Mode.UNIT]]:
+        if self.mode == Mode.APP_AND_UNIT:
+            return [Mode.APP, Mode.UNIT]
+        return [self.mode]
+
+    def _get_app_or_unit_for_mode(self, mode: Literal[Mode.APP, Mode.UNIT]) -> Application | Unit:
+        return self.model.app if mode == Mode.APP else self.model.unit
+
+    def _get_mode_for_certificate_request(
+        self, certificate_request: CertificateRequestAttributes
+    ) -> Literal[Mode.APP, Mode.UNIT]:
+        """Resolve the mode for a request based on provided attributes."""
+        if self.mode != Mode.APP_AND_UNIT:
+            return self.mode
+
+        try:
+            return self._certificate_mode_map[certificate_request]
+        except KeyError:
+            raise TLSCertificatesError(
+                "Certificate request not found in configured requests for APP_AND_UNIT mode"
+            )
+
+    def _get_mode_for_csr(
+        self, certificate_signing_request: CertificateSigningRequest, is_ca: bool
+    ) -> Literal[Mode.APP, Mode.UNIT] | None:
+        """Resolve the mode for a CSR based on configured request attributes."""
+        if self.mode != Mode.APP_AND_UNIT:
+            return self.mode
+        try:
+            request = CertificateRequestAttributes.from_csr(certificate_signing_request, is_ca)
+            return self._certificate_mode_map[request]
+        except KeyError:
+            logger.debug("CSR does not match configured requests - Skipping")
+            return None
+
+    def _private_key_generated_for_mode(self, mode: Literal[Mode.APP, Mode.UNIT]) -> bool:
+        try:
+            secret = self.charm.model.get_secret(label=self._get_private_key_secret_label(mode))
+            secret.get_content(refresh=True)
+            return True
+        except SecretNotFoundError:
+            return False
+
+    def _get_mode_and_private_key(
+        self, certificate_request: CertificateRequestAttributes
+    ) -> tuple[Literal[Mode.APP, Mode.UNIT], PrivateKey | None]:
+        mode = self._get_mode_for_certificate_request(certificate_request)
+        return mode, self._get_private_key_for_mode(mode)
+
+    def _get_private_key_for_mode(self, mode: Literal[Mode.APP, Mode.UNIT]) -> PrivateKey | None:
+        if self._private_key:
+            return self._private_key
+        if mode in self._private_key_cache:
+            return self._private_key_cache[mode]
+        if mode == Mode.APP and not self.model.unit.is_leader():
+            logger.warning("Only the leader can access the private key in APP mode")
+            return None
+        try:
+            secret = self.charm.model.get_secret(label=self._get_private_key_secret_label(mode))
+            private_key_str = secret.get_content(refresh=True)["private-key"]
+            private_key = PrivateKey.from_string(private_key_str)
+            self._private_key_cache[mode] = private_key
+            return private_key
+        except (SecretNotFoundError, KeyError):
+            return None
+
+    def _ensure_private_key_for_mode(self, mode: Literal[Mode.APP, Mode.UNIT]) -> None:
+        if self._private_key:
+            return
+        if self._private_key_generated_for_mode(mode):
+            logger.debug("Private key already generated for mode %s", mode)
+            return
+        if mode == Mode.APP and not self.model.unit.is_leader():
+            logger.debug("Not leader, skipping private key generation in APP mode")
+            return
+        if mode == Mode.APP and self._migrate_legacy_app_private_key():
+            return
+        self._generate_private_key(mode)
+
+    def _migrate_legacy_app_private_key(self) -> bool:
+        """Adopt an APP private key stored under the legacy label by an older version."""
+
+        def store(private_key: str) -> None:
+            self._store_private_key_in_secret(PrivateKey.from_string(private_key), Mode.APP)
+
+        return _backwards_compatibility.migrate_legacy_app_private_key(
+            model=self.model,
+            libid=LIBID,
+            relationship_name=self.relationship_name,
+            store_app_private_key=store,
+        )
+
+    def _validate_secret_exists(self, secret: Secret) -> None:
+        secret.get_info()  # Will raise `SecretNotFoundError` if the secret does not exist
+
+    def _on_secret_remove(self, event: SecretRemoveEvent) -> None:
+        """Handle Secret Removed Event."""
+        try:
+            # Ensure the secret exists before trying to remove it, otherwise
+            # the unit could be stuck in an error state. See the docstring of
+            # `remove_revision` and the below issue for more information.
+            # https://github.com/juju/juju/issues/19036
+            self._validate_secret_exists(event.secret)
+            event.secret.remove_revision(event.revision)
+        except SecretNotFoundError:
+            logger.warning(
+                "No such secret %s, nothing to remove",
+                event.secret.label or event.secret.id,
+            )
+            return
+
+    def _on_secret_expired(self, event: SecretExpiredEvent) -> None:
+        """Handle Secret Expired Event.
+
+        Renews certificate requests and removes the expired secret.
+        """
+        if not event.secret.label or not event.secret.label.startswith(f"{LIBID}-certificate"):
+            return
+        try:
+            csr_str = event.secret.get_content(refresh=True)["csr"]
+        except ModelError:
+            logger.error("Failed to get CSR from secret - Skipping")
+            return
+        csr = CertificateSigningRequest.from_string(csr_str)
+        self._renew_certificate_request(csr)
+        event.secret.remove_all_revisions()
+
+    def _on_relation_broken(self, event: RelationBrokenEvent) -> None:
+        """Handle Relation Broken Event.
+
+        Clean up secrets when relation is broken.
+        This handler removes both private key secrets and certificate secrets
+        associated with the removed relation.
+        """
+        try:
+            relation = self.model.get_relation(self.relationship_name)
+            if relation and relation.id != event.relation.id:
+                logger.warning(
+                    "Multiple relations with name %s detected, skipping secret cleanup",
+                    self.relationship_name,
+                )
+                return
+        except TooManyRelatedAppsError:
+            logger.warning(
+                "Multiple relations with name %s detected (TooManyRelatedAppsError), "
+                "skipping secret cleanup",
+                self.relationship_name,
+            )
+            return
+
+        modes_to_clean = self._flatten_modes()
+
+        for mode in modes_to_clean:
+            if mode == Mode.APP and not self.model.unit.is_leader():
+                continue
+
+            try:
+                self._remove_private_key_secret(mode)
+                logger.warning("Removed private key secret for mode %s", mode)
+            except SecretNotFoundError:
+                logger.debug("No private key secret to clean up for mode %s", mode)
+
+            self._remove_certificate_secrets_for_relation(mode)
+
+    def sync(self) -> None:
+        """Sync TLS Certificates Relation Data.
+
+        This method allows the requirer to sync the TLS certificates relation data
+        without waiting for the refresh events to be triggered.
+        """
+        self._configure()
+
+    def renew_certificate(self, certificate: ProviderCertificate) -> None:
+        """Request the renewal of the provided certificate."""
+        certificate_signing_request = certificate.certificate_signing_request
+
+        modes_to_try = self._flatten_modes()
+
+        for mode in modes_to_try:
+            if mode == Mode.APP and not self.model.unit.is_leader():
+                continue
+            secret = self._get_certificate_secret(certificate_signing_request, mode)
+            if secret:
+                current_csr = secret.get_content(refresh=True).get("csr", "")
+                if current_csr == str(certificate_signing_request):
+                    self._renew_certificate_request(certificate_signing_request)
+                    secret.remove_all_revisions()
+                    return
+
+        logger.warning("No matching secret found - Skipping renewal")
+
+    def _renew_certificate_request(self, csr: CertificateSigningRequest):
+        """Remove existing CSR from relation data and create a new one."""
+        # Resolve a callable request set here too: renewal runs on secret_expired,
+        # which does not go through _configure, so without this the new CSR would
+        # never be re-sent when certificate_requests is a callable.
+        self._resolve_certificate_requests()
+        self._remove_requirer_csr_from_relation_data(csr)
+        self._send_certificate_requests()
+        logger.info("Renewed certificate request")
+
+    def _remove_requirer_csr_from_relation_data(
+        self, csr: CertificateSigningRequest, mode: Literal[Mode.APP, Mode.UNIT] | None = None
+    ) -> None:
+        """Remove a CSR from relation data.
+
+        Args:
+            csr: The CSR to remove.
+            mode: Optional mode to specify which databag to remove from.
+                  If None, removes from all applicable databags based on self.mode.
+        """
+        relation = self.model.get_relation(self.relationship_name)
+        if not relation:
+            logger.debug("No relation: %s", self.relationship_name)
+            return
+        if not self.get_csrs_from_requirer_relation_data():
+            logger.info("No CSRs in relation data - Doing nothing")
+            return
+
+        csr_str = str(csr).strip()
+        modes_to_process: list[Literal[Mode.APP, Mode.UNIT]]
+        if mode is not None:
+            modes_to_process = [mode]
+        elif self.mode == Mode.APP_AND_UNIT:
+            modes_to_process = [Mode.APP, Mode.UNIT]
+        else:
+            modes_to_process = self._flatten_modes()
+
+        for current_mode in modes_to_process:
+            if current_mode == Mode.APP and not self.model.unit.is_leader():
+                continue
+            app_or_unit = self._get_app_or_unit_for_mode(current_mode)
+            try:
+                requirer_relation_data = _RequirerData.load(relation.data[app_or_unit])
+            except DataValidationError:
+                logger.warning("Invalid relation data - Skipping removal of CSR")
+                continue
+            before_len = len(requirer_relation_data.certificate_signing_requests)
+            new_relation_data = [
+                requirer_csr
+                for requirer_csr in requirer_relation_data.certificate_signing_requests
+                if requirer_csr.certificate_signing_request.strip() != csr_str
+            ]
+            try:
+                _RequirerData(certificate_signing_requests=new_relation_data).dump(
+                    relation.data[app_or_unit]
+                )
+                logger.info("Removed CSR from relation data")
+            except ModelError:
+                logger.warning("Failed to update relation data")
+                continue
+            if len(new_relation_data) < before_len:
+                return
+
+    @property
+    def private_key(self) -> PrivateKey | None:
+        """Return the private key.
+
+        In APP_AND_UNIT mode, this property returns the UNIT private key.
+        Use get_private_key(mode) to access the APP key.
+        """
+        return self.get_private_key()
+
+    def get_private_key(self, mode: Mode | None = None) -> PrivateKey | None:
+        """Get the private key for a specific mode.
+
+        Args:
+            mode: The mode to get the private key for.
+                  In APP_AND_UNIT mode: defaults to Mode.UNIT if not specified.
+                  In UNIT/APP mode: this parameter is ignored (uses self.mode).
+
+        Returns:
+            The private key for the specified mode, or None if not available.
+        """
+        if mode is None:
+            mode = Mode.UNIT if self.mode == Mode.APP_AND_UNIT else self.mode
+        if mode == Mode.APP_AND_UNIT:
+            raise TLSCertificatesError("Mode must be Mode.APP or Mode.UNIT, not Mode.APP_AND_UNIT")
+        return self._get_private_key_for_mode(mode)
+
+    def get_private_key_secret_id(self, mode: Mode | None = None) -> str | None:
+        """Get the secret ID for the library-generated private key.
+
+        This method provides access to the Juju secret ID containing the private key.
+
+        Returns:
+            The secret ID as a string if a library-generated private key secret exists,
+            None otherwise.
+
+        Returns None in the following cases:
+            - The private key was provided via the `private_key` parameter (no secret exists)
+            - No private key has not been generated yet
+            - In APP mode, when called from a non-leader unit
+            - In APP_AND_UNIT mode, when mode is not provided
+
+        Note:
+            The secret ID is an opaque identifier and does not reveal the private key material.
+            However, it should still be treated as sensitive metadata - avoid logging it or
+            placing it in public locations.
+
+            The returned ID is stable as long as the private key is not regenerated.
+            If regenerate_private_key() is called, a new secret may be created and this ID
+            may change.
+
+            The secret content or metadata must never be directly modified,
+            Any modifications may lead to unexpected behavior.
+        """
+        if self._private_key:
+            logger.debug("Private key was provided externally, no secret exists")
+            return None
+
+        if mode is None:
+            if self.mode == Mode.APP_AND_UNIT:
+                logger.warning(
+                    "Mode must be provided when calling "
+                    "get_private_key_secret_id in APP_AND_UNIT mode"
+                )
+                return None
+            mode = self.mode
+        if mode == Mode.APP_AND_UNIT:
+            logger.warning("Mode must be APP or UNIT")
+            return None
+
+        if mode == Mode.APP and not self.model.unit.is_leader():
+            logger.warning("Only the leader can access the private key secret ID in APP mode")
+            return None
+
+        if not self._private_key_generated_for_mode(mode):
+            logger.debug("No private key secret has been generated yet")
+            return None
+
+        try:
+            secret = self.charm.model.get_secret(label=self._get_private_key_secret_label(mode))
+            return secret.get_info().id
+        except SecretNotFoundError:
+            logger.warning("Private key secret not found")
+            return None
+
+    def _ensure_private_key(self) -> None:
+        """Make sure there is a private key to be used.
+
+        It will make sure there is a private key passed by the charm using the private_key
+        parameter or generate a new one otherwise.
+        """
+        # Remove the generated private key
+        # if one has been passed by the charm using the private_key parameter
+        if self._private_key:
+            for mode in self._flatten_modes():
+                self._remove_private_key_secret(mode)
+            return
+        for mode in self._flatten_modes():
+            self._ensure_private_key_for_mode(mode)
+
+    def regenerate_private_key(self, mode: Mode | None = None) -> None:
+        """Regenerate the private key.
+
+        Generate a new private key, remove old certificate requests and send new ones.
+
+        Args:
+            mode: Optional mode when using APP_AND_UNIT. If None, regenerates both.
+
+        Raises:
+            TLSCertificatesError: If the private key is passed by the charm using the
+                private_key parameter.
+        """
+        self._perform_key_rotation(private_key=None, mode=mode)
+
+    def import_private_key(self, private_key: PrivateKey, mode: Mode | None = None) -> None:
+        """Import an external.
+
+        Generate a new private key, remove old certificate requests and send new ones.
+        Replace library-managed keys with the provided external private key.
+        This will store the key in secrets, clean up old certificate requests,
+        and generate new CSRs with the imported key.
+
+        Args:
+            private_key: The private key to import. Must be a valid RSA or ECDSA key.
+            mode: Optional mode when using APP_AND_UNIT. If None both will be rotated.
+
+        Raises:
+            TLSCertificatesError: If private_key was provided during initialization,
+                or if the provided key is invalid.
+
+        Note:
+            After importing a key, the library will manage it like a library generated key.
+        """
+        if not private_key.is_valid():
+            raise TLSCertificatesError(
+                "Invalid private key provided. Must be RSA (at least 2048 bits) "
+                "or ECDSA P-256/P-384."
+            )
+        self._perform_key_rotation(private_key=private_key, mode=mode)
+
+    def _perform_key_rotation(
+        self, private_key: PrivateKey | None, mode: Mode | None = None
+    ) -> None:
+        """Perform key rotation by generating or importing a key.
+
+        Args:
+            private_key: The private key to use. If None, generates a new key.
+                If provided, imports the external key.
+            mode: Optional mode when using APP_AND_UNIT. If None, rotates both.
+        """
+        if self._private_key:
+            raise TLSCertificatesError(
+                "Private key is passed by the charm through the private_key parameter, "
+                "this function can't be used"
+            )
+        if self.mode == Mode.APP_AND_UNIT:
+            if mode == Mode.APP_AND_UNIT:
+                raise TLSCertificatesError("Mode must be APP or UNIT")
+            modes_to_regen: list[Literal[Mode.APP, Mode.UNIT]] = []
+            if mode is None or mode == Mode.UNIT:
+                modes_to_regen.append(Mode.UNIT)
+            if (mode is None or mode == Mode.APP) and self.model.unit.is_leader():
+                modes_to_regen.append(Mode.APP)
+            if not modes_to_regen:
+                logger.warning("No private keys to regenerate")
+                return
+            regenerated = False
+            for regen_mode in modes_to_regen:
+                if not self._private_key_generated_for_mode(regen_mode):
+                    logger.warning("No private key to regenerate for mode %s", regen_mode)
+                    continue
+                if regen_mode == Mode.APP and not self.model.unit.is_leader():
+                    logger.warning("Only the leader can regenerate the private key in APP mode")
+                    continue
+                if private_key:
+                    self._store_private_key_in_secret(private_key, regen_mode)
+                    logger.info("Imported external private key for mode %s", regen_mode)
+                else:
+                    self._generate_private_key(regen_mode)
+                regenerated = True
+            if not regenerated:
+                return
+        else:
+            if mode is not None and mode != self.mode:
+                raise TLSCertificatesError("Mode argument is only supported in APP_AND_UNIT mode")
+            if self.mode == Mode.APP and not self.model.unit.is_leader():
+                logger.warning("Only the leader can regenerate the private key in APP mode")
+                return
+            if not self._private_key_generated_for_mode(self.mode):
+                logger.warning("No private key to regenerate")
+                return
+            if private_key:
+                self._store_private_key_in_secret(private_key, self.mode)
+                logger.info("Imported external private key")
+            else:
+                self._generate_private_key(self.mode)
+        self._cleanup_certificate_requests()
+        self._send_certificate_requests()
+
+    def _generate_private_key(self, mode: Literal[Mode.UNIT, Mode.APP]) -> None:
+        """Generate a new private key and store it in a secret.
+
+        This is the case when the private key used is generated by the library.
+            and not passed by the charm using the private_key parameter.
+        """
+        self._store_private_key_in_secret(
+            PrivateKey.generate(key_size=self.key_size, key_algorithm=self.key_algorithm), mode
+        )
+        logger.info("Private key generated")
+
+    def _store_private_key_in_secret(
+        self, private_key: PrivateKey, mode: Literal[Mode.UNIT, Mode.APP]
+    ) -> None:
+        self._private_key_cache.pop(mode, None)
+        app_or_unit = self._get_app_or_unit_for_mode(mode)
+        try:
+            secret = self.charm.model.get_secret(label=self._get_private_key_secret_label(mode))
+            secret.set_content({"private-key": str(private_key)})
+            secret.get_content(refresh=True)
+        except SecretNotFoundError:
+            app_or_unit.add_secret(
+                content={"private-key": str(private_key)},
+                label=self._get_private_key_secret_label(mode),
+            )
+
+    def _remove_private_key_secret(self, mode: Literal[Mode.UNIT, Mode.APP]) -> None:
+        """Remove the private key secret."""
+        self._private_key_cache.pop(mode, None)
+        if mode == Mode.APP and not self.model.unit.is_leader():
+            logger.debug("Not leader, cannot remove app owned private key secret")
+            return
+        try:
+            secret = self.charm.model.get_secret(label=self._get_private_key_secret_label(mode))
+            secret.remove_all_revisions()
+        except SecretNotFoundError:
+            logger.warning("Private key secret not found, nothing to remove")
+        if mode == Mode.APP:
+            _backwards_compatibility.remove_legacy_app_private_key(
+                self.model, LIBID, self.relationship_name
+            )
+
+    def _csr_matches_certificate_request(
+        self, certificate_signing_request: CertificateSigningRequest, is_ca: bool
+    ) -> bool:
+        for certificate_request in self.certificate_requests:
+            if certificate_request == CertificateRequestAttributes.from_csr(
+                certificate_signing_request,
+                is_ca,
+            ):
+                return True
+        return False
+
+    def _certificate_requested(self, certificate_request: CertificateRequestAttributes) -> bool:
+        _, private_key = self._get_mode_and_private_key(certificate_request)
+        if not private_key:
+            return False
+        csr = self._certificate_requested_for_attributes(certificate_request)
+        if not csr:
+            return False
+        if not csr.certificate_signing_request.matches_private_key(key=private_key):
+            return False
+        return True
+
+    def _certificate_requested_for_attributes(
+        self,
+        certificate_request: CertificateRequestAttributes,
+    ) -> RequirerCertificateRequest | None:
+        for requirer_csr in self.get_csrs_from_requirer_relation_data():
+            if certificate_request == CertificateRequestAttributes.from_csr(
+                requirer_csr.certificate_signing_request,
+                requirer_csr.is_ca,
+            ):
+                return requirer_csr
+        return None
+
+    def get_csrs_from_requirer_relation_data(self) -> list[RequirerCertificateRequest]:
+        """Return list of requirer's CSRs from relation data.
+
+        App csrs can only be accessed by the leader unit.
+        """
+        if self.mode == Mode.APP and not self.model.unit.is_leader():
+            logger.debug("Not a leader unit - Skipping")
+            return []
+        relation = self.model.get_relation(self.relationship_name)
+        if not relation:
+            logger.debug("No relation: %s", self.relationship_name)
+            return []
+        certificate_signing_requests = self._load_requirer_csrs_from_relation_data(relation)
+        return [
+            RequirerCertificateRequest(
+                relation_id=relation.id,
+                certificate_signing_request=CertificateSigningRequest.from_string(
+                    csr.certificate_signing_request
+                ),
+                is_ca=csr.ca if csr.ca else False,
+            )
+            for csr in certificate_signing_requests
+        ]
+
+    def get_provider_certificates(self) -> list[ProviderCertificate]:
+        """Return list of certificates from the provider's relation data."""
+        return self._load_provider_certificates()
+
+    def get_request_errors(self) -> list[ProviderCertificateError]:
+        """Get all request errors from the provider's relation data.
+
+        Returns:
+            List of ProviderCertificateError objects representing failed certificate requests.
+        """
+        return self._load_provider_certificate_errors()
+
+    def get_provider_capabilities(self) -> ProviderCapabilities | None:
+        """Return the capabilities advertised by the provider, best-effort.
+
+        Returns:
+            A ProviderCapabilities object when the provider advertises capabilities,
+            or None when there is no relation, no remote application, the provider has
+            not advertised capabilities, or the provider data is invalid. Never raises.
+            Individual fields of the returned object may be None (unspecified).
+        """
+        relation = self.model.get_relation(self.relationship_name)
+        if not relation:
+            logger.debug("No relation: %s", self.relationship_name)
+            return None
+        if not relation.app:
+            logger.debug("No remote app in relation: %s", self.relationship_name)
+            return None
+        try:
+            provider_relation_data = _ProviderApplicationData.load(relation.data[relation.app])
+        except DataValidationError:
+            logger.warning("Invalid relation data")
+            return None
+        except ModelError:
+            logger.warning("Relation data not available")
+            return None
+        return provider_relation_data.capabilities
+
+    def get_request_error(self, csr: CertificateSigningRequest) -> ProviderCertificateError | None:
+        """Get the request error for a specific CSR.
+
+        Args:
+            csr: The certificate signing request to look up.
+
+        Returns:
+            ProviderCertificateError if an error exists for this CSR, None otherwise.
+        """
+        for provider_error in self._load_provider_certificate_errors():
+            if str(provider_error.certificate_signing_request) == str(csr):
+                return provider_error
+        return None
+
+    def _load_provider_certificates(self) -> list[ProviderCertificate]:
+        relation = self.model.get_relation(self.relationship_name)
+        if not relation:
+            logger.debug("No relation: %s", self.relationship_name)
+            return []
+        if not relation.app:
+            logger.debug("No remote app in relation: %s", self.relationship_name)
+            return []
+        try:
+            provider_relation_data = _ProviderApplicationData.load(relation.data[relation.app])
+        except DataValidationError:
+            logger.warning("Invalid relation data")
+            return []
+        except ModelError:
+            logger.warning("Relation data not available")
+            return []
+        return [
+            certificate.to_provider_certificate(relation_id=relation.id)
+            for certificate in provider_relation_data.certificates
+        ]
+
+    def _load_requirer_csrs_from_relation_data(
+        self, relation: Relation
+    ) -> list[_CertificateSigningRequest]:
+        """Load CSRs from relation data based on mode."""
+        csrs: list[_CertificateSigningRequest] = []
+
+        if self.mode != Mode.APP:
+            try:
+                unit_data = _RequirerData.load(relation.data[self.model.unit])
+                csrs.extend(unit_data.certificate_signing_requests)
+            except DataValidationError:
+                logger.warning("Invalid relation data for unit - Skipping")
+
+        if self.mode in (Mode.APP, Mode.APP_AND_UNIT) and self.model.unit.is_leader():
+            try:
+                app_data = _RequirerData.load(relation.data[self.model.app])
+                csrs.extend(app_data.certificate_signing_requests)
+            except DataValidationError:
+                if self.mode == Mode.APP:
+                    logger.warning("Invalid relation data")
+                else:
+                    logger.warning("Invalid relation data for app - Skipping")
+
+        return csrs
+
+    def _load_provider_certificate_errors(self) -> list[ProviderCertificateError]:
+        """Load provider certificate errors."""
+        relation = self.model.get_relation(self.relationship_name)
+        if not relation:
+            logger.debug("No relation: %s", self.relationship_name)
+            return []
+        if not relation.app:
+            logger.debug("No remote app in relation: %s", self.relationship_name)
+            return []
+        try:
+            provider_relation_data = _ProviderApplicationData.load(relation.data[relation.app])
+        except DataValidationError:
+            logger.warning("Invalid relation data")
+            return []
+
+        errors: list[ProviderCertificateError] = []
+        for entry in provider_relation_data.request_errors:
+            try:
+                csr_obj = CertificateSigningRequest.from_string(entry.csr)
+                errors.append(
+                    ProviderCertificateError(
+                        relation_id=relation.id,
+                        certificate_signing_request=csr_obj,
+                        error=entry.error,
+                    )
+                )
+            except TLSCertificatesError:
+                logger.debug("Invalid CSR in provider error entry - Skipping")
+                continue
+        return errors
+
+    def _request_certificate(
+        self, csr: CertificateSigningRequest, is_ca: bool, mode: Literal[Mode.APP, Mode.UNIT]
+    ) -> None:
+        """Add CSR to relation data."""
+        if mode == Mode.APP and not self.model.unit.is_leader():
+            logger.debug("Not a leader unit - Skipping")
+            return
+        relation = self.model.get_relation(self.relationship_name)
+        if not relation:
+            logger.debug("No relation: %s", self.relationship_name)
+            return
+        csr_str = str(csr).strip()
+
+        new_csr = _CertificateSigningRequest(certificate_signing_request=csr_str, ca=is_ca)
+        app_or_unit = self._get_app_or_unit_for_mode(mode)
+        try:
+            requirer_relation_data = _RequirerData.load(relation.data[app_or_unit])
+        except DataValidationError:
+            requirer_relation_data = _RequirerData(
+                certificate_signing_requests=[],
+            )
+        new_relation_data = list(requirer_relation_data.certificate_signing_requests)
+        new_relation_data.append(new_csr)
+        try:
+            _RequirerData(certificate_signing_requests=new_relation_data).dump(
+                relation.data[app_or_unit]
+            )
+            logger.info("Certificate signing request added to relation data.")
+        except ModelError:
+            logger.warning("Failed to update relation data")
+
+    def _send_certificate_requests(self):
+        for certificate_request in self.certificate_requests:
+            if not self._certificate_requested(certificate_request):
+                mode, private_key = self._get_mode_and_private_key(certificate_request)
+                if not private_key:
+                    logger.debug("Private key not generated yet for mode %s", mode)
+                    continue
+                csr = certificate_request.generate_csr(
+                    private_key=private_key,
+                )
+                if not csr:
+                    logger.warning("Failed to generate CSR")
+                    continue
+                self._request_certificate(csr=csr, is_ca=certificate_request.is_ca, mode=mode)
+
+    def get_assigned_certificate(
+        self, certificate_request: CertificateRequestAttributes
+    ) -> tuple[ProviderCertificate | None, PrivateKey | None]:
+        """Get the certificate that was assigned to the given certificate request."""
+        _, private_key = self._get_mode_and_private_key(certificate_request)
+        for requirer_csr in self.get_csrs_from_requirer_relation_data():
+            if certificate_request == CertificateRequestAttributes.from_csr(
+                requirer_csr.certificate_signing_request,
+                requirer_csr.is_ca,
+            ):
+                certificate = self._find_certificate_in_relation_data(requirer_csr)
+                return certificate, private_key if certificate else None
+        return None, None
+
+    def get_assigned_certificates(
+        self,
+        mode: Mode | None = None,
+    ) -> tuple[list[ProviderCertificate], PrivateKey | None]:
+        """Get certificates for a specific mode with the appropriate private key.
+
+        Args:
+            mode: Which mode's certificates to return.
+                In ``APP_AND_UNIT`` mode: defaults to ``Mode.UNIT`` if not specified.
+                Only returns certificates for the specified mode.
+                In ``UNIT`` or ``APP`` mode: ignored (returns all certificates for ``self.mode``).
+
+        Returns:
+            A tuple of (certificates, private_key) where:
+            - certificates: List of assigned certificates for the specified mode
+            - private_key: The private key for those certificates
+
+        Example usage in ``APP_AND_UNIT`` mode::
+
+            # Get UNIT certificates with UNIT private key
+            unit_certs, unit_key = self.tls.get_assigned_certificates(Mode.UNIT)
+
+            # Get APP certificates with APP private key (leader only)
+            app_certs, app_key = self.tls.get_assigned_certificates(Mode.APP)
+        """
+        if self.mode == Mode.APP_AND_UNIT:
+            if mode is None:
+                mode = Mode.UNIT
+            elif mode == Mode.APP_AND_UNIT:
+                raise TLSCertificatesError(
+                    "Mode must be Mode.APP or Mode.UNIT, not Mode.APP_AND_UNIT"
+                )
+
+            mode_certificates: list[ProviderCertificate] = []
+            for requirer_csr in self.get_csrs_from_requirer_relation_data():
+                csr_mode = self._get_mode_for_csr(
+                    requirer_csr.certificate_signing_request,
+                    requirer_csr.is_ca,
+                )
+                if csr_mode != mode:
+                    continue
+                cert = self._find_certificate_in_relation_data(requirer_csr, mode)
+                if cert:
+                    mode_certificates.append(cert)
+            return mode_certificates, self.get_private_key(mode)
+
+        assigned_certificates = [
+            cert
+            for requirer_csr in self.get_csrs_from_requirer_relation_data()
+            if (cert := self._find_certificate_in_relation_data(requirer_csr))
+        ]
+        return assigned_certificates, self.private_key
+
+    def _find_certificate_in_relation_data(
+        self, csr: RequirerCertificateRequest, mode: Literal[Mode.APP, Mode.UNIT] | None = None
+    ) -> ProviderCertificate | None:
+        """Return the certificate that matches the given CSR, validated against the private key.
+
+        Args:
+            csr: The certificate signing request to find a certificate for.
+            mode: Optional mode to specify which private key to validate against.
+                  If None, tries all applicable modes based on self.mode.
+        """
+        modes_to_try: list[Literal[Mode.APP, Mode.UNIT]] = (
+            [mode] if mode is not None else self._flatten_modes()
+        )
+
+        for try_mode in modes_to_try:
+            private_key = self._get_private_key_for_mode(try_mode)
+            if not private_key:
+                continue
+
+            for provider_certificate in self.get_provider_certificates():
+                if (
+                    provider_certificate.certificate_signing_request
+                    == csr.certificate_signing_request
+                ):
+                    if provider_certificate.certificate.is_ca and not csr.is_ca:
+                        logger.warning(
+                            "Non CA certificate requested, got a CA certificate, ignoring"
+                        )
+                        continue
+                    elif not provider_certificate.certificate.is_ca and csr.is_ca:
+                        logger.warning(
+                            "CA certificate requested, got a non CA certificate, ignoring"
+                        )
+                        continue
+                    if not provider_certificate.certificate.matches_private_key(private_key):
+                        continue
+                    return provider_certificate
+        return None
+
+    def _find_available_certificates(self):
+        """Find available certificates and emit events.
+
+        This method will find certificates that are available for the requirer's CSRs.
+        If a certificate is found, it will be set as a secret and an event will be emitted.
+        If a certificate is revoked, the secret will be removed and an event will be emitted.
+        """
+        requirer_csrs = self.get_csrs_from_requirer_relation_data()
+        csrs = [csr.certificate_signing_request for csr in requirer_csrs]
+        provider_certificates = self.get_provider_certificates()
+        for provider_certificate in provider_certificates:
+            if provider_certificate.certificate_signing_request in csrs:
+                mode = self._get_mode_for_csr(
+                    provider_certificate.certificate_signing_request,
+                    provider_certificate.certificate.is_ca,
+                )
+                if mode is None:
+                    continue
+                if mode == Mode.APP and not self.model.unit.is_leader():
+                    continue
+                secret_label = self._get_csr_secret_label(
+                    provider_certificate.certificate_signing_request,
+                    mode,
+                )
+                if provider_certificate.revoked:
+                    secret = self._get_certificate_secret(
+                        provider_certificate.certificate_signing_request, mode
+                    )
+                    if secret:
+                        logger.debug(
+                            "Removing secret with label %s",
+                            secret.label,
+                        )
+                        secret.remove_all_revisions()
+                else:
+                    if not self._csr_matches_certificate_request(
+                        certificate_signing_request=provider_certificate.certificate_signing_request,
+                        is_ca=provider_certificate.certificate.is_ca,
+                    ):
+                        logger.debug("Certificate requested for different attributes - Skipping")
+                        continue
+                    private_key = self._get_private_key_for_mode(mode)
+                    if not private_key:
+                        continue
+                    if not provider_certificate.certificate.matches_private_key(private_key):
+                        continue
+                    secret = self._get_certificate_secret(
+                        provider_certificate.certificate_signing_request, mode
+                    )
+                    if secret:
+                        logger.debug("Setting secret with label %s", secret.label)
+                        # Juju < 3.6 will create a new revision even if the content is the same
+                        if secret.get_content(refresh=True).get("certificate", "") == str(
+                            provider_certificate.certificate
+                        ):
+                            logger.debug(
+                                "Secret %s with correct certificate already exists", secret.label
+                            )
+                            self.on.certificate_available.emit(
+                                certificate_signing_request=provider_certificate.certificate_signing_request,
+                                certificate=provider_certificate.certificate,
+                                ca=provider_certificate.ca,
+                                chain=provider_certificate.chain,
+                            )
+                            continue
+                        secret.set_content(
+                            content={
+                                "certificate": str(provider_certificate.certificate),
+                                "csr": str(provider_certificate.certificate_signing_request),
+                            }
+                        )
+                        secret.set_info(
+                            expire=calculate_relative_datetime(
+                                target_time=provider_certificate.certificate.expiry_time,
+                                fraction=self.renewal_relative_time,
+                            ),
+                        )
+                        secret.get_content(refresh=True)
+                    else:
+                        logger.debug("Creating new secret with label %s", secret_label)
+                        self._get_app_or_unit_for_mode(mode).add_secret(
+                            content={
+                                "certificate": str(provider_certificate.certificate),
+                                "csr": str(provider_certificate.certificate_signing_request),
+                            },
+                            label=secret_label,
+                            expire=calculate_relative_datetime(
+                                target_time=provider_certificate.certificate.expiry_time,
+                                fraction=self.renewal_relative_time,
+                            ),
+                        )
+                    self.on.certificate_available.emit(
+                        certificate_signing_request=provider_certificate.certificate_signing_request,
+                        certificate=provider_certificate.certificate,
+                        ca=provider_certificate.ca,
+                        chain=provider_certificate.chain,
+                    )
+
+        for provider_error in self._load_provider_certificate_errors():
+            if str(provider_error.certificate_signing_request) not in [str(csr) for csr in csrs]:
+                continue
+            self.on.certificate_denied.emit(
+                certificate_signing_request=provider_error.certificate_signing_request,
+                error=provider_error.error,
+            )
+
+    def _cleanup_certificate_requests(self):
+        """Clean up certificate requests.
+
+        Remove any certificate requests that falls into one of the following categories:
+        - The CSR attributes do not match any of the certificate requests defined in
+        the charm's certificate_requests attribute.
+        - The CSR public key does not match the private key.
+        """
+        for requirer_csr in self.get_csrs_from_requirer_relation_data():
+            if not self._csr_matches_certificate_request(
+                certificate_signing_request=requirer_csr.certificate_signing_request,
+                is_ca=requirer_csr.is_ca,
+            ):
+                self._remove_requirer_csr_from_relation_data(
+                    requirer_csr.certificate_signing_request
+                )
+                logger.info(
+                    "Removed CSR from relation data because it did not match any certificate request"  # noqa: E501
+                )
+            else:
+                key_matches = False
+                for mode in self._flatten_modes():
+                    private_key = self._get_private_key_for_mode(mode)
+                    if (
+                        private_key
+                        and requirer_csr.certificate_signing_request.matches_private_key(
+                            private_key
+                        )
+                    ):
+                        key_matches = True
+                        break
+
+                if not key_matches:
+                    self._remove_requirer_csr_from_relation_data(
+                        requirer_csr.certificate_signing_request
+                    )
+                    logger.info(
+                        "Removed CSR from relation data because it did not match any private key"
+                    )
+
+    def _renew_expiring_certificates(self) -> None:
+        """Renew certificates approaching expiry that haven't been renewed yet.
+
+        This acts as a safety net for cases where secret_expired failed to trigger or complete.
+        Checks certificates at a threshold slightly after the configured renewal time but before
+        expiry to prevent downtime.
+        """
+        now = datetime.now(timezone.utc)
+        safety_threshold = min(0.99, self.renewal_relative_time + 0.05)
+
+        for mode in self._flatten_modes():
+            assigned_certificates, _ = self.get_assigned_certificates(mode)
+
+            for provider_certificate in assigned_certificates:
+                cert = provider_certificate.certificate
+                validity_start = cert.validity_start_time
+                validity_end = cert.expiry_time
+                validity_period = validity_end - validity_start
+                safety_renewal_time = validity_start + (validity_period * safety_threshold)
+
+                if now >= safety_renewal_time and now < validity_end:
+                    logger.warning(
+                        "Certificate approaching expiry but not renewed - "
+                        "triggering renewal as safety net"
+                    )
+                    self._renew_certificate_request(
+                        provider_certificate.certificate_signing_request
+                    )
+
+    def _get_private_key_secret_label(self, mode: Literal[Mode.UNIT, Mode.APP]) -> str:
+        if mode == Mode.UNIT:
+            return f"{LIBID}-private-key-{self._get_unit_number()}-{self.relationship_name}"
+        elif mode == Mode.APP:
+            # the "-app-" infix distinguishes this label from the one used by older
+            # versions, which may refer to a unit-owned secret
+            # (see _backwards_compatibility.legacy_app_private_key_secret_label)
+            return f"{LIBID}-private-key-app-{self.relationship_name}"
+
+    def _get_csr_secret_label(
+        self, csr: CertificateSigningRequest, mode: Literal[Mode.UNIT, Mode.APP]
+    ) -> str:
+        csr_in_sha256_hex = csr.get_sha256_hex()
+        if mode == Mode.UNIT:
+            unit_num = self._get_unit_number()
+            return f"{LIBID}-certificate-{unit_num}-{self.relationship_name}-{csr_in_sha256_hex}"
+        elif mode == Mode.APP:
+            return f"{LIBID}-certificate-{self.relationship_name}-{csr_in_sha256_hex}"
+
+    def _get_certificate_secret(
+        self, csr: CertificateSigningRequest, mode: Literal[Mode.UNIT, Mode.APP]
+    ) -> Secret | None:
+        """Get the certificate secret for a CSR, trying new and old label formats.
+
+        This function is introduced to avoid breaking changes for
+        existing secrets created with the old label format.
+
+        Args:
+            csr: The certificate signing request.
+            mode: The mode (UNIT or APP).
+
+        Returns:
+            The secret if found, None otherwise.
+        """
+        secret_label = self._get_csr_secret_label(csr, mode)
+        try:
+            return self.model.get_secret(label=secret_label)
+        except SecretNotFoundError:
+            pass
+
+        old_secret_label = _backwards_compatibility.certificate_secret_label_without_relation_name(
+            libid=LIBID,
+            csr_sha256_hex=csr.get_sha256_hex(),
+            unit_number=self._get_unit_number() if mode == Mode.UNIT else None,
+        )
+        try:
+            return self.model.get_secret(label=old_secret_label)
+        except SecretNotFoundError:
+            return None
+
+    def _list_secrets(self) -> list[str]:
+        """List all secret IDs owned by this unit/app.
+
+        Uses the `secret-ids` hook tool to enumerate secrets.
+
+        Returns:
+            List of secret IDs (e.g., ['secret://...', 'secret://...']).
+            Returns empty list if command fails (e.g., not in hook context).
+        """
+        try:
+            result = subprocess.run(
+                ["secret-ids"],
+                capture_output=True,
+                text=True,
+                check=False,
+            )
+        except FileNotFoundError:
+            logger.debug("secret-ids command not found (not in hook context)")
+            return []
+
+        if result.returncode != 0:
+            logger.debug("secret-ids command failed: %s", result.stderr)
+            return []
+
+        secret_ids = [line.strip() for line in result.stdout.strip().split("\n") if line.strip()]
+        return secret_ids
+
+    def _get_certificate_secret_label_prefix(self, mode: Literal[Mode.UNIT, Mode.APP]) -> str:
+        """Get the certificate secret label prefix for filtering.
+
+        Args:
+            mode: The mode (UNIT or APP).
+
+        Returns:
+            The label prefix for certificate secrets with relation name.
+        """
+        if mode == Mode.UNIT:
+            unit_num = self._get_unit_number()
+            return f"{LIBID}-certificate-{unit_num}-{self.relationship_name}-"
+        elif mode == Mode.APP:
+            return f"{LIBID}-certificate-{self.relationship_name}-"
+
+    def _remove_certificate_secrets_for_relation(self, mode: Literal[Mode.UNIT, Mode.APP]) -> None:
+        """Remove certificate secrets for this relation.
+
+        Enumerates all secrets owned by the unit/app and removes those
+        matching the certificate secret label prefix for this relation.
+
+        Args:
+            mode: The mode (UNIT or APP).
+        """
+        secret_ids = self._list_secrets()
+
+        if not secret_ids:
+            logger.warning("No secrets found to clean up")
+            return
+
+        label_prefix = self._get_certificate_secret_label_prefix(mode)
+
+        for secret_id in secret_ids:
+            try:
+                secret = self.model.get_secret(id=secret_id)
+                label = secret.label or secret.get_info().label
+
+                if label and label.startswith(label_prefix):
+                    secret.remove_all_revisions()
+                    logger.debug("Removed certificate secret: %s", label)
+            except SecretNotFoundError:
+                continue
+
+        logger.debug("Removed certificate secret(s) for mode %s", mode)
+
+    def _get_unit_number(self) -> str:
+        return self.model.unit.name.split("/")[1]
+
+
+class TLSCertificatesProvidesV4(Object):
+    """TLS certificates provider class to be instantiated by TLS certificates providers."""
+
+    def __init__(
+        self,
+        charm: CharmBase,
+        relationship_name: str,
+        provider_capabilities: ProviderCapabilities | None = None,
+    ):
+        super().__init__(charm, relationship_name)
+        self.framework.observe(charm.on[relationship_name].relation_created, self._configure)
+        self.framework.observe(charm.on[relationship_name].relation_joined, self._configure)
+        self.framework.observe(charm.on[relationship_name].relation_changed, self._configure)
+        self.framework.observe(charm.on.update_status, self._configure)
+        self.charm = charm
+        self.relationship_name = relationship_name
+        self.provider_capabilities = provider_capabilities
+        self._security_logger = _OWASPLogger(application=f"tls-certificates-{charm.app.name}")
+
+    def _configure(self, _: EventBase) -> None:
+        """Handle update status and tls relation changed events.
+
+        This is a common hook triggered on a regular basis.
+
+        Revoke certificates for which no csr exists and refresh advertised capabilities.
+        """
+        if not self.model.unit.is_leader():
+            return
+        self._remove_certificates_for_which_no_csr_exists()
+        self._publish_capabilities()
+
+    def _publish_capabilities(self) -> None:
+        """Synchronise the provider's capabilities into every relation's application data.
+
+        Writes the capabilities supplied at initialization, or clears any previously
+        published capabilities when none are supplied (so requirers don't keep observing
+        stale data after a provider stops advertising). Writes are no-op-if-unchanged to
+        avoid ``relation-changed`` churn, and preserve the existing ``certificates`` and
+        ``request_errors`` keys (load-modify-dump).
+        """
+        for relation in self._get_tls_relations():
+            try:
+                provider_data = _ProviderApplicationData.load(relation.data[self.charm.app])
+            except DataValidationError:
+                logger.warning("Failed to load provider relation data")
+                continue
+            if provider_data.capabilities == self.provider_capabilities:
+                continue
+            provider_data.capabilities = self.provider_capabilities
+            try:
+                provider_data.dump(relation.data[self.model.app])
+                logger.info("Provider capabilities relation data updated")
+            except ModelError:
+                logger.warning("Failed to update relation data")
+
+    def _remove_certificates_for_which_no_csr_exists(self) -> None:
+        provider_certificates = self.get_provider_certificates()
+        requirer_csrs = [
+            request.certificate_signing_request for request in self.get_certificate_requests()
+        ]
+        for provider_certificate in provider_certificates:
+            if provider_certificate.certificate_signing_request not in requirer_csrs:
+                tls_relation = self._get_tls_relations(
+                    relation_id=provider_certificate.relation_id
+                )
+                self._remove_provider_certificate(
+                    certificate=provider_certificate.certificate,
+                    relation=tls_relation[0],
+                )
+
+    def _get_tls_relations(self, relation_id: int | None = None) -> list[Relation]:
+        return (
+            [
+                relation
+                for relation in self.model.relations[self.relationship_name]
+                if relation.id == relation_id
+            ]
+            if relation_id is not None
+            else self.model.relations.get(self.relationship_name, [])
+        )
+
+    def get_certificate_requests(
+        self, relation_id: int | None = None
+    ) -> list[RequirerCertificateRequest]:
+        """Load certificate requests from the relation data."""
+        relations = self._get_tls_relations(relation_id)
+        requirer_csrs: list[RequirerCertificateRequest] = []
+        for relation in relations:
+            for unit in relation.units:
+                requirer_csrs.extend(self._load_requirer_databag(relation, unit))
+            requirer_csrs.extend(self._load_requirer_databag(relation, relation.app))
+        return requirer_csrs
+
+    def _load_requirer_databag(
+        self, relation: Relation, unit_or_app: Application | Unit
+    ) -> list[RequirerCertificateRequest]:
+        try:
+            requirer_relation_data = _RequirerData.load(relation.data.get(unit_or_app, {}))
+        except DataValidationError:
+            logger.debug("Invalid requirer relation data for %s", unit_or_app.name)
+            return []
+        return [
+            RequirerCertificateRequest(
+                relation_id=relation.id,
+                certificate_signing_request=CertificateSigningRequest.from_string(
+                    csr.certificate_signing_request
+                ),
+                is_ca=csr.ca if csr.ca else False,
+            )
+            for csr in requirer_relation_data.certificate_signing_requests
+        ]
+
+    def _add_provider_certificate(
+        self,
+        relation: Relation,
+        provider_certificate: ProviderCertificate,
+    ) -> None:
+        chain = [str(certificate) for certificate in provider_certificate.chain]
+        if chain[0] != str(provider_certificate.certificate):
+            logger.warning(
+                "The order of the chain from the TLS Certificates Provider is incorrect. "
+                "The leaf certificate should be the first element of the chain."
+            )
+        elif not chain_has_valid_order(chain):
+            logger.warning(
+                "The order of the chain from the TLS Certificates Provider is partially incorrect."
+            )
+        new_certificate = _Certificate(
+            certificate=str(provider_certificate.certificate),
+            certificate_signing_request=str(provider_certificate.certificate_signing_request),
+            ca=str(provider_certificate.ca),
+            chain=chain,
+        )
+        provider_certificates = self._load_provider_certificates(relation)
+        if new_certificate in provider_certificates:
+            logger.info("Certificate already in relation data - Doing nothing")
+            return
+        provider_certificates.append(new_certificate)
+        self._dump_provider_certificates(relation=relation, certificates=provider_certificates)
+
+    def _load_provider_certificates(self, relation: Relation) -> list[_Certificate]:
+        try:
+            provider_relation_data = _ProviderApplicationData.load(relation.data[self.charm.app])
+        except DataValidationError:
+            logger.debug("Invalid provider relation data")
+            return []
+        return list(provider_relation_data.certificates)
+
+    def _load_provider_request_errors(self, relation: Relation) -> list[_RequestError]:
+        """Load provider request errors from relation data."""
+        try:
+            provider_relation_data = _ProviderApplicationData.load(relation.data[self.charm.app])
+        except DataValidationError:
+            logger.debug("Invalid provider relation data")
+            return []
+        return list(provider_relation_data.request_errors)
+
+    def _dump_provider_certificates(self, relation: Relation, certificates: list[_Certificate]):
+        """Dump provider certificates to relation data, preserving request_errors."""
+        try:
+            provider_data = _ProviderApplicationData.load(relation.data[self.charm.app])
+        except DataValidationError:
+            logger.warning("Failed to load provider relation data")
+            return
+        provider_data.certificates = certificates
+        try:
+            provider_data.dump(relation.data[self.model.app])
+            logger.info("Certificate relation data updated")
+        except ModelError:
+            logger.warning("Failed to update relation data")
+
+    def _dump_provider_request_errors(
+        self, relation: Relation, request_errors: list[_RequestError]
+    ):
+        """Dump provider request errors to relation data, preserving certificates."""
+        try:
+            provider_data = _ProviderApplicationData.load(relation.data[self.charm.app])
+        except DataValidationError:
+            logger.warning("Failed to load provider relation data")
+            return
+        provider_data.request_errors = request_errors
+        try:
+            provider_data.dump(relation.data[self.model.app])
+            logger.info("Request errors relation data updated")
+        except ModelError:
+            logger.warning("Failed to update relation data")
+
+    def _remove_provider_certificate(
+        self,
+        relation: Relation,
+        certificate: Certificate | None = None,
+        certificate_signing_request: CertificateSigningRequest | None = None,
+    ) -> None:
+        """Remove certificate based on certificate or certificate signing request."""
+        provider_certificates = self._load_provider_certificates(relation)
+        for provider_certificate in provider_certificates:
+            if certificate and provider_certificate.certificate == str(certificate):
+                provider_certificates.remove(provider_certificate)
+            if (
+                certificate_signing_request
+                and provider_certificate.certificate_signing_request
+                == str(certificate_signing_request)
+            ):
+                provider_certificates.remove(provider_certificate)
+        self._dump_provider_certificates(relation=relation, certificates=provider_certificates)
+
+    def _remove_request_error_for_csr(
+        self,
+        relation: Relation,
+        certificate_signing_request: CertificateSigningRequest,
+    ) -> None:
+        """Remove request_errors entries matching the CSR."""
+        request_errors = self._load_provider_request_errors(relation)
+        for entry in request_errors:
+            if CertificateSigningRequest.from_string(entry.csr) == certificate_signing_request:
+                request_errors.remove(entry)
+        self._dump_provider_request_errors(relation=relation, request_errors=request_errors)
+
+    def revoke_all_certificates(self) -> None:
+        """Revoke all certificates of this provider.
+
+        This method is meant to be used when the Root CA has changed.
+        """
+        if not self.model.unit.is_leader():
+            logger.warning("Unit is not a leader - will not set relation data")
+            return
+        relations = self._get_tls_relations()
+        for relation in relations:
+            provider_certificates = self._load_provider_certificates(relation)
+            for certificate in provider_certificates:
+                certificate.revoked = True
+            self._dump_provider_certificates(relation=relation, certificates=provider_certificates)
+        self._security_logger.log_event(
+            event="all_certificates_revoked",
+            level=logging.WARNING,
+            description="All certificates revoked",
+        )
+
+    def set_relation_certificate(
+        self,
+        provider_certificate: ProviderCertificate,
+    ) -> None:
+        """Add certificates to relation data.
+
+        Args:
+            provider_certificate (ProviderCertificate): ProviderCertificate object
+
+        Returns:
+            None
+        """
+        if not self.model.unit.is_leader():
+            logger.warning("Unit is not a leader - will not set relation data")
+            return
+        certificates_relation = self.model.get_relation(
+            relation_name=self.relationship_name, relation_id=provider_certificate.relation_id
+        )
+        if not certificates_relation:
+            raise TLSCertificatesError(f"Relation {self.relationship_name} does not exist")
+        # Ensure exclusivity: remove any prior error for this CSR
+        self._remove_request_error_for_csr(
+            relation=certificates_relation,
+            certificate_signing_request=provider_certificate.certificate_signing_request,
+        )
+        self._remove_provider_certificate(
+            relation=certificates_relation,
+            certificate_signing_request=provider_certificate.certificate_signing_request,
+        )
+        self._add_provider_certificate(
+            relation=certificates_relation,
+            provider_certificate=provider_certificate,
+        )
+        self._security_logger.log_event(
+            event="certificate_provided",
+            level=logging.INFO,
+            description="Certificate provided to requirer",
+            relation_id=str(provider_certificate.relation_id),
+            common_name=provider_certificate.certificate.common_name,
+        )
+
+    def set_relation_error(
+        self,
+        provider_error: ProviderCertificateError,
+    ) -> None:
+        """Record an error for a CSR when issuance fails.
+
+        Args:
+            provider_error: The error information to set for the certificate request.
+        """
+        if not self.model.unit.is_leader():
+            logger.warning("Unit is not a leader - will not set relation data")
+            return
+        certificates_relation = self.model.get_relation(
+            relation_name=self.relationship_name, relation_id=provider_error.relation_id
+        )
+        if not certificates_relation:
+            raise TLSCertificatesError(f"Relation {self.relationship_name} does not exist")
+        self._remove_provider_certificate(
+            relation=certificates_relation,
+            certificate_signing_request=provider_error.certificate_signing_request,
+        )
+        request_errors = self._load_provider_request_errors(certificates_relation)
+        for entry in request_errors:
+            if (
+                CertificateSigningRequest.from_string(entry.csr)
+                == provider_error.certificate_signing_request
+            ):
+                request_errors.remove(entry)
+        request_errors.append(
+            _RequestError(
+                csr=str(provider_error.certificate_signing_request), error=provider_error.error
+            )
+        )
+        self._dump_provider_request_errors(
+            relation=certificates_relation, request_errors=request_errors
+        )
+        self._security_logger.log_event(
+            event="certificate_denied",
+            level=logging.WARNING,
+            description="Certificate issuance failed for CSR",
+            relation_id=str(provider_error.relation_id),
+            common_name=provider_error.certificate_signing_request.common_name,
+            code=str(provider_error.error.code),
+        )
+
+    def get_issued_certificates(self, relation_id: int | None = None) -> list[ProviderCertificate]:
+        """Return a List of issued (non revoked) certificates.
+
+        Returns:
+            List: List of ProviderCertificate objects
+        """
+        if not self.model.unit.is_leader():
+            logger.warning("Unit is not a leader - will not read relation data")
+            return []
+        provider_certificates = self.get_provider_certificates(relation_id=relation_id)
+        return [certificate for certificate in provider_certificates if not certificate.revoked]
+
+    def get_provider_certificates(
+        self, relation_id: int | None = None
+    ) -> list[ProviderCertificate]:
+        """Return a List of issued certificates."""
+        certificates: list[ProviderCertificate] = []
+        relations = self._get_tls_relations(relation_id)
+        for relation in relations:
+            if not relation.app:
+                logger.warning("Relation %s does not have an application", relation.id)
+                continue
+            certificates.extend([
+                certificate.to_provider_certificate(relation_id=relation.id)
+                for certificate in self._load_provider_certificates(relation)
+            ])
+        return certificates
+
+    def get_provider_certificate_errors(
+        self, relation_id: int | None = None
+    ) -> list[ProviderCertificateError]:
+        """Return provider certificate errors for the given relations.
+
+        Args:
+            relation_id: Optional relation ID to filter errors by specific relation.
+                        If None, returns errors from all relations.
+
+        Returns:
+            List of ProviderCertificateError objects representing failed certificate requests.
+        """
+        errors: list[ProviderCertificateError] = []
+        relations = self._get_tls_relations(relation_id)
+        for relation in relations:
+            if not relation.app:
+                logger.warning("Relation %s does not have an application", relation.id)
+                continue
+            errors.extend([
+                ProviderCertificateError(
+                    relation_id=relation.id,
+                    certificate_signing_request=CertificateSigningRequest.from_string(entry.csr),
+                    error=entry.error,
+                )
+                for entry in self._load_provider_request_errors(relation)
+            ])
+        return errors
+
+    def get_unsolicited_certificates(
+        self, relation_id: int | None = None
+    ) -> list[ProviderCertificate]:
+        """Return provider certificates for which no certificate requests exists.
+
+        Those certificates should be revoked.
+        """
+        provider_certificates = self.get_provider_certificates(relation_id=relation_id)
+        requirer_csrs = self.get_certificate_requests(relation_id=relation_id)
+        list_of_csrs = [csr.certificate_signing_request for csr in requirer_csrs]
+        return [
+            certificate
+            for certificate in provider_certificates
+            if certificate.certificate_signing_request not in list_of_csrs
+        ]
+
+    def get_outstanding_certificate_requests(
+        self, relation_id: int | None = None
+    ) -> list[RequirerCertificateRequest]:
+        """Return CSR's for which no certificate has been issued.
+
+        Args:
+            relation_id (int): Relation id
+
+        Returns:
+            list: List of RequirerCertificateRequest objects.
+        """
+        requirer_csrs = self.get_certificate_requests(relation_id=relation_id)
+        return [
+            relation_csr
+            for relation_csr in requirer_csrs
+            if not self._certificate_issued_for_csr(
+                csr=relation_csr.certificate_signing_request,
+                relation_id=relation_id,
+            )
+        ]
+
+    def _certificate_issued_for_csr(
+        self, csr: CertificateSigningRequest, relation_id: int | None
+    ) -> bool:
+        """Check whether a certificate has been issued for a given CSR."""
+        issued_certificates_per_csr = self.get_issued_certificates(relation_id=relation_id)
+        for issued_certificate in issued_certificates_per_csr:
+            if issued_certificate.certificate_signing_request == csr:
+                return csr.matches_certificate(issued_certificate.certificate)
+        return False
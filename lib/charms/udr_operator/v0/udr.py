@@ -0,0 +1,138 @@
+"""UDR Interface.
+
+The UDR publishes over the `udr` interface:
+    app databag:
+        url: SBI URL of the UDR Service.
+        plmns: JSON list of the supported PLMNs (`{"mcc": ..., "mnc": ...}`).
+    unit databag:
+        url: SBI URL of the unit, to reach a given UDR instance directly.
+
+Consumers can cache these at deploy time instead of discovering the UDR through the NRF.
+"""
+
+import json
+from typing import Dict, List, Optional
+
+from ops.charm import CharmBase, CharmEvents, RelationChangedEvent
+from ops.framework import EventBase, EventSource, Object
+
+# The unique Charmhub library identifier, never change it
+# Empty until `charmcraft create-lib udr` registers the library and assigns it
+LIBID = ""
+
+# Increment this major API version when introducing breaking changes
+LIBAPI = 0
+
+# Increment this PATCH version before using `charmcraft publish-lib` or reset
+# to 0 if you are raising the major API version
+LIBPATCH = 1
+
+
+class UDRAvailableEvent(EventBase):
+    """Dataclass for UDR available events."""
+
+    def __init__(self, handle, url: str):
+        """Sets url."""
+        super().__init__(handle)
+        self.url = url
+
+    def snapshot(self) -> dict:
+        """Returns event data."""
+        return {"url": self.url}
+
+    def restore(self, snapshot) -> None:
+        """Restores event data."""
+        self.url = snapshot["url"]
+
+
+class UDRRequirerCharmEvents(CharmEvents):
+    """All custom events for the UDRRequirer."""
+
+    udr_available = EventSource(UDRAvailableEvent)
+
+
+class UDRProvides(Object):
+    """Publishes the UDR endpoints to consumers."""
+
+    def __init__(self, charm: CharmBase, relationship_name: str):
+        self.relationship_name = relationship_name
+        super().__init__(charm, relationship_name)
+
+    def set_info(self, url: str, plmns: List[Dict[str, str]]) -> None:
+        """Sets the application SBI URL and supported PLMNs. Requires leadership.
+
+        Args:
+            url: SBI URL of the UDR Service.
+            plmns: Supported PLMNs.
+        """
+        self._update_databags(self.model.app, {"url": url, "plmns": json.dumps(plmns)})
+
+    def set_unit_info(self, url: str) -> None:
+        """Sets the SBI URL of this unit.
+
+        Args:
+            url: SBI URL of the unit.
+        """
+        self._update_databags(self.model.unit, {"url": url})
+
+    def _update_databags(self, entity, data: Dict[str, str]) -> None:
+        """Writes data to every relation, only touching the keys whose value changed."""
+        for relation in self.model.relations[self.relationship_name]:
+            databag = relation.data[entity]
+            for key, value in data.items():
+                if databag.get(key) != value:
+                    databag[key] = value
+
+
+class UDRRequires(Object):
+    """Reads the UDR endpoints published by the provider."""
+
+    on = UDRRequirerCharmEvents()
+
+    def __init__(self, charm: CharmBase, relationship_name: str):
+        self.relationship_name = relationship_name
+        self.charm = charm
+        super().__init__(charm, relationship_name)
+        self.framework.observe(
+            charm.on[relationship_name].relation_changed, self._on_relation_changed
+        )
+
+    def _on_relation_changed(self, event: RelationChangedEvent) -> None:
+        """Triggered everytime there's a change in relation data.
+
+        Args:
+            event (RelationChangedEvent): Juju event
+
+        Returns:
+            None
+        """
+        if not event.app:
+            return
+        url = event.relation.data[event.app].get("url")
+        if url:
+            self.on.udr_available.emit(url=url)
+
+    def get_udr_url(self) -> Optional[str]:
+        """Returns UDR url."""
+        for relation in self.model.relations[self.relationship_name]:
+            if not relation.app:
+                continue
+            return relation.data[relation.app].get("url", None)
+        return None
+
+    def get_udr_plmns(self) -> List[Dict[str, str]]:
+        """Returns the PLMNs supported by the UDR."""
+        for relation in self.model.relations[self.relationship_name]:
+            if not relation.app:
+                continue
+            return json.loads(relation.data[relation.app].get("plmns", "[]"))
+        return []
+
+    def get_udr_unit_urls(self) -> List[str]:
+        """Returns the SBI URLs of every UDR unit."""
+        urls = []
+        for relation in self.model.relations[self.relationship_name]:
+            for unit in relation.units:
+                if url := relation.data[unit].get("url"):
+                    urls.append(url)
+        return sorted(urls)
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# Copyright 2022 Guillaume Belanger
+# See LICENSE file for licensing details.
+
+"""Warms the MongoDB cache up for the UDR workload, then marks the workload ready.
+
+The charm starts this script in the background of the charm container whenever it starts or
+restarts the udr service, so that no hook waits for the warm-up. The script writes the marker
+file of the `udr-warmup` readiness check through the Pebble socket of the udr container once
+the warm-up completes, runs out of time or fails, which lets the pod join the Service
+endpoints without waiting for the next charm hook.
+
+Parameters are read as a JSON object from stdin, so that the database credentials never show
+on a command line:
+    uri, database, collections, concurrency, time_budget, pebble_socket, marker_path,
+    progress_path.
+"""
+
+import json
+import logging
+import os
+import sys
+import time
+from typing import Any, Dict
+
+from mongodb import connect, warm_up
+
+logger = logging.getLogger(__name__)
+
+
+def write_progress(path: str, progress: Dict[str, Any]) -> None:
+    """Atomically replaces the warm-up progress file read by the charm.
+
+    Args:
+        path: Progress file path.
+        progress: `pid`, `completed` and `total` scans, and whether the warm-up is `done`.
+    """
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, "w") as f:
+        json.dump(progress, f)
+    os.replace(temporary_path, path)
+
+
+def mark_ready(pebble_socket: str, marker_path: str) -> None:
+    """Writes the marker file of the `udr-warmup` readiness check in the udr container.
+
+    Args:
+        pebble_socket: Path of the Pebble socket of the udr container.
+        marker_path: Marker file path in the udr container.
+    """
+    from ops.pebble import Client, Error
+
+    try:
+        Client(socket_path=pebble_socket).push(marker_path, str(time.time()), make_dirs=True)
+    except (ConnectionError, Error) as e:
+        logger.warning("Failed to mark the workload ready: %s", e)
+
+
+def run(params: Dict[str, Any]) -> None:
+    """Warms the MongoDB cache up, then marks the workload ready whatever the outcome.
+
+    Args:
+        params: Warm-up parameters.
+    """
+    from pymongo.errors import PyMongoError
+
+    progress = {"pid": os.getpid(), "completed": 0, "total": 0, "done": False}
+
+    def report(completed: int, total: int) -> None:
+        progress.update(completed=completed, total=total)
+        write_progress(params["progress_path"], progress)
+
+    report(0, 0)
+    try:
+        with connect(params["uri"]) as client:
+            report_ = warm_up(
+                client,
+                params["database"],
+                params["collections"],
+                concurrency=params["concurrency"],
+                time_budget=params["time_budget"],
+                progress=report,
+            )
+        logger.info("Warm-up: %s", report_)
+    except PyMongoError as e:
+        logger.warning("Warm-up failed: %s", e)
+    finally:
+        mark_ready(params["pebble_socket"], params["marker_path"])
+        progress["done"] = True
+        write_progress(params["progress_path"], progress)
+
+
+def main() -> None:
+    """Reads the warm-up parameters from stdin and runs the warm-up."""
+    logging.basicConfig(level=logging.INFO)
+    run(json.load(sys.stdin))
+
+
+if __name__ == "__main__":
+    main()
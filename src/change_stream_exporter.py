@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+# Copyright 2022 Guillaume Belanger
+# See LICENSE file for licensing details.
+
+"""Publishes UDR data changes from MongoDB change streams to a Kafka topic.
+
+The leader unit of the charm runs this script in the background of the charm container,
+whose Python environment provides pymongo and kafka-python. Changes are read in batches,
+published with one Kafka record per change keyed on the document ID, and the resume token is
+persisted only once the batch has been flushed to Kafka.
+
+The resume token is kept in the UDR database rather than on the leader's storage, so that
+the exporter of a new leader resumes right after the last batch published by the previous
+one. Should the token have aged out of the oplog, the exporter logs an error and starts from
+the current changes, as those in between can no longer be read.
+
+Parameters are read as a JSON object from stdin, so that the database and Kafka credentials
+never show on a command line or in an environment:
+    uri, database, collections, bootstrap_servers, topic, username, password,
+    security_protocol, sasl_mechanism, tls_ca, compression, batch_size, batch_timeout_ms.
+"""
+
+import json
+import logging
+import ssl
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+RESUME_TOKENS_COLLECTION = "changeStreamResumeTokens"
+# Server error code of a change stream resumed from a token no longer in the oplog.
+CHANGE_STREAM_HISTORY_LOST = 286
+
+
+class ResumeTokenStore:
+    """Persists the change stream resume token of a topic in a MongoDB collection."""
+
+    def __init__(self, collection, topic: str):
+        self.collection = collection
+        self.topic = topic
+
+    def load(self) -> Optional[Dict]:
+        """Returns the persisted resume token, if any.
+
+        Returns:
+            Optional[Dict]: Resume token.
+        """
+        document = self.collection.find_one({"_id": self.topic})
+        return document["token"] if document else None
+
+    def save(self, token: Optional[Dict]) -> None:
+        """Replaces the persisted resume token.
+
+        Args:
+            token: Resume token.
+        """
+        if token is None:
+            return
+        self.collection.update_one(
+            {"_id": self.topic},
+            {"$set": {"token": token, "updated": datetime.now(timezone.utc)}},
+            upsert=True,
+        )
+
+    def clear(self) -> None:
+        """Removes the persisted resume token."""
+        self.collection.delete_one({"_id": self.topic})
+
+
+def watch(database, collections: List[str], token_store: ResumeTokenStore, max_await_time_ms: int):
+    """Opens a change stream on collections, right after the persisted resume token.
+
+    Args:
+        database: UDR database, as a pymongo `Database`.
+        collections: Names of the collections to watch.
+        token_store: Resume token store.
+        max_await_time_ms: Maximum time the server waits for changes.
+
+    Returns:
+        Change stream, as returned by pymongo's `watch()`.
+    """
+    from pymongo.errors import OperationFailure
+
+    pipeline = [{"$match": {"ns.coll": {"$in": collections}}}]
+    try:
+        return database.watch(
+            pipeline,
+            full_document="updateLookup",
+            resume_after=token_store.load(),
+            max_await_time_ms=max_await_time_ms,
+        )
+    except OperationFailure as e:
+        if e.code != CHANGE_STREAM_HISTORY_LOST:
+            raise
+        logger.error("Resume token aged out of the oplog, changes since were not exported: %s", e)
+        token_store.clear()
+    return database.watch(
+        pipeline, full_document="updateLookup", max_await_time_ms=max_await_time_ms
+    )
+
+
+def change_record(change: Dict[str, Any]) -> Dict[str, Any]:
+    """Returns the data-change record published for a change stream event.
+
+    Args:
+        change: Change stream event.
+
+    Returns:
+        Dict[str, Any]: Data-change record.
+    """
+    cluster_time = change.get("clusterTime")
+    return {
+        "operation": change["operationType"],
+        "collection": change["ns"]["coll"],
+        "key": str(change.get("documentKey", {}).get("_id")),
+        "document": change.get("fullDocument"),
+        "updated-fields": change.get("updateDescription", {}).get("updatedFields"),
+        "removed-fields": change.get("updateDescription", {}).get("removedFields"),
+        "cluster-time": getattr(cluster_time, "time", cluster_time),
+    }
+
+
+def export_batch(
+    stream, producer, topic: str, token_store: ResumeTokenStore, batch_size: int, timeout: float
+) -> int:
+    """Publishes one batch of changes and persists the resume token once it is flushed.
+
+    Args:
+        stream: Change stream, as returned by pymongo's `watch()`.
+        producer: Kafka producer, as returned by kafka-python's `KafkaProducer()`.
+        topic: Kafka topic.
+        token_store: Resume token store.
+        batch_size: Maximum number of changes per batch.
+        timeout: Maximum number of seconds spent gathering a batch.
+
+    Returns:
+        int: Number of published changes.
+    """
+    changes: List[Dict[str, Any]] = []
+    deadline = time.monotonic() + timeout
+    while len(changes) < batch_size and time.monotonic() < deadline:
+        change = stream.try_next()
+        if change is not None:
+            changes.append(change)
+    if not changes:
+        return 0
+    for change in changes:
+        record = change_record(change)
+        producer.send(
+            topic,
+            key=record["key"].encode(),
+            value=json.dumps(record, default=str).encode(),
+        )
+    producer.flush()
+    token_store.save(stream.resume_token)
+    logger.info("Published %d changes to %s", len(changes), topic)
+    return len(changes)
+
+
+def producer_config(params: Dict[str, Any]) -> Dict[str, Any]:
+    """Returns the Kafka producer settings for the credentials of the `kafka` relation.
+
+    Args:
+        params: Exporter parameters.
+
+    Returns:
+        Dict[str, Any]: kafka-python `KafkaProducer` keyword arguments.
+    """
+    batch_timeout_ms = params["batch_timeout_ms"]
+    config = {
+        "bootstrap_servers": params["bootstrap_servers"].split(","),
+        "compression_type": params["compression"] or None,
+        "security_protocol": params["security_protocol"],
+        "sasl_mechanism": params["sasl_mechanism"],
+        "sasl_plain_username": params["username"],
+        "sasl_plain_password": params["password"],
+        "linger_ms": batch_timeout_ms,
+        "acks": "all",
+    }
+    if params["tls_ca"]:
+        config["ssl_context"] = ssl.create_default_context(cadata=params["tls_ca"])
+    return config
+
+
+def main() -> None:
+    """Tails the UDR collections and publishes their changes until stopped."""
+    from kafka import KafkaProducer
+    from pymongo import MongoClient, ReadPreference, WriteConcern
+    from pymongo.read_concern import ReadConcern
+
+    logging.basicConfig(level=logging.INFO)
+    params = json.load(sys.stdin)
+    batch_timeout_ms = params["batch_timeout_ms"]
+    producer = KafkaProducer(**producer_config(params))
+    database = MongoClient(params["uri"])[params["database"]]
+    token_store = ResumeTokenStore(
+        database.get_collection(
+            RESUME_TOKENS_COLLECTION,
+            read_preference=ReadPreference.PRIMARY,
+            read_concern=ReadConcern("majority"),
+            write_concern=WriteConcern("majority"),
+        ),
+        topic=params["topic"],
+    )
+    with watch(database, params["collections"], token_store, batch_timeout_ms) as stream:
+        while stream.alive:
+            export_batch(
+                stream,
+                producer,
+                topic=params["topic"],
+                token_store=token_store,
+                batch_size=params["batch_size"],
+                timeout=batch_timeout_ms / 1000,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -4,64 +4,679 @@
 
 """Charmed operator for the 5G UDR service."""
 
+import hashlib
+import json
 import logging
+import os
+import re
+import signal
+import sys
+import time
+from functools import cached_property
 from ipaddress import IPv4Address
-from subprocess import check_output
-from typing import Dict, Optional, Union
+from pathlib import Path
+from subprocess import DEVNULL, PIPE, Popen, check_output
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple, Union
 
-from charms.data_platform_libs.v0.data_interfaces import DatabaseRequires
+import yaml
+from charms.data_platform_libs.v0.data_interfaces import DatabaseRequires, KafkaRequires
 from charms.nrf_operator.v0.nrf import NRFAvailableEvent, NRFRequires
-from charms.observability_libs.v1.kubernetes_service_patch import KubernetesServicePatch
-from jinja2 import Environment, FileSystemLoader
-from lightkube.models.core_v1 import ServicePort
-from ops.charm import CharmBase, PebbleReadyEvent
+from charms.udr_operator.v0.udr import UDRProvides
+from ops.charm import ActionEvent, CharmBase, ConfigChangedEvent, EventBase, PebbleReadyEvent
+from ops.framework import StoredState
 from ops.main import main
-from ops.model import ActiveStatus, BlockedStatus, WaitingStatus
-from ops.pebble import Layer
+from ops.model import (
+    ActiveStatus,
+    BlockedStatus,
+    MaintenanceStatus,
+    Relation,
+    StatusBase,
+    WaitingStatus,
+)
+from ops.pebble import CheckLevel, CheckStatus, Layer
+
+from mongodb import (
+    CONSISTENCY_PROFILES,
+    UDR_COLLECTIONS,
+    UE_COLLECTIONS,
+    connect,
+    is_sharded_cluster,
+    negotiated_compressors,
+    parse_retention_rules,
+    purge_stale,
+    server_compression_stats,
+    shard_collections,
+    with_options,
+    working_set_report,
+)
+from placement_config import TOPOLOGY_KEYS, parse_node_selector, parse_tolerations
+from reachability import http_endpoint, mongodb_endpoints, probe
+from rolling_restart import RestartGrantedEvent, RollingRestart
+from tracing import Tracer, traced
+
+if TYPE_CHECKING:
+    from charmlibs.interfaces.tls_certificates import TLSCertificatesRequiresV4
+    from charms.observability_libs.v1.kubernetes_service_patch import KubernetesServicePatch
+    from jinja2 import Template
+    from lightkube.resources.core_v1 import Service
 
 logger = logging.getLogger(__name__)
 
 BASE_CONFIG_PATH = "/etc/udr"
 CONFIG_FILE_NAME = "udrcfg.conf"
 DATABASE_NAME = "free5gc"
+DATABASE_ROLE = "udr"
+AUTHENTICATION_DATABASE_ROLE = "authentication"
+SBI_PORT = 29504
+SBI_SCHEMES = ["http", "https"]
+PRIVATE_KEY_PATH = f"{BASE_CONFIG_PATH}/udr.key"
+CERTIFICATE_PATH = f"{BASE_CONFIG_PATH}/udr.pem"
+PLMN_SUPPORT_LIST = [{"mcc": "208", "mnc": "93"}, {"mcc": "333", "mnc": "88"}]
+TOPOLOGY_MODE_ANNOTATION = "service.kubernetes.io/topology-mode"
+SERVICE_TYPES = ["ClusterIP", "LoadBalancer"]
+TRAFFIC_POLICIES = ["Cluster", "Local"]
+POD_ANTI_AFFINITIES = ["", "preferred", "required"]
+WHEN_UNSATISFIABLE = ["DoNotSchedule", "ScheduleAnyway"]
+SESSION_AFFINITIES = ["None", "ClientIP"]
+HEALTH_CHECK_PERIOD = 5
+WARM_UP_MARKER_PATH = "/tmp/udr-warmed-up"
+WARM_UP_SCRIPT_NAME = "cache_warmer.py"
+WARM_UP_PROGRESS_PATH = "/tmp/udr-warm-up-progress.json"
+WARM_UP_LOG_PATH = "/tmp/udr-warm-up.log"
+# terminationGracePeriodSeconds of the UDR pods, the Kubernetes default: the drain and the
+# Pebble kill-delay must both fit in it or Kubernetes kills the pod mid-drain.
+POD_TERMINATION_GRACE_PERIOD = 30
+SERVICE_ACTIONS = ["restart", "shutdown", "ignore"]
+DURATION_PATTERN = re.compile(r"^(\d+(\.\d+)?(ns|us|ms|s|m|h))+$")
+DURATION_COMPONENT_PATTERN = re.compile(r"(\d+(?:\.\d+)?)(ns|us|µs|ms|s|m|h)")
+DURATION_UNITS = {"ns": 1e-9, "us": 1e-6, "µs": 1e-6, "ms": 1e-3, "s": 1, "m": 60, "h": 3600}
+# Pebble plan fields holding Go durations, which Pebble returns in canonical form (90s as 1m30s).
+DURATION_FIELDS = ["backoff-delay", "backoff-limit", "kill-delay", "period", "timeout"]
+CONFIG_TEMPLATE_NAME = "udrcfg.conf.j2"
+SUPPORTED_COMPRESSORS = ["zstd", "snappy", "zlib"]
+EXPORTER_SCRIPT_NAME = "change_stream_exporter.py"
+EXPORTER_LOG_PATH = "/tmp/udr-change-exporter.log"
+# Users of the `kafka` interface are SCRAM users, the relation data does not name the mechanism.
+KAFKA_SASL_MECHANISM = "SCRAM-SHA-512"
+KAFKA_COMPRESSION_TYPES = ["gzip", "snappy", "lz4", "zstd"]
+
+_template_cache: Dict[Path, Tuple[int, "Template"]] = {}
+
+
+def load_template(path: Path) -> "Template":
+    """Returns the compiled Jinja2 template at a given path.
+
+    Compiled templates are cached for the lifetime of the process and only recompiled when
+    the template file's modification time changes.
+
+    Args:
+        path (Path): Absolute path of the template file.
+
+    Returns:
+        Template: Compiled template.
+    """
+    mtime = path.stat().st_mtime_ns
+    cached = _template_cache.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    from jinja2 import Environment, FileSystemLoader
+
+    template = Environment(loader=FileSystemLoader(str(path.parent))).get_template(path.name)
+    _template_cache[path] = (mtime, template)
+    return template
+
+
+def parse_duration(value: str) -> float:
+    """Parses a Go duration such as `1m30s` or `500ms`.
+
+    Args:
+        value (str): Go duration.
+
+    Returns:
+        float: Duration in seconds.
+    """
+    seconds = sum(
+        float(amount) * DURATION_UNITS[unit]
+        for amount, unit in DURATION_COMPONENT_PATTERN.findall(value)
+    )
+    return round(seconds, 9)
+
+
+def normalize_durations(definition: Dict[str, Any]) -> Dict[str, Any]:
+    """Returns a Pebble service or check definition with its durations in seconds.
+
+    Args:
+        definition (Dict[str, Any]): Service or check definition.
+
+    Returns:
+        Dict[str, Any]: The definition, comparable whatever the duration format.
+    """
+    return {
+        key: parse_duration(value) if key in DURATION_FIELDS and isinstance(value, str) else value
+        for key, value in definition.items()
+    }
+
+
+def config_diff(current: Any, desired: Any, prefix: str = "") -> List[str]:
+    """Returns the sections that differ between two structured configurations.
+
+    Args:
+        current (Any): Current configuration.
+        desired (Any): Desired configuration.
+        prefix (str): Dotted path of the section being compared.
+
+    Returns:
+        List[str]: Dotted paths of the differing sections.
+    """
+    if not isinstance(current, dict) or not isinstance(desired, dict):
+        return [] if current == desired else [prefix]
+    diff = []
+    for key in sorted(set(current) | set(desired), key=str):
+        diff += config_diff(current.get(key), desired.get(key), f"{prefix}{key}.")
+    return [section.rstrip(".") for section in diff]
 
 
 class UDROperatorCharm(CharmBase):
     """Main class to describe juju event handling for the 5G UDR operator."""
 
+    _stored = StoredState()
+
     def __init__(self, *args):
         super().__init__(*args)
+        self._stored.set_default(
+            last_retention_purge=0.0,
+            last_drift_check=0.0,
+            service_resource_version="",
+            config_checksum="",
+            plan_fingerprint="",
+            drift_repairs={"service": 0, "config": 0, "plan": 0},
+            sharded_database_uris="",
+            exporter_pid=0,
+            exporter_fingerprint="",
+            warm_up_pid=0,
+        )
+        self._tracer = Tracer(self, relation_name="tracing")
         self._container_name = self._service_name = "udr"
         self._container = self.unit.get_container(self._container_name)
+        self._tracer.instrument(
+            self._container, ["push", "pull", "add_layer", "replan", "restart"], prefix="pebble"
+        )
         self._database = DatabaseRequires(
-            self, relation_name="database", database_name=DATABASE_NAME, extra_user_roles="admin"
+            self,
+            relation_name="database",
+            database_name=DATABASE_NAME,
+            extra_user_roles="admin",
         )
         self._nrf_requires = NRFRequires(charm=self, relationship_name="nrf")
+        self._udr_provides = UDRProvides(charm=self, relationship_name="udr")
+        self._kafka = KafkaRequires(
+            self,
+            relation_name="kafka",
+            topic=self.model.config["change-stream-topic"],
+            extra_user_roles="producer",
+        )
         self.framework.observe(self.on.udr_pebble_ready, self._on_udr_pebble_ready)
         self.framework.observe(self.on.nrf_relation_created, self._on_udr_pebble_ready)
         self.framework.observe(self._nrf_requires.on.nrf_available, self._on_udr_pebble_ready)
         self.framework.observe(self.on.database_relation_joined, self._on_udr_pebble_ready)
         self.framework.observe(self._database.on.database_created, self._on_udr_pebble_ready)
-        self._service_patcher = KubernetesServicePatch(
+        self.framework.observe(self._database.on.endpoints_changed, self._on_udr_pebble_ready)
+        self.framework.observe(self.on.config_changed, self._on_config_changed)
+        self.framework.observe(self.on.config_changed, self._on_udr_pebble_ready)
+        self.framework.observe(self.on.database_relation_broken, self._on_udr_pebble_ready)
+        self.framework.observe(self.on.upgrade_charm, self._on_udr_pebble_ready)
+        self.framework.observe(self.on.update_status, self._on_update_status)
+        self.framework.observe(self.on.stop, self._drain)
+        self.framework.observe(self.on.remove, self._drain)
+        self._rolling_restart = RollingRestart(
+            charm=self, relation_name="replicas", max_concurrent_config="max-concurrent-restarts"
+        )
+        self.framework.observe(self._rolling_restart.on.restart_granted, self._on_restart_granted)
+        self.framework.observe(
+            self.on.get_db_compression_action, self._on_get_db_compression_action
+        )
+        self.framework.observe(self._kafka.on.topic_created, self._on_udr_pebble_ready)
+        self.framework.observe(self._kafka.on.bootstrap_server_changed, self._on_udr_pebble_ready)
+        self.framework.observe(self.on.kafka_relation_broken, self._on_udr_pebble_ready)
+        self.framework.observe(self.on.leader_elected, self._supervise_change_stream_exporter)
+        self.framework.observe(
+            self.on.leader_settings_changed, self._supervise_change_stream_exporter
+        )
+        self.framework.observe(self.on.update_status, self._supervise_change_stream_exporter)
+        self.framework.observe(self.on.update_status, self._on_scheduled_retention_purge)
+        self.framework.observe(self.on.update_status, self._on_scheduled_drift_check)
+        self.framework.observe(self.on.drift_stats_action, self._on_drift_stats_action)
+        self.framework.observe(self.on.purge_stale_action, self._on_purge_stale_action)
+        self.framework.observe(self.on.db_stats_action, self._on_db_stats_action)
+        self.framework.observe(self.on.shard_collections_action, self._on_shard_collections_action)
+        self.framework.observe(self._database.on.database_created, self._on_auto_shard)
+        self.framework.observe(self._database.on.endpoints_changed, self._on_auto_shard)
+        self.framework.observe(self.on.config_changed, self._on_auto_shard)
+        self.framework.observe(self.on.udr_relation_joined, self._publish_udr_info)
+        self.framework.observe(self.on.leader_elected, self._publish_udr_info)
+        self.framework.observe(self.on.upgrade_charm, self._publish_udr_info)
+        self.framework.observe(self.on.config_changed, self._publish_udr_info)
+        if self.model.config["sbi-scheme"] == "https" or self.model.relations["certificates"]:
+            self._certificates
+        self.framework.observe(self.on.certificates_relation_broken, self._on_udr_pebble_ready)
+
+    @cached_property
+    def _certificates(self) -> "TLSCertificatesRequiresV4":
+        """Returns the requirer of a certificate for the UDR Service and this unit's pod.
+
+        The library keeps the private key of the unit in a unit secret, and requests a new
+        certificate for the same key before the current one expires. Importing it loads
+        cryptography and pydantic, so it is only constructed, and its events observed, when the
+        SBI uses TLS or the `certificates` relation exists.
+
+        Returns:
+            TLSCertificatesRequiresV4: Certificates requirer.
+        """
+        from charmlibs.interfaces.tls_certificates import (
+            CertificateRequestAttributes,
+            Mode,
+            TLSCertificatesRequiresV4,
+        )
+
+        certificates = TLSCertificatesRequiresV4(
+            charm=self,
+            relationship_name="certificates",
+            certificate_requests=[
+                CertificateRequestAttributes(
+                    common_name=self._udr_hostname,
+                    sans_dns=[self._udr_hostname, self._udr_unit_hostname],
+                )
+            ],
+            mode=Mode.UNIT,
+        )
+        self.framework.observe(certificates.on.certificate_available, self._on_udr_pebble_ready)
+        return certificates
+
+    @cached_property
+    def _service_patcher(self) -> "KubernetesServicePatch":
+        """Returns the KubernetesServicePatch describing the UDR Service.
+
+        Building it imports lightkube and reads the namespace file, so it is only constructed
+        by the hooks that patch the Service. `config-changed` follows both `install` and
+        `upgrade-charm`, and `_patch_service` applies the Service unconditionally from there.
+
+        Returns:
+            KubernetesServicePatch: Service patcher.
+        """
+        from charms.observability_libs.v1.kubernetes_service_patch import (
+            KubernetesServicePatch,
+        )
+        from lightkube.models.core_v1 import ServicePort
+
+        service_patcher = KubernetesServicePatch(
             charm=self,
             ports=[
-                ServicePort(name="sbi", port=29504),
+                ServicePort(name="sbi", port=SBI_PORT),
             ],
+            service_type=self.model.config["service-type"],
+            additional_annotations=self._service_annotations,
         )
+        self._set_service_routing_options(service_patcher.service)
+        return service_patcher
+
+    def _on_config_changed(self, event: ConfigChangedEvent) -> None:
+        """Validates the charm configuration and re-applies the Service routing options.
+
+        Args:
+            event (ConfigChangedEvent): Juju event
+        """
+        if invalid_configs := self._get_invalid_configs():
+            self.unit.status = BlockedStatus(
+                f"The following configurations are not valid: {invalid_configs}"
+            )
+            return
+        self._patch_service()
+        self._configure_pod_placement()
+
+    def _get_invalid_configs(self) -> List[str]:
+        """Returns the names of the configuration options holding an invalid value.
+
+        Returns:
+            List[str]: Invalid configuration option names.
+        """
+        invalid_configs = []
+        if self.model.config["service-type"] not in SERVICE_TYPES:
+            invalid_configs.append("service-type")
+        if self.model.config["external-traffic-policy"] not in TRAFFIC_POLICIES + [""]:
+            invalid_configs.append("external-traffic-policy")
+        if self.model.config["internal-traffic-policy"] not in TRAFFIC_POLICIES:
+            invalid_configs.append("internal-traffic-policy")
+        if self.model.config["session-affinity"] not in SESSION_AFFINITIES:
+            invalid_configs.append("session-affinity")
+        if self.model.config["sbi-scheme"] not in SBI_SCHEMES:
+            invalid_configs.append("sbi-scheme")
+        return (
+            invalid_configs
+            + self._get_invalid_placement_configs()
+            + self._get_invalid_restart_configs()
+            + self._get_invalid_warm_up_configs()
+            + self._get_invalid_drain_configs()
+            + self._get_invalid_database_configs()
+            + self._get_invalid_change_stream_configs()
+            + self._get_invalid_retention_configs()
+        )
+
+    def _get_invalid_placement_configs(self) -> List[str]:
+        """Returns the names of the pod placement configuration options holding an invalid value.
+
+        Returns:
+            List[str]: Invalid configuration option names.
+        """
+        invalid_configs = []
+        if self.model.config["pod-anti-affinity"] not in POD_ANTI_AFFINITIES:
+            invalid_configs.append("pod-anti-affinity")
+        topologies = self.model.config["topology-spread"]
+        if topologies and not set(topologies.split(",")) <= set(TOPOLOGY_KEYS):
+            invalid_configs.append("topology-spread")
+        if self.model.config["topology-spread-max-skew"] < 1:
+            invalid_configs.append("topology-spread-max-skew")
+        if self.model.config["topology-spread-when-unsatisfiable"] not in WHEN_UNSATISFIABLE:
+            invalid_configs.append("topology-spread-when-unsatisfiable")
+        for option, parse in [
+            ("node-selector", parse_node_selector),
+            ("tolerations", parse_tolerations),
+        ]:
+            try:
+                parse(self.model.config[option])
+            except ValueError:
+                invalid_configs.append(option)
+        return invalid_configs
+
+    def _get_invalid_restart_configs(self) -> List[str]:
+        """Returns the names of the restart configuration options holding an invalid value.
 
-    def _write_config_file(self, nrf_url: str, database_url: str) -> None:
-        jinja2_environment = Environment(loader=FileSystemLoader("src/templates/"))
-        template = jinja2_environment.get_template("udrcfg.conf.j2")
-        content = template.render(
+        Returns:
+            List[str]: Invalid configuration option names.
+        """
+        invalid_configs = []
+        if self.model.config["max-concurrent-restarts"] < 1:
+            invalid_configs.append("max-concurrent-restarts")
+        # A restarted unit waits for its warm-up, which the readiness check sees a period later.
+        health_timeout = self.model.config["restart-health-timeout"]
+        time_budget = self.model.config["warm-up-time-budget"]
+        if health_timeout < 0 or (
+            time_budget > 0 and health_timeout < time_budget + HEALTH_CHECK_PERIOD
+        ):
+            invalid_configs.append("restart-health-timeout")
+        if self.model.config["preflight-probe-timeout"] < 0:
+            invalid_configs.append("preflight-probe-timeout")
+        if self.model.config["drift-check-interval"] < 0:
+            invalid_configs.append("drift-check-interval")
+        for option in ["workload-on-failure", "workload-on-success"]:
+            if self.model.config[option] not in SERVICE_ACTIONS:
+                invalid_configs.append(option)
+        for option in ["workload-backoff-delay", "workload-backoff-limit", "workload-kill-delay"]:
+            if not DURATION_PATTERN.match(self.model.config[option]):
+                invalid_configs.append(option)
+        if self.model.config["workload-backoff-factor"] < 1:
+            invalid_configs.append("workload-backoff-factor")
+        return invalid_configs
+
+    def _get_invalid_warm_up_configs(self) -> List[str]:
+        """Returns the names of the warm-up configuration options holding an invalid value.
+
+        Returns:
+            List[str]: Invalid configuration option names.
+        """
+        invalid_configs = []
+        if self.model.config["warm-up-time-budget"] < 0:
+            invalid_configs.append("warm-up-time-budget")
+        if self.model.config["warm-up-concurrency"] < 1:
+            invalid_configs.append("warm-up-concurrency")
+        return invalid_configs
+
+    def _get_invalid_drain_configs(self) -> List[str]:
+        """Returns the names of the drain configuration options holding an invalid value.
+
+        Returns:
+            List[str]: Invalid configuration option names.
+        """
+        grace_period = self.model.config["drain-grace-period"]
+        if not 0 <= grace_period < self._max_drain_grace_period:
+            return ["drain-grace-period"]
+        return []
+
+    @property
+    def _max_drain_grace_period(self) -> float:
+        """Returns the grace period above which the drain would outlast the pod.
+
+        Returns:
+            float: Seconds left in the pod termination grace period after the kill-delay.
+        """
+        return POD_TERMINATION_GRACE_PERIOD - parse_duration(
+            self.model.config["workload-kill-delay"]
+        )
+
+    def _get_invalid_database_configs(self) -> List[str]:
+        """Returns the names of the database configuration options holding an invalid value.
+
+        Returns:
+            List[str]: Invalid configuration option names.
+        """
+        invalid_configs = []
+        if self.model.config["db-consistency-profile"] not in [*CONSISTENCY_PROFILES, ""]:
+            invalid_configs.append("db-consistency-profile")
+        if self.model.config["db-write-timeout"] < 0:
+            invalid_configs.append("db-write-timeout")
+        compressors = self.model.config["db-compressors"]
+        if compressors and not set(compressors.split(",")) <= set(SUPPORTED_COMPRESSORS):
+            invalid_configs.append("db-compressors")
+        if not -1 <= self.model.config["db-zlib-compression-level"] <= 9:
+            invalid_configs.append("db-zlib-compression-level")
+        if self.model.config["db-initial-chunks-per-shard"] < 1:
+            invalid_configs.append("db-initial-chunks-per-shard")
+        for prefix in ["db", "authentication-db"]:
+            max_pool_size = self.model.config[f"{prefix}-max-pool-size"]
+            min_pool_size = self.model.config[f"{prefix}-min-pool-size"]
+            if max_pool_size < 0:
+                invalid_configs.append(f"{prefix}-max-pool-size")
+            if min_pool_size < 0 or (max_pool_size and min_pool_size > max_pool_size):
+                invalid_configs.append(f"{prefix}-min-pool-size")
+        return invalid_configs
+
+    def _get_invalid_retention_configs(self) -> List[str]:
+        """Returns the names of the retention configuration options holding an invalid value.
+
+        Returns:
+            List[str]: Invalid configuration option names.
+        """
+        invalid_configs = []
+        try:
+            parse_retention_rules(self.model.config["retention-rules"])
+        except ValueError:
+            invalid_configs.append("retention-rules")
+        for option in [
+            "retention-purge-interval",
+            "retention-purge-batch-size",
+            "retention-purge-batches-per-second",
+            "retention-purge-time-budget",
+        ]:
+            if self.model.config[option] <= 0:
+                invalid_configs.append(option)
+        return invalid_configs
+
+    def _get_invalid_change_stream_configs(self) -> List[str]:
+        """Returns the names of the change stream configuration options holding an invalid value.
+
+        Returns:
+            List[str]: Invalid configuration option names.
+        """
+        invalid_configs = []
+        topic = self.model.config["change-stream-topic"]
+        if not topic or self._requested_kafka_topic not in [None, topic]:
+            invalid_configs.append("change-stream-topic")
+        if self.model.config["change-stream-compression"] not in [*KAFKA_COMPRESSION_TYPES, ""]:
+            invalid_configs.append("change-stream-compression")
+        for option in ["change-stream-batch-size", "change-stream-batch-timeout"]:
+            if self.model.config[option] < 1:
+                invalid_configs.append(option)
+        return invalid_configs
+
+    def _configure_pod_placement(self) -> None:
+        """Patches the pod template of the UDR StatefulSet with the configured placement rules.
+
+        Only the leader patches, and only when the placement differs from the StatefulSet's,
+        since every change to the pod template rolls all units out.
+        """
+        if not self.unit.is_leader():
+            return
+        from lightkube import ApiError, Client
+        from lightkube.core import exceptions
+
+        from kubernetes_placement import KubernetesPodPlacement
+
+        try:
+            client = Client()
+        except exceptions.ConfigError as e:
+            logger.warning("Error creating k8s client: %s", e)
+            return
+        placement = KubernetesPodPlacement(app_name=self.model.app.name, namespace=self.model.name)
+        topologies = self.model.config["topology-spread"]
+        try:
+            with self._tracer.span("kubernetes.patch", resource="StatefulSet"):
+                placement.apply(
+                    client,
+                    placement.pod_spec(
+                        anti_affinity=self.model.config["pod-anti-affinity"],
+                        spread_topologies=topologies.split(",") if topologies else [],
+                        max_skew=self.model.config["topology-spread-max-skew"],
+                        when_unsatisfiable=self.model.config["topology-spread-when-unsatisfiable"],
+                        node_selector=parse_node_selector(self.model.config["node-selector"]),
+                        tolerations=parse_tolerations(self.model.config["tolerations"]),
+                        priority_class_name=self.model.config["priority-class-name"],
+                    ),
+                )
+        except ApiError as e:
+            logger.error("Kubernetes pod placement configuration failed: %s", str(e))
+
+    @property
+    def _service_annotations(self) -> Dict[str, Optional[str]]:
+        """Returns the routing annotations to set on the UDR Service.
+
+        A `None` value removes the annotation when the Service is merge-patched.
+
+        Returns:
+            Dict[str, Optional[str]]: Service annotations.
+        """
+        return {
+            TOPOLOGY_MODE_ANNOTATION: (
+                "Auto" if self.model.config["topology-aware-routing"] else None
+            ),
+        }
+
+    def _set_service_routing_options(self, service: "Service") -> None:
+        """Sets the configured routing annotations and spec fields on a Service object.
+
+        Args:
+            service (Service): Service object to update in place.
+        """
+        service.metadata.annotations = self._service_annotations
+        service.spec.type = self.model.config["service-type"]
+        service.spec.internalTrafficPolicy = self.model.config["internal-traffic-policy"]
+        service.spec.sessionAffinity = self.model.config["session-affinity"]
+        if self.model.config["service-type"] == "LoadBalancer":
+            service.spec.externalTrafficPolicy = (
+                self.model.config["external-traffic-policy"] or None
+            )
+
+    def _patch_service(self) -> None:
+        """Merge-patches the UDR Service with the configured routing options.
+
+        `KubernetesServicePatch` only compares ports to decide whether the Service is patched,
+        so routing changes have to be pushed unconditionally.
+        """
+        from lightkube import ApiError, Client
+        from lightkube.core import exceptions
+        from lightkube.resources.core_v1 import Service
+        from lightkube.types import PatchType
+
+        try:
+            client = Client()
+        except exceptions.ConfigError as e:
+            logger.warning("Error creating k8s client: %s", e)
+            return
+        self._set_service_routing_options(self._service_patcher.service)
+        try:
+            with self._tracer.span("kubernetes.patch", resource="Service"):
+                service = client.patch(
+                    Service,
+                    self._service_patcher.service_name,
+                    self._service_patcher.service,
+                    patch_type=PatchType.MERGE,
+                )
+        except ApiError as e:
+            logger.error("Kubernetes service patch failed: %s", str(e))
+            return
+        self._stored.service_resource_version = str(service.metadata.resourceVersion)
+        logger.info("Kubernetes service routing options applied")
+
+    def _render_config_file(self, nrf_url: str, database_url: str) -> str:
+        """Renders the UDR configuration file.
+
+        Args:
+            nrf_url (str): URL of the NRF.
+            database_url (str): MongoDB connection string.
+
+        Returns:
+            str: Content of the configuration file.
+        """
+        template = load_template(self.charm_dir / "src" / "templates" / CONFIG_TEMPLATE_NAME)
+        return template.render(
             database_name=DATABASE_NAME,
             database_url=database_url,
+            authentication_database_url=self._authentication_database_url,
             nrf_url=nrf_url,
+            plmns=PLMN_SUPPORT_LIST,
             udr_hostname=self._udr_hostname,
+            sbi_scheme=self.model.config["sbi-scheme"],
+            tls_key_path=PRIVATE_KEY_PATH,
+            tls_certificate_path=CERTIFICATE_PATH,
         )
+
+    @traced("write_config_file")
+    def _write_config_file(self, nrf_url: str, database_url: str) -> bool:
+        """Pushes the UDR configuration file if its content changed.
+
+        Args:
+            nrf_url (str): URL of the NRF.
+            database_url (str): MongoDB connection string.
+
+        Returns:
+            bool: Whether the file was pushed.
+        """
+        content = self._render_config_file(nrf_url=nrf_url, database_url=database_url)
+        self._stored.config_checksum = hashlib.sha256(content.encode()).hexdigest()
+        existing_content = self._existing_config_file_content
+        if existing_content == content:
+            return False
+        if existing_content is not None:
+            changed_sections = config_diff(
+                yaml.safe_load(existing_content), yaml.safe_load(content)
+            )
+            logger.info("Config file sections changed: %s", ", ".join(changed_sections))
         self._container.push(path=f"{BASE_CONFIG_PATH}/{CONFIG_FILE_NAME}", source=content)
         logger.info(f"Pushed {CONFIG_FILE_NAME} config file")
+        return True
 
     @property
+    def _existing_config_file_content(self) -> Optional[str]:
+        """Returns the content of the configuration file in the workload container.
+
+        Returns:
+            Optional[str]: File content, or None if the file is not written.
+        """
+        if not self._container.exists(f"{BASE_CONFIG_PATH}/{CONFIG_FILE_NAME}"):
+            logger.info(f"Config file is not written: {CONFIG_FILE_NAME}")
+            return None
+        return self._container.pull(f"{BASE_CONFIG_PATH}/{CONFIG_FILE_NAME}").read()
+
+    @property
+    @traced("readiness.nrf_data_is_available")
     def _nrf_data_is_available(self) -> bool:
         """Returns whether the NRF data is available.
 
@@ -72,52 +687,651 @@ class UDROperatorCharm(CharmBase):
             return False
         return True
 
+    def _on_udr_pebble_ready(self, event: Union[PebbleReadyEvent, NRFAvailableEvent]) -> None:
+        if invalid_configs := self._get_invalid_configs():
+            self.unit.status = BlockedStatus(
+                f"The following configurations are not valid: {invalid_configs}"
+            )
+            return
+        if status := self._missing_dependency_status:
+            self.unit.status = status
+            return
+        if not self._container.can_connect():
+            self.unit.status = WaitingStatus("Waiting for container to be ready")
+            event.defer()
+            return
+        if not self._workload_service_is_running and not self._dependencies_are_reachable():
+            event.defer()
+            return
+        config_file_changed = self._write_config_file(
+            nrf_url=self._nrf_requires.get_nrf_url(),
+            database_url=self._database_url,
+        )
+        certificate_changed = self._write_certificate()
+        self._configure_workload(restart=config_file_changed or certificate_changed)
+        self._configure_change_stream_exporter()
+        self._stored.plan_fingerprint = self._plan_fingerprint
+
     @property
-    def _config_file_is_written(self) -> bool:
-        if not self._container.exists(f"{BASE_CONFIG_PATH}/{CONFIG_FILE_NAME}"):
-            logger.info(f"Config file is not written: {CONFIG_FILE_NAME}")
+    def _missing_dependency_status(self) -> Optional[StatusBase]:
+        """Returns the status of the unit while a relation or its data is missing.
+
+        Returns:
+            Optional[StatusBase]: Blocked or waiting status, or None if nothing is missing.
+        """
+        https = self.model.config["sbi-scheme"] == "https"
+        if status := self._database_relations_status:
+            return status
+        if not self._nrf_relation_is_created:
+            return BlockedStatus("Waiting for NRF relation to be created")
+        if https and not self._relation_created("certificates"):
+            return BlockedStatus("Waiting for certificates relation to be created")
+        if not self._database_is_available:
+            return WaitingStatus("Waiting for database to be ready")
+        if not self._authentication_database_is_ready:
+            return WaitingStatus("Waiting for authentication database to be ready")
+        if not self._nrf_data_is_available:
+            return WaitingStatus("Waiting for NRF data to be available")
+        if https and not self._certificate:
+            return WaitingStatus("Waiting for certificate to be available")
+        return None
+
+    @property
+    @traced("readiness.database_relations_status")
+    def _database_relations_status(self) -> Optional[StatusBase]:
+        """Returns the status of the unit while a database relation is missing or ambiguous.
+
+        Returns:
+            Optional[StatusBase]: Blocked status, or None if every database relation is there.
+        """
+        authentication_app = self.model.config["authentication-db-application"]
+        if len(self._database.relations) > 1 and not authentication_app:
+            return BlockedStatus(
+                "Set `authentication-db-application` to tell the database relations apart"
+            )
+        if not self._database_relation(DATABASE_ROLE):
+            return BlockedStatus("Waiting for database relation to be created")
+        if authentication_app and not self._database_relation(AUTHENTICATION_DATABASE_ROLE):
+            return BlockedStatus(f"Waiting for database relation to {authentication_app}")
+        return None
+
+    @property
+    def _certificate(self) -> Optional[str]:
+        """Returns the certificate chain issued for this unit, leaf certificate first.
+
+        Returns:
+            Optional[str]: PEM-encoded certificate chain, or None if none was issued yet.
+        """
+        provider_certificate, _ = self._certificates.get_assigned_certificate(
+            self._certificates.certificate_requests[0]
+        )
+        if not provider_certificate:
+            return None
+        chain = [str(provider_certificate.certificate)]
+        chain += [str(ca) for ca in provider_certificate.chain if str(ca) not in chain]
+        return "\n".join(chain) + "\n"
+
+    @property
+    def _private_key(self) -> Optional[str]:
+        """Returns the private key of this unit.
+
+        Returns:
+            Optional[str]: PEM-encoded private key, or None if none was generated yet.
+        """
+        private_key = self._certificates.private_key
+        return str(private_key) if private_key else None
+
+    def _write_certificate(self) -> bool:
+        """Pushes the private key and certificate chain if the SBI uses TLS and they changed.
+
+        The workload only loads them when it starts, so a renewed certificate requires a
+        restart, which `_configure_workload` rolls across units.
+
+        Returns:
+            bool: Whether a file was pushed.
+        """
+        if self.model.config["sbi-scheme"] != "https":
             return False
-        logger.info("Config file is written")
-        return True
+        files = {PRIVATE_KEY_PATH: self._private_key, CERTIFICATE_PATH: self._certificate}
+        changed = False
+        for path, content in files.items():
+            if self._container.exists(path) and self._container.pull(path).read() == content:
+                continue
+            self._container.push(path=path, source=content, permissions=0o600)
+            logger.info("Pushed %s", path)
+            changed = True
+        return changed
 
-    def _on_udr_pebble_ready(self, event: Union[PebbleReadyEvent, NRFAvailableEvent]) -> None:
-        if not self._database_relation_is_created:
-            self.unit.status = BlockedStatus("Waiting for database relation to be created")
+    def _supervise_change_stream_exporter(self, event: EventBase) -> None:
+        """Starts the exporter on a new leader, restarts it if it died, and stops it elsewhere.
+
+        Juju has no event for a unit losing leadership, so `update-status` also stops the
+        exporter of a unit that is no longer the leader.
+
+        Args:
+            event (EventBase): Juju event
+        """
+        if self._get_invalid_change_stream_configs():
             return
-        if not self._nrf_relation_is_created:
-            self.unit.status = BlockedStatus("Waiting for NRF relation to be created")
+        self._configure_change_stream_exporter()
+
+    def _configure_change_stream_exporter(self) -> None:
+        """Runs the process publishing UDR data changes to Kafka on the leader unit only.
+
+        The exporter runs in the charm container, as the udr image provides no Python. It is
+        restarted whenever its parameters change, and its credentials are passed on stdin so
+        that they are neither in a Pebble plan nor on a command line.
+        """
+        params = self._change_stream_exporter_params
+        if params is None:
+            self._stop_change_stream_exporter()
             return
-        if not self._database_is_available:
-            self.unit.status = WaitingStatus("Waiting for database to be ready")
+        fingerprint = hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()
+        if (
+            self._change_stream_exporter_is_running
+            and self._stored.exporter_fingerprint == fingerprint
+        ):
             return
-        if not self._nrf_data_is_available:
-            self.unit.status = WaitingStatus("Waiting for NRF data to be available")
+        self._stop_change_stream_exporter()
+        self._stored.exporter_pid = self._spawn(EXPORTER_SCRIPT_NAME, params, EXPORTER_LOG_PATH)
+        self._stored.exporter_fingerprint = fingerprint
+        logger.info("Started change stream exporter to %s", params["topic"])
+
+    def _stop_change_stream_exporter(self) -> None:
+        """Stops the change stream exporter of this unit, if it runs."""
+        if self._terminate(self._stored.exporter_pid, EXPORTER_SCRIPT_NAME):
+            logger.info("Stopped change stream exporter")
+        self._stored.exporter_pid = 0
+
+    @property
+    def _change_stream_exporter_is_running(self) -> bool:
+        """Returns whether the exporter process started by this unit still runs.
+
+        Returns:
+            bool: Whether the exporter runs.
+        """
+        return self._process_is_running(self._stored.exporter_pid, EXPORTER_SCRIPT_NAME)
+
+    def _spawn(self, script_name: str, params: Dict[str, Any], log_path: str) -> int:
+        """Starts a script of the charm in a process of its own, detached from the hook.
+
+        The parameters are passed as JSON on stdin, so that credentials are neither in a
+        Pebble plan nor on a command line.
+
+        Args:
+            script_name (str): Name of the script in the charm's `src` directory.
+            params (Dict[str, Any]): Parameters of the script.
+            log_path (str): File the script's standard error is appended to.
+
+        Returns:
+            int: PID of the process.
+        """
+        with open(log_path, "a") as log:
+            process = Popen(
+                [sys.executable, str(self.charm_dir / "src" / script_name)],
+                stdin=PIPE,
+                stdout=DEVNULL,
+                stderr=log,
+                env={**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)},
+                start_new_session=True,
+            )
+        process.stdin.write(json.dumps(params).encode())
+        process.stdin.close()
+        return process.pid
+
+    @staticmethod
+    def _process_is_running(pid: int, script_name: str) -> bool:
+        """Returns whether a process started by `_spawn()` still runs.
+
+        The command line is checked as well, as the PID may have been reused after the charm
+        container restarted.
+
+        Args:
+            pid (int): PID of the process.
+            script_name (str): Name of the script the process runs.
+
+        Returns:
+            bool: Whether the process runs.
+        """
+        if not pid:
+            return False
+        try:
+            cmdline = Path(f"/proc/{pid}/cmdline").read_bytes()
+        except OSError:
+            return False
+        return script_name.encode() in cmdline
+
+    def _terminate(self, pid: int, script_name: str) -> bool:
+        """Stops a process started by `_spawn()`, if it still runs.
+
+        Args:
+            pid (int): PID of the process.
+            script_name (str): Name of the script the process runs.
+
+        Returns:
+            bool: Whether the process was running.
+        """
+        if not self._process_is_running(pid, script_name):
+            return False
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+        return True
+
+    @property
+    def _requested_kafka_topic(self) -> Optional[str]:
+        """Returns the topic requested over the `kafka` relation, as seen by the leader.
+
+        Kafka only creates the topic requested when the relation joins, so a different topic
+        can only be requested by removing the relation and adding it again.
+
+        Returns:
+            Optional[str]: Requested topic, or None if none was requested.
+        """
+        relation = self.model.get_relation("kafka")
+        if not relation or not self.unit.is_leader():
+            return None
+        return relation.data[self.app].get("topic")
+
+    @property
+    def _kafka_data(self) -> Optional[Dict[str, str]]:
+        """Returns the Kafka credentials and endpoints once the topic is created.
+
+        Returns:
+            Optional[Dict[str, str]]: Kafka relation data.
+        """
+        for data in self._kafka.fetch_relation_data().values():
+            if {"username", "password", "endpoints"} <= set(data):
+                return data
+        return None
+
+    @property
+    def _change_stream_exporter_params(self) -> Optional[Dict[str, Any]]:
+        """Returns the parameters of the change stream exporter.
+
+        Returns:
+            Optional[Dict[str, Any]]: Exporter parameters, or None when this unit must not run
+                it.
+        """
+        if not self.unit.is_leader() or not self.model.config["change-stream-exporter"]:
+            return None
+        kafka_data = self._kafka_data
+        if not kafka_data or not self._database_is_available:
+            return None
+        collections = self.model.config["change-stream-collections"]
+        tls = kafka_data.get("tls", "").lower() in ["enabled", "true"]
+        return {
+            "uri": self._database_data["uris"],
+            "database": DATABASE_NAME,
+            "collections": collections.split(",") if collections else UDR_COLLECTIONS,
+            "bootstrap_servers": kafka_data["endpoints"],
+            "topic": self.model.config["change-stream-topic"],
+            "username": kafka_data["username"],
+            "password": kafka_data["password"],
+            "security_protocol": "SASL_SSL" if tls else "SASL_PLAINTEXT",
+            "sasl_mechanism": KAFKA_SASL_MECHANISM,
+            "tls_ca": kafka_data.get("tls-ca", "") if tls else "",
+            "compression": self.model.config["change-stream-compression"],
+            "batch_size": self.model.config["change-stream-batch-size"],
+            "batch_timeout_ms": self.model.config["change-stream-batch-timeout"],
+        }
+
+    @traced("readiness.dependencies_are_reachable")
+    def _dependencies_are_reachable(self) -> bool:
+        """Probes every MongoDB host and the NRF concurrently before the workload is started.
+
+        Sets a waiting status listing the measured round-trip times when any of them cannot be
+        reached, rather than starting a workload that would crash-loop.
+
+        Returns:
+            bool: Whether all dependencies are reachable.
+        """
+        timeout = self.model.config["preflight-probe-timeout"]
+        if not timeout:
+            return True
+        endpoints = mongodb_endpoints(self._database_data["uris"]) + [
+            http_endpoint(self._nrf_requires.get_nrf_url())
+        ]
+        if authentication_database_data := self._database_relation_data(
+            AUTHENTICATION_DATABASE_ROLE
+        ):
+            endpoints += mongodb_endpoints(authentication_database_data["uris"])
+        round_trip_times = probe(endpoints, timeout=timeout)
+        report = ", ".join(
+            f"{host}:{port} {'unreachable' if rtt is None else f'{rtt:.1f}ms'}"
+            for (host, port), rtt in round_trip_times.items()
+        )
+        if None in round_trip_times.values():
+            self.unit.status = WaitingStatus(f"Waiting for dependencies to be reachable: {report}")
+            return False
+        logger.info("Dependencies are reachable: %s", report)
+        return True
+
+    def _configure_workload(self, restart: bool) -> None:
+        """Applies the Pebble layer to the workload.
+
+        A stopped workload is started straight away, then warmed up. A running workload whose
+        layer or configuration file changed is only restarted once this unit is granted the
+        restart lock, so that the application never restarts all of its units at the same time.
+        A running workload that is up to date is left alone.
+
+        Args:
+            restart (bool): Whether a running workload must be restarted.
+        """
+        if self._workload_service_is_running:
+            if restart or not self._pebble_layer_is_applied:
+                self.unit.status = MaintenanceStatus("Waiting for restart lock")
+                self._rolling_restart.request()
+            elif not self._rolling_restart.is_requested:
+                self._set_active_status()
             return
+        self._clear_warm_up_marker()
+        self._container.add_layer("udr", self._pebble_layer, combine=True)
+        self._container.replan()
+        self._start_warm_up()
+        self._set_active_status()
+
+    def _on_restart_granted(self, event: RestartGrantedEvent) -> None:
+        """Restarts the workload and releases the restart lock once it is healthy.
+
+        Args:
+            event (RestartGrantedEvent): RollingRestart event
+        """
         if not self._container.can_connect():
-            self.unit.status = WaitingStatus("Waiting for container to be ready")
             event.defer()
             return
-        if not self._config_file_is_written:
-            self._write_config_file(
-                nrf_url=self._nrf_requires.get_nrf_url(),
-                database_url=self._database_data["uris"].split(",")[0],
-            )
+        self._clear_warm_up_marker()
         self._container.add_layer("udr", self._pebble_layer, combine=True)
-        self._container.replan()
+        self._container.restart(self._service_name)
+        self._stored.plan_fingerprint = self._plan_fingerprint
+        logger.info("Restarted %s service", self._service_name)
+        self._start_warm_up()
+        if not self._wait_for_workload_health(timeout=self.model.config["restart-health-timeout"]):
+            self.unit.status = WaitingStatus("Waiting for workload health checks to pass")
+            return
+        self._rolling_restart.release()
         self.unit.status = ActiveStatus()
 
+    def _clear_warm_up_marker(self) -> None:
+        """Fails the `udr-warmup` readiness check until the next warm-up completes.
+
+        A warm-up still running is stopped first, so that it does not mark the workload ready.
+        """
+        self._terminate(self._stored.warm_up_pid, WARM_UP_SCRIPT_NAME)
+        self._stored.warm_up_pid = 0
+        if self._container.exists(WARM_UP_MARKER_PATH):
+            self._container.remove_path(WARM_UP_MARKER_PATH)
+
+    def _start_warm_up(self) -> None:
+        """Reads the UDR indexes and collections into the MongoDB cache in the background.
+
+        The `udr-warmup` readiness check fails until the warm-up writes the marker file, which
+        keeps the pod out of the Service endpoints while the cache is cold. The warm-up runs
+        in a process of its own so that no hook waits for it, and writes the marker through
+        Pebble once it completes, runs out of `warm-up-time-budget` or fails.
+        """
+        time_budget = self.model.config["warm-up-time-budget"]
+        if not time_budget or not self._database_is_available:
+            self._container.push(WARM_UP_MARKER_PATH, source=str(time.time()), make_dirs=True)
+            return
+        params = {
+            "uri": self._database_data["uris"],
+            "database": DATABASE_NAME,
+            "collections": UDR_COLLECTIONS,
+            "concurrency": self.model.config["warm-up-concurrency"],
+            "time_budget": time_budget,
+            "pebble_socket": f"/charm/containers/{self._container.name}/pebble.socket",
+            "marker_path": WARM_UP_MARKER_PATH,
+            "progress_path": WARM_UP_PROGRESS_PATH,
+        }
+        # The warm-up writes its progress from its first to its last record.
+        Path(WARM_UP_PROGRESS_PATH).unlink(missing_ok=True)
+        self._stored.warm_up_pid = self._spawn(WARM_UP_SCRIPT_NAME, params, WARM_UP_LOG_PATH)
+        logger.info("Started warm-up with a budget of %d seconds", time_budget)
+
     @property
-    def _database_relation_is_created(self) -> bool:
-        return self._relation_created("database")
+    def _warm_up_progress(self) -> Optional[Dict[str, Any]]:
+        """Returns the progress of the warm-up of this unit while it runs.
+
+        Returns:
+            Optional[Dict[str, Any]]: `completed` and `total` scans, or None when no warm-up
+                runs.
+        """
+        if not self._process_is_running(self._stored.warm_up_pid, WARM_UP_SCRIPT_NAME):
+            return None
+        try:
+            progress = json.loads(Path(WARM_UP_PROGRESS_PATH).read_text())
+        except (FileNotFoundError, ValueError):
+            return {"completed": 0, "total": 0}
+        if progress["done"]:
+            return None
+        return progress
+
+    def _set_active_status(self) -> None:
+        """Sets the unit status to active, or to the warm-up progress while the warm-up runs."""
+        if not (progress := self._warm_up_progress):
+            self.unit.status = ActiveStatus()
+        elif progress["total"]:
+            self.unit.status = MaintenanceStatus(
+                f"Warming up: {progress['completed']}/{progress['total']} scans"
+            )
+        else:
+            self.unit.status = MaintenanceStatus("Warming up")
+
+    def _drain(self, event: EventBase) -> None:
+        """Takes the unit out of service before its pod goes away.
+
+        The readiness check is failed first so that Kubernetes stops routing new requests to
+        the pod, then in-flight requests get `drain-grace-period` seconds to complete. The
+        service is stopped last: Pebble sends it SIGTERM, on which UDR deregisters its NF
+        instance from the NRF, and only kills it once `workload-kill-delay` has passed.
+
+        Args:
+            event (EventBase): Juju event
+        """
+        if not self._container.can_connect() or not self._workload_service_is_running:
+            return
+        self.unit.status = MaintenanceStatus("Draining")
+        self._clear_warm_up_marker()
+        grace_period = min(
+            max(self.model.config["drain-grace-period"], 0),
+            max(self._max_drain_grace_period - 1, 0),
+        )
+        logger.info("Draining for %d seconds before stopping %s", grace_period, self._service_name)
+        time.sleep(grace_period)
+        self._container.stop(self._service_name)
+        logger.info("Stopped %s service", self._service_name)
+
+    def _on_update_status(self, event: EventBase) -> None:
+        """Reports the warm-up progress, and releases a restart lock once the workload is healthy.
+
+        A unit still waiting for the lock keeps its request: its workload was not restarted
+        yet, so releasing it would drop the pending restart.
+
+        Args:
+            event (EventBase): Juju event
+        """
+        if self.unit.status.message.startswith("Warming up"):
+            self._set_active_status()
+        if not self._rolling_restart.is_restarting:
+            return
+        if not self._container.can_connect() or not self._pebble_layer_is_applied:
+            return
+        if not self._workload_is_healthy:
+            return
+        self._rolling_restart.release()
+        self.unit.status = ActiveStatus()
+
+    def _on_scheduled_drift_check(self, event: EventBase) -> None:
+        """Repairs changes made behind the charm's back, at most once per check interval.
+
+        The Service resourceVersion, the configuration file checksum and the Pebble plan are
+        compared with the fingerprints recorded when the charm last applied them, and only
+        the resources whose fingerprint differs are re-applied.
+
+        Args:
+            event (EventBase): Juju event
+        """
+        interval = self.model.config["drift-check-interval"]
+        if not interval or time.time() - self._stored.last_drift_check < interval * 60:
+            return
+        self._stored.last_drift_check = time.time()
+        if self.unit.is_leader() and self._stored.service_resource_version:
+            self._check_service_drift()
+        if not self._container.can_connect():
+            return
+        if self._stored.config_checksum:
+            self._check_config_drift()
+        if self._stored.plan_fingerprint and not self._rolling_restart.is_requested:
+            self._check_plan_drift()
+
+    def _check_service_drift(self) -> None:
+        """Re-applies the Service routing options if the Service changed since it was patched."""
+        from lightkube import ApiError, Client
+        from lightkube.core import exceptions
+        from lightkube.resources.core_v1 import Service
+
+        try:
+            service = Client().get(Service, self._service_patcher.service_name)
+        except (exceptions.ConfigError, ApiError) as e:
+            logger.warning("Failed to get the Kubernetes service: %s", e)
+            return
+        if str(service.metadata.resourceVersion) == self._stored.service_resource_version:
+            return
+        self._count_drift("service")
+        self._patch_service()
+
+    def _check_config_drift(self) -> None:
+        """Re-writes the configuration file if it changed since it was written."""
+        content = self._existing_config_file_content
+        if (
+            content
+            and hashlib.sha256(content.encode()).hexdigest() == self._stored.config_checksum
+        ):
+            return
+        if not self._database_is_available or not self._nrf_data_is_available:
+            return
+        self._count_drift("config")
+        config_file_changed = self._write_config_file(
+            nrf_url=self._nrf_requires.get_nrf_url(),
+            database_url=self._database_url,
+        )
+        self._configure_workload(restart=config_file_changed)
+
+    def _check_plan_drift(self) -> None:
+        """Re-applies the Pebble layer if the plan changed and no longer matches it."""
+        fingerprint = self._plan_fingerprint
+        if fingerprint == self._stored.plan_fingerprint:
+            return
+        if self._pebble_layer_is_applied:
+            self._stored.plan_fingerprint = fingerprint
+            return
+        self._count_drift("plan")
+        self._configure_workload(restart=False)
+
+    def _count_drift(self, resource: str) -> None:
+        self._stored.drift_repairs[resource] += 1
+        logger.warning(
+            "Repairing drifted %s (%d repairs so far)",
+            resource,
+            self._stored.drift_repairs[resource],
+        )
 
     @property
+    def _plan_fingerprint(self) -> str:
+        """Returns a hash of the Pebble plan.
+
+        Returns:
+            str: SHA-256 of the plan.
+        """
+        return hashlib.sha256(self._container.get_plan().to_yaml().encode()).hexdigest()
+
+    def _on_drift_stats_action(self, event: ActionEvent) -> None:
+        """Reports how many times drift was repaired and when it was last checked.
+
+        Args:
+            event (ActionEvent): Juju event
+        """
+        event.set_results(
+            {
+                "service-repairs": self._stored.drift_repairs["service"],
+                "config-repairs": self._stored.drift_repairs["config"],
+                "plan-repairs": self._stored.drift_repairs["plan"],
+                "last-check": time.strftime(
+                    "%Y-%m-%dT%H:%M:%SZ", time.gmtime(self._stored.last_drift_check)
+                ),
+            }
+        )
+
+    def _wait_for_workload_health(self, timeout: int) -> bool:
+        """Waits for the workload to pass its Pebble health checks.
+
+        Pebble reports checks as up until they fail, so at least one check period is waited
+        for before trusting them.
+
+        Args:
+            timeout (int): Seconds to wait for.
+
+        Returns:
+            bool: Whether the workload became healthy before the timeout.
+        """
+        started = time.monotonic()
+        while True:
+            elapsed = time.monotonic() - started
+            if elapsed >= min(HEALTH_CHECK_PERIOD, timeout) and self._workload_is_healthy:
+                return True
+            if elapsed >= timeout:
+                return False
+            time.sleep(1)
+
+    @property
+    def _workload_is_healthy(self) -> bool:
+        """Returns whether the workload service is running and its readiness checks are up.
+
+        Returns:
+            bool: Whether the workload is healthy.
+        """
+        if not self._workload_service_is_running:
+            return False
+        return all(
+            check.status == CheckStatus.UP
+            for check in self._container.get_checks(level=CheckLevel.READY).values()
+        )
+
+    @property
+    def _workload_service_is_running(self) -> bool:
+        service = self._container.get_services(self._service_name).get(self._service_name)
+        return bool(service and service.is_running())
+
+    @property
+    def _pebble_layer_is_applied(self) -> bool:
+        """Returns whether the Pebble plan already matches the charm's layer.
+
+        Durations are compared as such, since Pebble returns them in canonical form.
+
+        Returns:
+            bool: Whether the layer is applied.
+        """
+        plan = self._container.get_plan()
+        layer = self._pebble_layer
+        definitions = [(plan.services.get(self._service_name), layer.services[self._service_name])]
+        definitions += [(plan.checks.get(name), check) for name, check in layer.checks.items()]
+        return all(
+            applied is not None
+            and normalize_durations(applied.to_dict()) == normalize_durations(desired.to_dict())
+            for applied, desired in definitions
+        )
+
+    @property
+    @traced("readiness.database_is_available")
     def _database_is_available(self) -> bool:
         """Returns whether the database is available.
 
         Returns:
             bool: Whether the database is available.
         """
-        return self._database.is_resource_created()
+        return self._database_relation_data(DATABASE_ROLE) is not None
 
     @property
     def _database_data(self) -> Dict:
@@ -126,11 +1340,326 @@ class UDROperatorCharm(CharmBase):
         Returns:
             Dict: The database data.
         """
-        if not self._database_is_available:
+        if (database_data := self._database_relation_data(DATABASE_ROLE)) is None:
             raise RuntimeError("Database is not available")
-        return self._database.fetch_relation_data()[self._database.relations[0].id]
+        return database_data
+
+    def _database_relation(self, role: str) -> Optional[Relation]:
+        """Returns the `database` relation holding the UDR or the authentication database.
+
+        The relation to the application named by `authentication-db-application` holds the
+        authentication subscription data, the other one holds all other UDR data. Every unit
+        thereby maps the relations the same way, whatever order they joined in.
+
+        Args:
+            role (str): `udr` or `authentication`.
+
+        Returns:
+            Optional[Relation]: The relation, if any.
+        """
+        authentication_app = self.model.config["authentication-db-application"]
+        for relation in self._database.relations:
+            is_authentication = bool(authentication_app) and (
+                relation.app is not None and relation.app.name == authentication_app
+            )
+            if is_authentication == (role == AUTHENTICATION_DATABASE_ROLE):
+                return relation
+        return None
+
+    def _database_relation_data(self, role: str) -> Optional[Dict]:
+        """Returns the data of the `database` relation holding a database once it is created.
+
+        Args:
+            role (str): `udr` or `authentication`.
+
+        Returns:
+            Optional[Dict]: Relation data, or None if the database is not created yet.
+        """
+        relation = self._database_relation(role)
+        if not relation or not self._database.is_resource_created(relation.id):
+            return None
+        return self._database.fetch_relation_data()[relation.id]
 
     @property
+    def _authentication_database_is_ready(self) -> bool:
+        """Returns whether the authentication database is either not related or created.
+
+        Returns:
+            bool: Whether the configuration file can be rendered.
+        """
+        if not self._database_relation(AUTHENTICATION_DATABASE_ROLE):
+            return True
+        return self._database_relation_data(AUTHENTICATION_DATABASE_ROLE) is not None
+
+    @property
+    def _database_url(self) -> str:
+        """Returns the MongoDB connection string rendered in the UDR configuration file.
+
+        Returns:
+            str: The connection string with the configured connection options.
+        """
+        return with_options(
+            self._database_data["uris"].split(",")[0], self._database_connection_options("db")
+        )
+
+    @property
+    def _authentication_database_url(self) -> Optional[str]:
+        """Returns the connection string of the dedicated authentication database.
+
+        Returns:
+            Optional[str]: The connection string with the configured connection options, or
+                None if authentication data lives in the UDR database.
+        """
+        database_data = self._database_relation_data(AUTHENTICATION_DATABASE_ROLE)
+        if not database_data:
+            return None
+        return with_options(
+            database_data["uris"].split(",")[0],
+            self._database_connection_options("authentication-db"),
+        )
+
+    def _database_connection_options(self, pool_option_prefix: str) -> Dict[str, str]:
+        """Returns the connection string options derived from the charm configuration.
+
+        Args:
+            pool_option_prefix (str): Prefix of the connection pool options of the database,
+                `db` or `authentication-db`.
+
+        Returns:
+            Dict[str, str]: Connection string options.
+        """
+        options = dict(CONSISTENCY_PROFILES.get(self.model.config["db-consistency-profile"], {}))
+        for option, name in [("maxPoolSize", "max-pool-size"), ("minPoolSize", "min-pool-size")]:
+            if self.model.config[f"{pool_option_prefix}-{name}"]:
+                options[option] = str(self.model.config[f"{pool_option_prefix}-{name}"])
+        if self.model.config["db-write-timeout"]:
+            options["wtimeoutMS"] = str(self.model.config["db-write-timeout"])
+        if self.model.config["db-compressors"]:
+            options["compressors"] = self.model.config["db-compressors"]
+        if self.model.config["db-zlib-compression-level"] != -1:
+            options["zlibCompressionLevel"] = str(self.model.config["db-zlib-compression-level"])
+        return options
+
+    def _on_scheduled_retention_purge(self, event: EventBase) -> None:
+        """Purges stale documents from the leader, at most once per purge interval.
+
+        Each run is bounded by `retention-purge-time-budget`; documents left over are purged
+        by the next run.
+
+        Args:
+            event (EventBase): Juju event
+        """
+        if not self.unit.is_leader() or not self.model.config["retention-rules"]:
+            return
+        if self._get_invalid_retention_configs() or not self._database_is_available:
+            return
+        interval = self.model.config["retention-purge-interval"] * 60
+        if time.time() - self._stored.last_retention_purge < interval:
+            return
+        self._stored.last_retention_purge = time.time()
+        from pymongo.errors import PyMongoError
+
+        try:
+            report = self._purge_stale(
+                dry_run=False, time_budget=self.model.config["retention-purge-time-budget"]
+            )
+        except PyMongoError as e:
+            logger.error("Scheduled retention purge failed: %s", e)
+            return
+        logger.info("Scheduled retention purge: %s", report)
+
+    def _on_purge_stale_action(self, event: ActionEvent) -> None:
+        """Purges documents older than their collection's retention period.
+
+        Args:
+            event (ActionEvent): Juju event
+        """
+        if invalid_configs := self._get_invalid_retention_configs():
+            event.fail(f"The following configurations are not valid: {invalid_configs}")
+            return
+        if not self.model.config["retention-rules"]:
+            event.fail("No retention rules are configured")
+            return
+        if not self._database_is_available:
+            event.fail("Database is not available")
+            return
+        from pymongo.errors import PyMongoError
+
+        try:
+            report = self._purge_stale(dry_run=event.params["dry-run"], time_budget=None)
+        except PyMongoError as e:
+            event.fail(f"Failed to purge stale documents: {e}")
+            return
+        event.set_results(
+            {
+                "dry-run": event.params["dry-run"],
+                "collections": json.dumps(report),
+                "documents": sum(stats["documents"] for stats in report.values()),
+                "reclaimed-bytes": sum(stats["reclaimed-bytes"] for stats in report.values()),
+            }
+        )
+
+    def _purge_stale(self, dry_run: bool, time_budget: Optional[float]) -> Dict[str, Dict]:
+        """Purges stale documents according to the configured retention rules.
+
+        Args:
+            dry_run (bool): Only count the documents that would be removed.
+            time_budget (Optional[float]): Seconds after which the purge stops.
+
+        Returns:
+            Dict[str, Dict]: Per-collection purge report.
+        """
+        with connect(self._database_data["uris"]) as client:
+            return purge_stale(
+                client[DATABASE_NAME],
+                rules=parse_retention_rules(self.model.config["retention-rules"]),
+                batch_size=self.model.config["retention-purge-batch-size"],
+                batches_per_second=self.model.config["retention-purge-batches-per-second"],
+                time_budget=time_budget,
+                dry_run=dry_run,
+            )
+
+    def _on_db_stats_action(self, event: ActionEvent) -> None:
+        """Reports the working set of the UDR collections against the MongoDB cache size.
+
+        Args:
+            event (ActionEvent): Juju event
+        """
+        if not self._database_is_available:
+            event.fail("Database is not available")
+            return
+        from pymongo.errors import PyMongoError
+
+        try:
+            with connect(self._database_data["uris"]) as client:
+                report = working_set_report(client, DATABASE_NAME, UDR_COLLECTIONS)
+        except PyMongoError as e:
+            event.fail(f"Failed to query MongoDB: {e}")
+            return
+        event.set_results(
+            {
+                "collections": json.dumps(report["collections"]),
+                "total-data-size": report["total-data-size"],
+                "total-index-size": report["total-index-size"],
+                "cache-size": report["cache-size"],
+                "working-set-fits-in-cache": report["working-set-fits-in-cache"],
+                "unused-indexes": ",".join(report["unused-indexes"]) or "none",
+                "collection-scans": json.dumps(report["collection-scans"]),
+            }
+        )
+
+    def _on_shard_collections_action(self, event: ActionEvent) -> None:
+        """Shards the UE collections of the UDR database on a hashed `ueId` key.
+
+        Args:
+            event (ActionEvent): Juju event
+        """
+        if invalid_configs := self._get_invalid_database_configs():
+            event.fail(f"The following configurations are not valid: {invalid_configs}")
+            return
+        if not self._database_is_available:
+            event.fail("Database is not available")
+            return
+        from pymongo.errors import PyMongoError
+
+        try:
+            report = self._shard_collections()
+        except PyMongoError as e:
+            event.fail(f"Failed to shard collections: {e}")
+            return
+        if report is None:
+            event.fail("Database is not a sharded cluster, the relation must point at mongos")
+            return
+        event.set_results(
+            {
+                "collections": json.dumps(report["collections"]),
+                "shards": report["shards"],
+                "balancer-mode": report["balancer-mode"],
+                "balancer-running": report["balancer-running"],
+            }
+        )
+
+    def _on_auto_shard(self, event: EventBase) -> None:
+        """Shards the UE collections from the leader once per set of database endpoints.
+
+        Args:
+            event (EventBase): Juju event
+        """
+        if not self.unit.is_leader() or not self.model.config["db-auto-shard"]:
+            return
+        if self._get_invalid_database_configs() or not self._database_is_available:
+            return
+        uris = self._database_data["uris"]
+        if self._stored.sharded_database_uris == uris:
+            return
+        from pymongo.errors import PyMongoError
+
+        try:
+            report = self._shard_collections()
+        except PyMongoError as e:
+            logger.error("Automatic sharding failed: %s", e)
+            return
+        self._stored.sharded_database_uris = uris
+        if report is None:
+            logger.info("Database is not a sharded cluster, collections are not sharded")
+            return
+        logger.info("Automatic sharding: %s", report)
+
+    def _shard_collections(self) -> Optional[Dict[str, Any]]:
+        """Shards the UE collections of the UDR database if it is a sharded cluster.
+
+        Returns:
+            Optional[Dict[str, Any]]: Sharding report, or None if the database is not sharded.
+        """
+        with connect(self._database_data["uris"]) as client:
+            if not is_sharded_cluster(client):
+                return None
+            return shard_collections(
+                client,
+                DATABASE_NAME,
+                UE_COLLECTIONS,
+                chunks_per_shard=self.model.config["db-initial-chunks-per-shard"],
+            )
+
+    def _on_get_db_compression_action(self, event: ActionEvent) -> None:
+        """Reports the MongoDB wire-protocol compressor negotiated for the UDR connection.
+
+        The handshake offers the compressors of the UDR connection string, so MongoDB accepts
+        the same ones as for the workload. The byte counters are server-wide.
+
+        Args:
+            event (ActionEvent): Juju event
+        """
+        if not self._database_is_available:
+            event.fail("Database is not available")
+            return
+        from pymongo.errors import PyMongoError
+
+        configured = self.model.config["db-compressors"]
+        try:
+            accepted = negotiated_compressors(
+                self._database_url, configured.split(",") if configured else []
+            )
+            compression_stats = server_compression_stats(self._database_url)
+        except PyMongoError as e:
+            event.fail(f"Failed to query MongoDB: {e}")
+            return
+        event.set_results(
+            {
+                "configured": configured or "none",
+                "negotiated": accepted[0] if accepted else "none",
+                "server-stats": {
+                    name: {
+                        "bytes-in": stats.get("compressor", {}).get("bytesIn", 0),
+                        "bytes-out": stats.get("compressor", {}).get("bytesOut", 0),
+                    }
+                    for name, stats in compression_stats.items()
+                },
+            }
+        )
+
+    @property
+    @traced("readiness.nrf_relation_is_created")
     def _nrf_relation_is_created(self) -> bool:
         return self._relation_created("nrf")
 
@@ -143,9 +1672,7 @@ class UDROperatorCharm(CharmBase):
         Returns:
             str: Whether the relation was created.
         """
-        if not self.model.get_relation(relation_name):
-            return False
-        return True
+        return bool(self.model.relations[relation_name])
 
     @property
     def _pebble_layer(self) -> Layer:
@@ -164,6 +1691,27 @@ class UDROperatorCharm(CharmBase):
                         "startup": "enabled",
                         "command": f"/free5gc/udr/udr --udrcfg {BASE_CONFIG_PATH}/{CONFIG_FILE_NAME}",
                         "environment": self._environment_variables,
+                        "on-failure": self.model.config["workload-on-failure"],
+                        "on-success": self.model.config["workload-on-success"],
+                        "backoff-delay": self.model.config["workload-backoff-delay"],
+                        "backoff-factor": self.model.config["workload-backoff-factor"],
+                        "backoff-limit": self.model.config["workload-backoff-limit"],
+                        "kill-delay": self.model.config["workload-kill-delay"],
+                    },
+                },
+                "checks": {
+                    "udr-sbi": {
+                        "override": "replace",
+                        "level": "ready",
+                        "period": f"{HEALTH_CHECK_PERIOD}s",
+                        "tcp": {"port": SBI_PORT},
+                    },
+                    "udr-warmup": {
+                        "override": "replace",
+                        "level": "ready",
+                        "period": f"{HEALTH_CHECK_PERIOD}s",
+                        "threshold": 1,
+                        "exec": {"command": f"test -f {WARM_UP_MARKER_PATH}"},
                     },
                 },
             }
@@ -171,7 +1719,7 @@ class UDROperatorCharm(CharmBase):
 
     @property
     def _environment_variables(self) -> dict:
-        return {
+        environment_variables = {
             "GRPC_GO_LOG_VERBOSITY_LEVEL": "99",
             "GRPC_GO_LOG_SEVERITY_LEVEL": "info",
             "GRPC_TRACE": "all",
@@ -179,8 +1727,10 @@ class UDROperatorCharm(CharmBase):
             "POD_IP": str(self._pod_ip),
             "MANAGED_BY_CONFIG_POD": "true",
         }
+        return environment_variables
 
     @property
+    @traced("unit-get")
     def _pod_ip(self) -> Optional[IPv4Address]:
         """Get the IP address of the Kubernetes pod."""
         return IPv4Address(check_output(["unit-get", "private-address"]).decode().strip())
@@ -189,6 +1739,31 @@ class UDROperatorCharm(CharmBase):
     def _udr_hostname(self) -> str:
         return f"{self.model.app.name}.{self.model.name}.svc.cluster.local"
 
+    @property
+    def _udr_unit_hostname(self) -> str:
+        """Returns the DNS name of this unit's pod behind the Juju headless Service.
+
+        Returns:
+            str: Unit hostname.
+        """
+        pod_name = self.unit.name.replace("/", "-")
+        return f"{pod_name}.{self.model.app.name}-endpoints.{self.model.name}.svc.cluster.local"
+
+    def _publish_udr_info(self, event: EventBase) -> None:
+        """Publishes the UDR SBI URLs and supported PLMNs over the `udr` relation.
+
+        Args:
+            event (EventBase): Juju event
+        """
+        if not self.model.relations["udr"] or self.model.config["sbi-scheme"] not in SBI_SCHEMES:
+            return
+        scheme = self.model.config["sbi-scheme"]
+        self._udr_provides.set_unit_info(url=f"{scheme}://{self._udr_unit_hostname}:{SBI_PORT}")
+        if self.unit.is_leader():
+            self._udr_provides.set_info(
+                url=f"{scheme}://{self._udr_hostname}:{SBI_PORT}", plmns=PLMN_SUPPORT_LIST
+            )
+
 
 if __name__ == "__main__":
     main(UDROperatorCharm)
@@ -0,0 +1,200 @@
+# Copyright 2022 Guillaume Belanger
+# See LICENSE file for licensing details.
+
+"""Manages the placement of the pods of the StatefulSet created by Juju.
+
+Juju sets placement fields of its own, such as a `kubernetes.io/arch` node selector from the
+arch constraint, so only the fields, node labels and tolerations the charm sets are changed.
+They are recorded in an annotation of the StatefulSet, so that whichever unit is leader knows
+which ones to remove once they are no longer configured.
+"""
+
+import json
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from lightkube import Client
+from lightkube.models.core_v1 import (
+    PodAffinityTerm,
+    PodAntiAffinity,
+    TopologySpreadConstraint,
+    WeightedPodAffinityTerm,
+)
+from lightkube.models.meta_v1 import LabelSelector
+from lightkube.resources.apps_v1 import StatefulSet
+from lightkube.types import PatchType
+
+from placement_config import TOPOLOGY_KEYS
+
+logger = logging.getLogger(__name__)
+
+OWNED_PLACEMENT_ANNOTATION = "udr-operator.charm/owned-placement"
+OWNED_FIELDS = ["affinity", "topologySpreadConstraints", "priorityClassName"]
+
+
+class KubernetesPodPlacement:
+    """Patches the pod template of a Juju application's StatefulSet with placement rules."""
+
+    def __init__(self, app_name: str, namespace: str):
+        self.app_name = app_name
+        self.namespace = namespace
+
+    def pod_spec(
+        self,
+        anti_affinity: str,
+        spread_topologies: List[str],
+        max_skew: int,
+        when_unsatisfiable: str,
+        node_selector: Dict[str, str],
+        tolerations: List[Dict[str, str]],
+        priority_class_name: str,
+    ) -> Dict[str, Any]:
+        """Returns the placement the charm sets on the pod template, None meaning unset.
+
+        Args:
+            anti_affinity: `required` or `preferred` to keep pods on different nodes, or an
+                empty string to leave pods free to share nodes.
+            spread_topologies: Topologies (`zone`, `node`) to spread pods evenly across.
+            max_skew: Maximum difference in number of pods between two topology domains.
+            when_unsatisfiable: `DoNotSchedule` or `ScheduleAnyway`.
+            node_selector: Labels of the nodes pods may be scheduled on.
+            tolerations: Taints pods tolerate.
+            priority_class_name: PriorityClass of the pods.
+
+        Returns:
+            Dict[str, Any]: Pod spec fields, as in a JSON merge patch.
+        """
+        label_selector = LabelSelector(matchLabels={"app.kubernetes.io/name": self.app_name})
+        pod_anti_affinity = None
+        if anti_affinity:
+            term = PodAffinityTerm(topologyKey=TOPOLOGY_KEYS["node"], labelSelector=label_selector)
+            pod_anti_affinity = (
+                PodAntiAffinity(requiredDuringSchedulingIgnoredDuringExecution=[term])
+                if anti_affinity == "required"
+                else PodAntiAffinity(
+                    preferredDuringSchedulingIgnoredDuringExecution=[
+                        WeightedPodAffinityTerm(weight=100, podAffinityTerm=term)
+                    ]
+                )
+            ).to_dict()
+        spread_constraints = [
+            TopologySpreadConstraint(
+                maxSkew=max_skew,
+                topologyKey=TOPOLOGY_KEYS[topology],
+                whenUnsatisfiable=when_unsatisfiable,
+                labelSelector=label_selector,
+            ).to_dict()
+            for topology in spread_topologies
+        ]
+        return {
+            "affinity": {"podAntiAffinity": pod_anti_affinity},
+            "topologySpreadConstraints": spread_constraints or None,
+            "nodeSelector": node_selector,
+            "tolerations": tolerations,
+            "priorityClassName": priority_class_name or None,
+        }
+
+    def apply(self, client: Client, pod_spec: Dict[str, Any]) -> bool:
+        """Patches the pod template if its placement differs, which rolls the pods out.
+
+        Args:
+            client: Kubernetes client.
+            pod_spec: Placement set by the charm, as returned by `pod_spec()`.
+
+        Returns:
+            bool: Whether the pod template was patched.
+        """
+        statefulset = client.get(StatefulSet, self.app_name, namespace=self.namespace)
+        annotations = statefulset.metadata.annotations or {}
+        owned = {
+            "fields": [],
+            "nodeSelector": [],
+            "tolerations": [],
+            **json.loads(annotations.get(OWNED_PLACEMENT_ANNOTATION, "{}")),
+        }
+        current = statefulset.spec.template.spec.to_dict()
+        patch, now_owned = self._fields_patch(current, pod_spec, owned)
+        node_selector_patch, now_owned["nodeSelector"] = self._node_selector_patch(
+            current.get("nodeSelector") or {},
+            pod_spec["nodeSelector"],
+            owned["nodeSelector"],
+        )
+        tolerations_patch, now_owned["tolerations"] = self._tolerations_patch(
+            current.get("tolerations") or [], pod_spec["tolerations"], owned["tolerations"]
+        )
+        patch.update(node_selector_patch)
+        patch.update(tolerations_patch)
+        if not patch and now_owned == owned:
+            return False
+        client.patch(
+            StatefulSet,
+            self.app_name,
+            {
+                "metadata": {"annotations": {OWNED_PLACEMENT_ANNOTATION: json.dumps(now_owned)}},
+                "spec": {"template": {"spec": patch}},
+            },
+            namespace=self.namespace,
+            patch_type=PatchType.MERGE,
+        )
+        logger.info("StatefulSet '%s' placement patched: %s", self.app_name, ", ".join(patch))
+        return bool(patch)
+
+    @staticmethod
+    def _fields_patch(
+        current: Dict[str, Any], desired: Dict[str, Any], owned: Dict[str, Any]
+    ) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """Returns the patch of the fields the charm sets as a whole, and those it sets.
+
+        An unset field is only cleared if the charm set it before.
+        """
+        values: List[Tuple[str, Optional[Any], Optional[Any]]] = [
+            (
+                "affinity",
+                (current.get("affinity") or {}).get("podAntiAffinity"),
+                desired["affinity"]["podAntiAffinity"],
+            )
+        ]
+        values += [(field, current.get(field), desired[field]) for field in OWNED_FIELDS[1:]]
+        patch = {}
+        for field, current_value, desired_value in values:
+            if desired_value is None and field not in owned["fields"]:
+                continue
+            if current_value != desired_value:
+                patch[field] = (
+                    {"podAntiAffinity": desired_value} if field == "affinity" else desired_value
+                )
+        fields = [field for field, _, desired_value in values if desired_value is not None]
+        return patch, {"fields": fields}
+
+    @staticmethod
+    def _node_selector_patch(
+        current: Dict[str, str], desired: Dict[str, str], owned: List[str]
+    ) -> Tuple[Dict[str, Any], List[str]]:
+        """Returns the node selector patch and the labels the charm sets.
+
+        Labels set by others are kept, and labels the charm set before are removed once they
+        are no longer configured.
+        """
+        kept = {key: value for key, value in current.items() if key not in owned}
+        node_selector = {**kept, **desired}
+        now_owned = sorted(key for key, value in desired.items() if kept.get(key) != value)
+        if node_selector == current:
+            return {}, now_owned
+        removed = {key: None for key in current if key not in node_selector}
+        return {"nodeSelector": {**removed, **node_selector}}, now_owned
+
+    @staticmethod
+    def _tolerations_patch(
+        current: List[Dict], desired: List[Dict], owned: List[Dict]
+    ) -> Tuple[Dict[str, Any], List[Dict]]:
+        """Returns the tolerations patch and the tolerations the charm sets.
+
+        Tolerations set by others are kept, and tolerations the charm set before are removed
+        once they are no longer configured.
+        """
+        kept = [toleration for toleration in current if toleration not in owned]
+        now_owned = [toleration for toleration in desired if toleration not in kept]
+        tolerations = kept + now_owned
+        if tolerations == current:
+            return {}, now_owned
+        return {"tolerations": tolerations or None}, now_owned
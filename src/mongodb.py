@@ -0,0 +1,426 @@
+# Copyright 2022 Guillaume Belanger
+# See LICENSE file for licensing details.
+
+"""Helpers for the MongoDB connection used by the UDR workload."""
+
+import logging
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+logger = logging.getLogger(__name__)
+
+RETENTION_PERIOD_PATTERN = re.compile(r"^(\d+)([mhd])$")
+RETENTION_PERIOD_UNITS = {"m": "minutes", "h": "hours", "d": "days"}
+
+# Collections the UDR workload stores subscriber, policy, application and exposure data in.
+UDR_COLLECTIONS = [
+    "subscriptionData.authenticationData.authenticationSubscription",
+    "subscriptionData.authenticationData.authenticationStatus",
+    "subscriptionData.provisionedData.amData",
+    "subscriptionData.provisionedData.smData",
+    "subscriptionData.provisionedData.smfSelectionSubscriptionData",
+    "subscriptionData.contextData.amf3gppAccess",
+    "subscriptionData.contextData.smfRegistrations",
+    "subscriptionData.sdmSubscriptions",
+    "subscriptionData.eeSubscriptions",
+    "policyData.ues.amData",
+    "policyData.ues.smData",
+    "policyData.subsToNotify",
+    "application.data.influenceData",
+    "application.data.influenceData.subsToNotify",
+    "exposureData.subsToNotify",
+]
+
+# Collections whose documents belong to one UE and carry its `ueId`, sharded on a hashed
+# `ueId` key. The others hold few documents not tied to a UE and stay on the primary shard.
+UE_COLLECTIONS = [
+    name for name in UDR_COLLECTIONS if name.startswith(("subscriptionData.", "policyData.ues."))
+]
+SHARD_KEY = {"ueId": "hashed"}
+
+# Field holding the expiry time of the subscriptions of a collection, as set by the NF that
+# subscribed (TS 29.503, TS 29.519). Documents of the other collections carry no timestamp.
+EXPIRY_FIELDS = {
+    "subscriptionData.sdmSubscriptions": "expires",
+    "subscriptionData.eeSubscriptions": "expiry",
+    "policyData.subsToNotify": "expiry",
+    "application.data.influenceData.subsToNotify": "expiry",
+    "exposureData.subsToNotify": "expiry",
+}
+
+# Connection string options trading write/read latency against durability.
+CONSISTENCY_PROFILES: Dict[str, Dict[str, str]] = {
+    "fast": {"w": "1", "journal": "false", "readConcernLevel": "local"},
+    "balanced": {"w": "majority", "journal": "false", "readConcernLevel": "local"},
+    "strict": {"w": "majority", "journal": "true", "readConcernLevel": "majority"},
+}
+
+
+def with_options(uri: str, options: Dict[str, str]) -> str:
+    """Returns a MongoDB connection string with options merged into its query string.
+
+    Options already present in the connection string are overridden.
+
+    Args:
+        uri: MongoDB connection string.
+        options: Connection string options to set.
+
+    Returns:
+        str: The connection string with the options set.
+    """
+    if not options:
+        return uri
+    scheme, netloc, path, query, fragment = urlsplit(uri)
+    merged = dict(parse_qsl(query, keep_blank_values=True))
+    merged.update(options)
+    return urlunsplit((scheme, netloc, path or "/", urlencode(merged, safe=","), fragment))
+
+
+def server_compression_stats(uri: str, timeout_ms: int = 5000) -> Dict[str, Dict]:
+    """Returns the wire-protocol compression statistics of a MongoDB server.
+
+    Args:
+        uri: MongoDB connection string.
+        timeout_ms: Server selection timeout in milliseconds.
+
+    Returns:
+        Dict[str, Dict]: `network.compression` section of `serverStatus`, keyed on compressor.
+    """
+    with connect(uri, timeout_ms) as client:
+        status = client.admin.command("serverStatus")
+    return status.get("network", {}).get("compression", {})
+
+
+def negotiated_compressors(uri: str, compressors: List[str], timeout_ms: int = 5000) -> List[str]:
+    """Returns the compressors MongoDB accepts in the handshake of a client offering them.
+
+    The server answers a `hello` carrying `compression` with the offered compressors it
+    supports, in the client's order, and the client compresses its messages with the first one.
+
+    Args:
+        uri: MongoDB connection string.
+        compressors: Compressors offered by the client, in order of preference.
+        timeout_ms: Server selection timeout in milliseconds.
+
+    Returns:
+        List[str]: Compressors accepted by the server, the first being the one in use.
+    """
+    if not compressors:
+        return []
+    with connect(uri, timeout_ms) as client:
+        reply = client.admin.command("hello", compression=compressors)
+    return list(reply.get("compression", []))
+
+
+def connect(uri: str, timeout_ms: int = 5000):
+    """Returns a pymongo client for a MongoDB connection string.
+
+    Args:
+        uri: MongoDB connection string.
+        timeout_ms: Server selection timeout in milliseconds.
+
+    Returns:
+        MongoClient: MongoDB client, to be closed by the caller.
+    """
+    from pymongo import MongoClient
+
+    return MongoClient(uri, serverSelectionTimeoutMS=timeout_ms)
+
+
+def parse_retention_rules(value: str) -> Dict[str, timedelta]:
+    """Parses comma-separated `collection=period` retention rules.
+
+    Args:
+        value: Rules such as `subscriptionData.sdmSubscriptions=30d,policyData.subsToNotify=12h`.
+
+    Returns:
+        Dict[str, timedelta]: Retention period of every collection.
+
+    Raises:
+        ValueError: If a rule is malformed.
+    """
+    rules = {}
+    for rule in filter(None, value.split(",")):
+        collection, _, period = rule.strip().partition("=")
+        match = RETENTION_PERIOD_PATTERN.match(period)
+        if not collection or not match:
+            raise ValueError(f"Invalid retention rule: {rule}")
+        amount, unit = match.groups()
+        rules[collection] = timedelta(**{RETENTION_PERIOD_UNITS[unit]: int(amount)})
+    return rules
+
+
+def stale_filter(collection_name: str, cutoff: datetime) -> Dict[str, Any]:
+    """Returns the query matching the documents of a collection that went stale before cutoff.
+
+    Subscriptions are stale once they expired: their expiry time is compared with the cutoff,
+    and subscriptions without one never go stale. Documents of collections without an expiry
+    field are aged by the creation time embedded in their ObjectId `_id`.
+
+    Args:
+        collection_name: Name of the collection.
+        cutoff: Time before which documents are stale.
+
+    Returns:
+        Dict[str, Any]: Query filter.
+    """
+    from bson import ObjectId
+
+    field = EXPIRY_FIELDS.get(collection_name)
+    if not field:
+        return {"_id": {"$lt": ObjectId.from_datetime(cutoff)}}
+    # The UDR stores expiry times as RFC 3339 strings, which sort in time order in UTC.
+    utc_cutoff = cutoff.astimezone(timezone.utc)
+    return {
+        "$or": [
+            {field: {"$lt": utc_cutoff}},
+            {field: {"$lt": utc_cutoff.strftime("%Y-%m-%dT%H:%M:%SZ")}},
+        ]
+    }
+
+
+def purge_stale(
+    database,
+    rules: Dict[str, timedelta],
+    batch_size: int,
+    batches_per_second: float,
+    time_budget: Optional[float] = None,
+    dry_run: bool = False,
+) -> Dict[str, Dict[str, Any]]:
+    """Removes documents stale for longer than their collection's retention period.
+
+    UDR documents carry no timestamp field a TTL index could use, so subscriptions go stale
+    when their own expiry time passes and other documents when they were created, as told by
+    `stale_filter()`. Documents are removed in batches, with at most `batches_per_second`
+    batches per second so that the purge does not compete with UDR for the primary.
+
+    Args:
+        database: pymongo Database.
+        rules: Retention period of every collection.
+        batch_size: Maximum number of documents removed per batch.
+        batches_per_second: Maximum number of batches per second.
+        time_budget: Seconds after which the purge stops; the rest is left for the next run.
+        dry_run: Only count the documents that would be removed.
+
+    Returns:
+        Dict[str, Dict[str, Any]]: Per collection, the number of stale documents found or
+            removed and an estimate of the space reclaimed in bytes.
+    """
+    started = time.monotonic()
+    report = {}
+    for collection_name, retention in rules.items():
+        collection = database[collection_name]
+        stale = stale_filter(collection_name, datetime.now(timezone.utc) - retention)
+        average_size = database.command("collStats", collection_name).get("avgObjSize", 0)
+        if dry_run:
+            documents = collection.count_documents(stale)
+        else:
+            documents = 0
+            while time_budget is None or time.monotonic() - started < time_budget:
+                ids = [d["_id"] for d in collection.find(stale, {"_id": 1}).limit(batch_size)]
+                if not ids:
+                    break
+                documents += collection.delete_many({"_id": {"$in": ids}}).deleted_count
+                time.sleep(1 / batches_per_second)
+        report[collection_name] = {
+            "documents": documents,
+            "reclaimed-bytes": int(documents * average_size),
+        }
+        logger.info(
+            "%s %d stale documents from %s",
+            "Found" if dry_run else "Removed",
+            documents,
+            collection_name,
+        )
+    return report
+
+
+def working_set_report(client, database_name: str, collections: List[str]) -> Dict[str, Any]:
+    """Returns the size, index usage and profiler findings of UDR collections.
+
+    Args:
+        client: pymongo MongoClient.
+        database_name: Name of the UDR database.
+        collections: Collections to report on. Collections that do not exist are skipped.
+
+    Returns:
+        Dict[str, Any]: Per-collection statistics, totals compared with the WiredTiger cache
+            size, unused indexes and the collections recently scanned without an index.
+    """
+    database = client[database_name]
+    existing_collections = set(database.list_collection_names())
+    report: Dict[str, Any] = {"collections": {}, "unused-indexes": []}
+    for name in collections:
+        if name not in existing_collections:
+            continue
+        stats = database.command("collStats", name)
+        index_usage = {
+            index["name"]: index["accesses"]["ops"]
+            for index in database[name].aggregate([{"$indexStats": {}}])
+        }
+        report["collections"][name] = {
+            "documents": stats.get("count", 0),
+            "average-document-size": stats.get("avgObjSize", 0),
+            "data-size": stats.get("size", 0),
+            "storage-size": stats.get("storageSize", 0),
+            "index-sizes": stats.get("indexSizes", {}),
+            "index-usage": index_usage,
+        }
+        report["unused-indexes"] += [
+            f"{name}.{index}" for index, ops in index_usage.items() if not ops and index != "_id_"
+        ]
+    report["total-data-size"] = sum(c["data-size"] for c in report["collections"].values())
+    report["total-index-size"] = sum(
+        sum(c["index-sizes"].values()) for c in report["collections"].values()
+    )
+    cache = client.admin.command("serverStatus").get("wiredTiger", {}).get("cache", {})
+    report["cache-size"] = cache.get("maximum bytes configured", 0)
+    report["working-set-fits-in-cache"] = (
+        report["total-data-size"] + report["total-index-size"] <= report["cache-size"]
+    )
+    report["collection-scans"] = _collection_scans(database)
+    return report
+
+
+def _collection_scans(database) -> Dict[str, int]:
+    """Returns the number of profiled operations that scanned each collection.
+
+    Empty when the database profiler is disabled.
+    """
+    scans = database["system.profile"].aggregate(
+        [
+            {"$match": {"planSummary": "COLLSCAN"}},
+            {"$group": {"_id": "$ns", "count": {"$sum": 1}}},
+        ]
+    )
+    return {scan["_id"].split(".", 1)[1]: scan["count"] for scan in scans}
+
+
+def is_sharded_cluster(client) -> bool:
+    """Returns whether a client is connected to a sharded cluster through mongos.
+
+    Args:
+        client: pymongo MongoClient.
+
+    Returns:
+        bool: Whether the server is a mongos router.
+    """
+    return client.admin.command("hello").get("msg") == "isdbgrid"
+
+
+def shard_collections(
+    client, database_name: str, collections: List[str], chunks_per_shard: int
+) -> Dict[str, Any]:
+    """Shards collections on a hashed `ueId` key, skipping those already sharded.
+
+    Empty collections are pre-split into `chunks_per_shard` chunks per shard, so that writes
+    are spread across shards from the first UE on. MongoDB only pre-splits empty collections;
+    the balancer spreads the chunks of collections that already hold documents.
+
+    Args:
+        client: pymongo MongoClient connected to mongos.
+        database_name: Name of the UDR database.
+        collections: Collections to shard.
+        chunks_per_shard: Number of initial chunks per shard for empty collections.
+
+    Returns:
+        Dict[str, Any]: Action taken on every collection (`sharded`, `pre-split` or
+            `already-sharded`), number of shards and balancer state.
+    """
+    shards = client.admin.command("listShards")["shards"]
+    client.admin.command("enableSharding", database_name)
+    database = client[database_name]
+    sharded = {
+        collection["_id"]
+        for collection in client.config["collections"].find(
+            {"_id": {"$regex": f"^{re.escape(database_name)}\\."}, "dropped": {"$ne": True}},
+            {"_id": 1},
+        )
+    }
+    report: Dict[str, Any] = {"collections": {}, "shards": len(shards)}
+    for name in collections:
+        namespace = f"{database_name}.{name}"
+        if namespace in sharded:
+            report["collections"][name] = "already-sharded"
+            continue
+        command: Dict[str, Any] = {"shardCollection": namespace, "key": SHARD_KEY}
+        if database[name].estimated_document_count() == 0:
+            command["numInitialChunks"] = chunks_per_shard * len(shards)
+            report["collections"][name] = "pre-split"
+        else:
+            database[name].create_index(list(SHARD_KEY.items()))
+            report["collections"][name] = "sharded"
+        client.admin.command(command)
+        logger.info("Sharded %s on %s", namespace, SHARD_KEY)
+    balancer = client.admin.command("balancerStatus")
+    report["balancer-mode"] = balancer.get("mode", "unknown")
+    report["balancer-running"] = bool(balancer.get("inBalancerRound", False))
+    return report
+
+
+def warm_up(
+    client,
+    database_name: str,
+    collections: List[str],
+    concurrency: int,
+    time_budget: float,
+    progress: Optional[Callable[[int, int], None]] = None,
+) -> Dict[str, Any]:
+    """Reads the indexes and documents of UDR collections into the MongoDB cache.
+
+    Indexes are read first, most used first as ranked by `$indexStats`, with scans projecting
+    only the index keys so that MongoDB serves them from the index alone. Documents are read
+    once every index was. Reading stops when the time budget runs out.
+
+    Args:
+        client: pymongo MongoClient.
+        database_name: Name of the UDR database.
+        collections: Collections to warm up. Collections that do not exist are skipped.
+        concurrency: Maximum number of scans run at the same time.
+        time_budget: Seconds after which scans stop.
+        progress: Called with the number of scans completed and the total after each scan.
+
+    Returns:
+        Dict[str, Any]: Number of indexes and collections read, of entries read, and whether
+            everything was read within the time budget.
+    """
+    deadline = time.monotonic() + time_budget
+    database = client[database_name]
+    existing_collections = set(database.list_collection_names())
+    names = [name for name in collections if name in existing_collections]
+    indexes: List[Tuple[int, str, str, Dict]] = [
+        (index["accesses"]["ops"], name, index["name"], dict(index["key"]))
+        for name in names
+        for index in database[name].aggregate([{"$indexStats": {}}])
+    ]
+    indexes.sort(key=lambda index: index[0], reverse=True)
+    scans = [
+        (name, {"filter": {}, "projection": {"_id": 0, **{key: 1 for key in keys}}, "hint": index})
+        for _, name, index, keys in indexes
+    ]
+    scans += [(name, {"filter": {}}) for name in names]
+
+    def scan(name: str, query: Dict[str, Any]) -> Tuple[int, bool]:
+        if time.monotonic() >= deadline:
+            return 0, False
+        entries = 0
+        for _ in database[name].find(batch_size=1000, **query):
+            entries += 1
+            if time.monotonic() >= deadline:
+                return entries, False
+        return entries, True
+
+    report = {"indexes": len(indexes), "collections": len(names), "entries": 0, "complete": True}
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [executor.submit(scan, name, query) for name, query in scans]
+        for completed, future in enumerate(as_completed(futures), start=1):
+            entries, complete = future.result()
+            report["entries"] += entries
+            report["complete"] = report["complete"] and complete
+            if progress:
+                progress(completed, len(futures))
+    return report
@@ -0,0 +1,62 @@
+# Copyright 2022 Guillaume Belanger
+# See LICENSE file for licensing details.
+
+"""Parses the pod placement configuration options.
+
+Kept apart from `kubernetes_placement`, so that validating the configuration does not load
+lightkube.
+"""
+
+from typing import Dict, List
+
+TOPOLOGY_KEYS = {"zone": "topology.kubernetes.io/zone", "node": "kubernetes.io/hostname"}
+TAINT_EFFECTS = ["NoSchedule", "PreferNoSchedule", "NoExecute"]
+
+
+def parse_node_selector(value: str) -> Dict[str, str]:
+    """Parses comma-separated `key=value` node labels.
+
+    Args:
+        value: Node labels such as `node-pool=core,kubernetes.io/arch=amd64`.
+
+    Returns:
+        Dict[str, str]: Node selector.
+
+    Raises:
+        ValueError: If a label is malformed.
+    """
+    node_selector = {}
+    for label in filter(None, value.split(",")):
+        key, separator, label_value = label.strip().partition("=")
+        if not key or not separator:
+            raise ValueError(f"Invalid node label: {label}")
+        node_selector[key] = label_value
+    return node_selector
+
+
+def parse_tolerations(value: str) -> List[Dict[str, str]]:
+    """Parses comma-separated `key[=value]:effect` tolerations.
+
+    A toleration without a value tolerates every value of the taint key.
+
+    Args:
+        value: Tolerations such as `dedicated=core-network:NoSchedule,core-network:NoExecute`.
+
+    Returns:
+        List[Dict[str, str]]: Tolerations, as in a pod spec.
+
+    Raises:
+        ValueError: If a toleration is malformed.
+    """
+    tolerations = []
+    for toleration in filter(None, value.split(",")):
+        taint, _, effect = toleration.strip().rpartition(":")
+        key, separator, taint_value = taint.partition("=")
+        if not key or effect not in TAINT_EFFECTS:
+            raise ValueError(f"Invalid toleration: {toleration}")
+        tolerations.append(
+            {"effect": effect, "key": key, "operator": "Equal", "value": taint_value}
+            if separator
+            else {"effect": effect, "key": key, "operator": "Exists"}
+        )
+    return tolerations
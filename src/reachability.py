@@ -0,0 +1,92 @@
+# Copyright 2022 Guillaume Belanger
+# See LICENSE file for licensing details.
+
+"""Concurrent TCP reachability probes for the endpoints the UDR workload depends on."""
+
+import logging
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+MONGODB_DEFAULT_PORT = 27017
+
+Endpoint = Tuple[str, int]
+
+
+def mongodb_endpoints(uri: str) -> List[Endpoint]:
+    """Returns the hosts listed in a MongoDB connection string.
+
+    `mongodb+srv://` strings name a DNS SRV record rather than a host, so they yield nothing.
+
+    Args:
+        uri: MongoDB connection string.
+
+    Returns:
+        List[Endpoint]: (host, port) of every host in the connection string.
+    """
+    scheme, _, rest = uri.partition("://")
+    if scheme != "mongodb":
+        return []
+    hosts = rest.split("/", 1)[0].rsplit("@", 1)[-1]
+    endpoints = []
+    for host in hosts.split(","):
+        if host.startswith("["):
+            name, _, port = host[1:].partition("]")
+            port = port.lstrip(":")
+        else:
+            name, _, port = host.partition(":")
+        endpoints.append((name, int(port) if port else MONGODB_DEFAULT_PORT))
+    return endpoints
+
+
+def http_endpoint(url: str) -> Endpoint:
+    """Returns the host and port an HTTP(S) URL points to.
+
+    Args:
+        url: HTTP(S) URL.
+
+    Returns:
+        Endpoint: (host, port) of the URL.
+    """
+    parsed = urlparse(url)
+    default_port = 443 if parsed.scheme == "https" else 80
+    return parsed.hostname or "", parsed.port or default_port
+
+
+def _round_trip_time(endpoint: Endpoint, timeout: float) -> float:
+    started = time.monotonic()
+    with socket.create_connection(endpoint, timeout=timeout):
+        return (time.monotonic() - started) * 1000
+
+
+def probe(endpoints: List[Endpoint], timeout: float) -> Dict[Endpoint, Optional[float]]:
+    """Opens a TCP connection to every endpoint concurrently.
+
+    Args:
+        endpoints: Endpoints to probe.
+        timeout: Overall time budget in seconds, shared by all probes.
+
+    Returns:
+        Dict[Endpoint, Optional[float]]: Connection round-trip time in milliseconds of every
+            endpoint, or None for endpoints that could not be reached within the budget.
+    """
+    if not endpoints:
+        return {}
+    executor = ThreadPoolExecutor(max_workers=len(endpoints))
+    futures = {
+        endpoint: executor.submit(_round_trip_time, endpoint, timeout) for endpoint in endpoints
+    }
+    wait(futures.values(), timeout=timeout)
+    executor.shutdown(wait=False)
+    round_trip_times: Dict[Endpoint, Optional[float]] = {}
+    for endpoint, future in futures.items():
+        if not future.done() or future.exception():
+            logger.info("Endpoint %s:%d is not reachable", *endpoint)
+            round_trip_times[endpoint] = None
+            continue
+        round_trip_times[endpoint] = future.result()
+    return round_trip_times
@@ -0,0 +1,147 @@
+# Copyright 2022 Guillaume Belanger
+# See LICENSE file for licensing details.
+
+"""Leader-granted restart lock shared over a peer relation.
+
+Units needing a workload restart call `request()`. The leader grants the lock to at most
+`max-concurrent-restarts` units at a time and each granted unit receives a `restart_granted`
+event. A unit holds the lock until it calls `release()`, which it should only do once its
+workload is healthy again.
+
+Peer relation data:
+    unit databag: `state` is `requested` while waiting for the lock and `restarting` while
+        holding it.
+    app databag: `granted` is a JSON list of the unit names currently holding the lock.
+"""
+
+import json
+import logging
+from typing import List, Optional
+
+from ops.charm import CharmBase
+from ops.framework import EventBase, EventSource, Object, ObjectEvents
+from ops.model import Relation
+
+logger = logging.getLogger(__name__)
+
+REQUESTED = "requested"
+RESTARTING = "restarting"
+
+
+class RestartGrantedEvent(EventBase):
+    """Event emitted on the unit that was granted the restart lock."""
+
+
+class RollingRestartEvents(ObjectEvents):
+    """All custom events for the RollingRestart object."""
+
+    restart_granted = EventSource(RestartGrantedEvent)
+
+
+class RollingRestart(Object):
+    """Serializes workload restarts across the units of an application."""
+
+    on = RollingRestartEvents()
+
+    def __init__(self, charm: CharmBase, relation_name: str, max_concurrent_config: str):
+        """Constructor for RollingRestart.
+
+        Args:
+            charm: the charm that is instantiating the object.
+            relation_name: name of the peer relation used to exchange the lock.
+            max_concurrent_config: name of the config option holding how many units may
+                restart at the same time.
+        """
+        super().__init__(charm, relation_name)
+        self.charm = charm
+        self.relation_name = relation_name
+        self.max_concurrent_config = max_concurrent_config
+        self.framework.observe(charm.on[relation_name].relation_changed, self._on_lock_changed)
+        self.framework.observe(charm.on[relation_name].relation_departed, self._on_lock_changed)
+        self.framework.observe(charm.on.leader_elected, self._on_lock_changed)
+
+    @property
+    def _relation(self) -> Optional[Relation]:
+        return self.model.get_relation(self.relation_name)
+
+    @property
+    def is_requested(self) -> bool:
+        """Returns whether this unit is waiting for or holding the restart lock.
+
+        Returns:
+            bool: Whether a restart was requested and not released yet.
+        """
+        if not self._relation:
+            return False
+        return bool(self._relation.data[self.model.unit].get("state"))
+
+    @property
+    def is_restarting(self) -> bool:
+        """Returns whether this unit holds the restart lock.
+
+        A unit only holds the lock once `restart_granted` was emitted on it, so a unit that is
+        still waiting for the lock has not restarted its workload yet.
+
+        Returns:
+            bool: Whether the lock was granted and not released yet.
+        """
+        if not self._relation:
+            return False
+        return self._relation.data[self.model.unit].get("state") == RESTARTING
+
+    def request(self) -> None:
+        """Requests the restart lock for this unit.
+
+        Without a peer relation there is nothing to coordinate with, so the lock is granted
+        straight away.
+        """
+        if not self._relation:
+            self.on.restart_granted.emit()
+            return
+        if self.is_requested:
+            return
+        self._relation.data[self.model.unit]["state"] = REQUESTED
+        logger.info("Requested restart lock")
+        self._on_lock_changed(None)
+
+    def release(self) -> None:
+        """Gives the restart lock back so that the leader can grant it to the next unit."""
+        if not self._relation:
+            return
+        self._relation.data[self.model.unit].pop("state", None)
+        logger.info("Released restart lock")
+        self._on_lock_changed(None)
+
+    def _on_lock_changed(self, _) -> None:
+        """Grants the lock if leader and emits `restart_granted` if this unit was granted it."""
+        if not self._relation:
+            return
+        if self.model.unit.is_leader():
+            self._grant(self._relation)
+        if self._relation.data[self.model.unit].get("state") != REQUESTED:
+            return
+        if self.model.unit.name in self._granted_units(self._relation):
+            self._relation.data[self.model.unit]["state"] = RESTARTING
+            logger.info("Restart lock granted")
+            self.on.restart_granted.emit()
+
+    def _grant(self, relation: Relation) -> None:
+        """Revokes released locks and grants free ones to units waiting for them.
+
+        Args:
+            relation: The peer relation.
+        """
+        units = {self.model.unit, *relation.units}
+        states = {unit.name: relation.data[unit].get("state") for unit in units}
+        granted = [name for name in self._granted_units(relation) if states.get(name)]
+        waiting = sorted(
+            name for name, state in states.items() if state == REQUESTED and name not in granted
+        )
+        free_slots = max(self.charm.model.config[self.max_concurrent_config] - len(granted), 0)
+        granted += waiting[:free_slots]
+        if granted != self._granted_units(relation):
+            relation.data[self.model.app]["granted"] = json.dumps(granted)
+
+    @staticmethod
+    def _granted_units(relation: Relation) -> List[str]:
+        return json.loads(relation.data[relation.app].get("granted", "[]"))
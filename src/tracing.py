@@ -0,0 +1,281 @@
+# Copyright 2022 Guillaume Belanger
+# See LICENSE file for licensing details.
+
+"""OTLP tracing of charm dispatches over a `tracing` relation.
+
+Every dispatch gets a root span named after its hook or action. Code paths worth timing open
+child spans with `Tracer.span()` or the `traced()` decorator, and objects such as the Pebble
+client can have their methods wrapped with `Tracer.instrument()`. Spans are buffered in
+memory and exported in a single OTLP/HTTP JSON request when the framework commits, at the
+end of the dispatch.
+
+When no collector is related, `span()` returns a shared no-op context manager, so tracing
+costs one attribute check per span and imports nothing beyond the standard library.
+
+Relation data (`tracing` interface):
+    requirer app databag: `receivers` is the JSON list of requested protocols, `["otlp_http"]`.
+    provider app databag: `receivers` is a JSON list of `{"protocol": {"name": ...}, "url": ...}`.
+"""
+
+import contextlib
+import functools
+import json
+import logging
+import os
+import secrets
+import time
+import urllib.request
+from typing import Callable, Dict, List, Optional, Tuple
+
+from ops.charm import CharmBase
+from ops.framework import EventBase, Object, StoredState
+
+logger = logging.getLogger(__name__)
+
+OTLP_HTTP_PROTOCOL = "otlp_http"
+OTLP_TRACES_PATH = "/v1/traces"
+EXPORT_TIMEOUT = 2
+SPAN_KIND_INTERNAL = 1
+STATUS_CODE_ERROR = 2
+_NO_OP_SPAN = contextlib.nullcontext()
+
+
+class Span:
+    """A timed operation of a trace."""
+
+    def __init__(self, name: str, trace_id: str, parent_id: str, attributes: Dict[str, str]):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.start = time.time_ns()
+        self.end = 0
+        self.error: Optional[str] = None
+
+    def to_otlp(self) -> Dict:
+        """Returns the span in the OTLP JSON encoding.
+
+        Returns:
+            Dict: OTLP span.
+        """
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": SPAN_KIND_INTERNAL,
+            "startTimeUnixNano": str(self.start),
+            "endTimeUnixNano": str(self.end),
+            "attributes": _otlp_attributes(self.attributes),
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        if self.error:
+            span["status"] = {"code": STATUS_CODE_ERROR, "message": self.error}
+        return span
+
+
+def _otlp_attributes(attributes: Dict[str, str]) -> List[Dict]:
+    return [
+        {"key": key, "value": {"stringValue": str(value)}} for key, value in attributes.items()
+    ]
+
+
+def traced(name: str) -> Callable:
+    """Decorates a charm method so that each call is recorded as a span.
+
+    The charm must hold its `Tracer` in a `_tracer` attribute.
+
+    Args:
+        name: Span name.
+
+    Returns:
+        Callable: Decorator.
+    """
+
+    def decorator(method: Callable) -> Callable:
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self._tracer.span(name):
+                return method(self, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+class Tracer(Object):
+    """Records the spans of a dispatch and exports them to the related OTLP collector."""
+
+    _stored = StoredState()
+
+    def __init__(self, charm: CharmBase, relation_name: str):
+        """Constructor for Tracer.
+
+        Args:
+            charm: the charm that is instantiating the object.
+            relation_name: name of the `tracing` relation.
+        """
+        super().__init__(charm, relation_name)
+        self.charm = charm
+        self.relation_name = relation_name
+        self._stored.set_default(endpoint="")
+        self._endpoint = self._stored.endpoint
+        self._spans: List[Span] = []
+        self._stack: List[Span] = []
+        self._instrumented: List[Tuple[object, List[str], str]] = []
+        self.framework.observe(charm.on[relation_name].relation_joined, self._request_receiver)
+        self.framework.observe(charm.on.leader_elected, self._request_receiver)
+        self.framework.observe(charm.on[relation_name].relation_changed, self._on_changed)
+        self.framework.observe(charm.on[relation_name].relation_broken, self._on_broken)
+        self.framework.observe(self.framework.on.commit, self._export)
+        if self._endpoint:
+            self._start_root()
+
+    @property
+    def enabled(self) -> bool:
+        """Returns whether spans are recorded.
+
+        Returns:
+            bool: Whether an OTLP collector is related.
+        """
+        return bool(self._endpoint)
+
+    def span(self, name: str, **attributes: str):
+        """Returns a context manager recording a span, nested in the innermost open span.
+
+        Args:
+            name: Span name.
+            attributes: Span attributes.
+
+        Returns:
+            ContextManager: Span context manager, a no-op one when tracing is disabled.
+        """
+        if not self._endpoint:
+            return _NO_OP_SPAN
+        return self._record(name, attributes)
+
+    def instrument(self, target: object, methods: List[str], prefix: str) -> None:
+        """Wraps methods of an object so that each call is recorded as a span.
+
+        Methods are only wrapped once tracing is enabled, so that disabled tracing leaves the
+        object untouched.
+
+        Args:
+            target: Object whose methods are wrapped, e.g. a Pebble container.
+            methods: Names of the methods to wrap.
+            prefix: Span name prefix, the span of `push` being named `<prefix>.push`.
+        """
+        self._instrumented.append((target, methods, prefix))
+        if self._endpoint:
+            self._wrap_methods(target, methods, prefix)
+
+    def _wrap_methods(self, target: object, methods: List[str], prefix: str) -> None:
+        for method_name in methods:
+            method = getattr(target, method_name)
+            setattr(target, method_name, self._wrap(method, f"{prefix}.{method_name}"))
+
+    def _wrap(self, method: Callable, name: str) -> Callable:
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            with self.span(name):
+                return method(*args, **kwargs)
+
+        return wrapper
+
+    @contextlib.contextmanager
+    def _record(self, name: str, attributes: Dict[str, str]):
+        if not self._stack:
+            self._start_root()
+        span = Span(name, self._stack[0].trace_id, self._stack[-1].span_id, attributes)
+        self._stack.append(span)
+        try:
+            yield span
+        except Exception as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            span.end = time.time_ns()
+            self._stack.remove(span)
+            self._spans.append(span)
+
+    def _start_root(self) -> None:
+        """Opens the root span of the dispatch, named after its hook or action."""
+        dispatch_path = os.environ.get("JUJU_DISPATCH_PATH", "dispatch")
+        root = Span(
+            os.path.basename(dispatch_path),
+            trace_id=secrets.token_hex(16),
+            parent_id="",
+            attributes={"juju.dispatch-path": dispatch_path, "juju.unit": self.model.unit.name},
+        )
+        self._stack = [root]
+
+    def _request_receiver(self, event: EventBase) -> None:
+        """Requests an OTLP/HTTP receiver from the collector. Requires leadership."""
+        if not self.model.unit.is_leader():
+            return
+        for relation in self.model.relations[self.relation_name]:
+            relation.data[self.model.app]["receivers"] = json.dumps([OTLP_HTTP_PROTOCOL])
+
+    def _on_changed(self, event: EventBase) -> None:
+        """Records the OTLP/HTTP endpoint published by the collector."""
+        endpoint = self._collector_endpoint()
+        self._stored.endpoint = endpoint
+        if endpoint and not self._endpoint:
+            self._start_root()
+            for target, methods, prefix in self._instrumented:
+                self._wrap_methods(target, methods, prefix)
+        self._endpoint = endpoint
+
+    def _on_broken(self, event: EventBase) -> None:
+        """Disables tracing once the collector is removed."""
+        self._stored.endpoint = self._endpoint = ""
+        self._stack, self._spans = [], []
+
+    def _collector_endpoint(self) -> str:
+        relation = self.model.get_relation(self.relation_name)
+        if not relation or not relation.app:
+            return ""
+        receivers = json.loads(relation.data[relation.app].get("receivers", "[]"))
+        for receiver in receivers:
+            if receiver.get("protocol", {}).get("name") == OTLP_HTTP_PROTOCOL:
+                return receiver["url"].rstrip("/") + OTLP_TRACES_PATH
+        return ""
+
+    def _export(self, event: EventBase) -> None:
+        """Closes the root span and exports the spans of the dispatch in one request."""
+        if not self._endpoint or not self._stack:
+            return
+        root = self._stack[0]
+        root.end = time.time_ns()
+        spans, self._spans, self._stack = self._spans + [root], [], []
+        body = {
+            "resourceSpans": [
+                {
+                    "resource": {
+                        "attributes": _otlp_attributes(
+                            {
+                                "service.name": self.model.app.name,
+                                "juju.model": self.model.name,
+                            }
+                        )
+                    },
+                    "scopeSpans": [
+                        {
+                            "scope": {"name": self.charm.meta.name},
+                            "spans": [s.to_otlp() for s in spans],
+                        }
+                    ],
+                }
+            ]
+        }
+        request = urllib.request.Request(
+            self._endpoint,
+            data=json.dumps(body).encode(),
+            headers={"Content-Type": "application/json"},
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=EXPORT_TIMEOUT):
+                pass
+        except OSError as e:
+            logger.warning("Failed to export %d spans to %s: %s", len(spans), self._endpoint, e)
@@ -0,0 +1,113 @@
+# Copyright 2022 Guillaume Belanger
+# See LICENSE file for licensing details.
+
+"""Measures charm startup cost per hook.
+
+Every hook is dispatched in a fresh interpreter, like Juju does, and the script reports:
+    import: time to import the charm module and its dependencies.
+    init: time to construct the charm.
+    handler: time spent emitting the hook event.
+    total: wall time from process spawn to the end of the handler.
+    peak RSS: maximum resident set size of the process.
+
+`ops.testing` is imported before the timers start, so its cost is the same for every hook.
+
+Usage:
+    python tests/benchmark/dispatch.py [--runs N] [hook ...]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+HOOKS = [
+    "install",
+    "leader-elected",
+    "config-changed",
+    "start",
+    "update-status",
+    "udr-pebble-ready",
+    "nrf-relation-created",
+]
+
+
+def _child(hook: str) -> None:
+    import resource
+
+    from ops import testing
+
+    started = time.perf_counter()
+    import charm
+
+    imported = time.perf_counter()
+    harness = testing.Harness(charm.UDROperatorCharm)
+    harness.set_model_name("benchmark")
+    if hook == "nrf-relation-created":
+        harness.add_relation("nrf", "nrf-operator")
+    harness.begin()
+    initialized = time.perf_counter()
+    event = getattr(harness.charm.on, hook.replace("-", "_"))
+    if hook == "udr-pebble-ready":
+        harness.set_can_connect("udr", True)
+        event.emit(harness.model.unit.get_container("udr"))
+    elif hook == "nrf-relation-created":
+        event.emit(harness.model.get_relation("nrf"), app=harness.model.app)
+    else:
+        event.emit()
+    handled = time.perf_counter()
+    print(
+        json.dumps(
+            {
+                "import": imported - started,
+                "init": initialized - imported,
+                "handler": handled - initialized,
+                "end": time.time(),
+                "peak_rss_kib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+            }
+        )
+    )
+
+
+def _dispatch(hook: str) -> dict:
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(str(ROOT / p) for p in ("src", "lib")))
+    spawned = time.time()
+    output = subprocess.check_output(
+        [sys.executable, __file__, "--child", hook], env=env, stderr=subprocess.DEVNULL
+    )
+    result = json.loads(output.decode().strip().splitlines()[-1])
+    result["total"] = result.pop("end") - spawned
+    return result
+
+
+def main() -> None:
+    """Dispatches every hook in a fresh interpreter and prints the median measurements."""
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--child")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("hooks", nargs="*", default=HOOKS)
+    args = parser.parse_args()
+    if args.child:
+        _child(args.child)
+        return
+    print(f"{'hook':<22}{'import':>10}{'init':>10}{'handler':>10}{'total':>10}{'peak RSS':>12}")
+    for hook in args.hooks:
+        runs = [_dispatch(hook) for _ in range(args.runs)]
+        median = {
+            key: sorted(run[key] for run in runs)[len(runs) // 2]
+            for key in ("import", "init", "handler", "total", "peak_rss_kib")
+        }
+        print(
+            f"{hook:<22}"
+            + "".join(f"{median[key] * 1000:>8.1f}ms" for key in ("import", "init", "handler"))
+            + f"{median['total'] * 1000:>8.1f}ms"
+            + f"{median['peak_rss_kib'] / 1024:>9.1f}MiB"
+        )
+
+
+if __name__ == "__main__":
+    main()
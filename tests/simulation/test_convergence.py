@@ -0,0 +1,392 @@
+# Copyright 2022 Guillaume Belanger
+# See LICENSE file for licensing details.
+
+"""Replays event sequences against the charm and counts the work done until it converges.
+
+Every sequence is replayed on a fresh `Harness`. Events the charm deferred are re-emitted
+before each step, like Juju does at the start of every dispatch. For each sequence the
+simulator counts:
+    pushes: writes of the UDR configuration file.
+    replans: Pebble replans.
+    restarts: restarts of the running udr service.
+
+It compares them with an ideal charm that writes the configuration file once per distinct
+configuration it could have written, starts the workload once and restarts it once per
+configuration change after the start. A sequence fails when the charm does more work than
+the ideal charm, or when it does not end in `ActiveStatus` serving the latest NRF and
+database URLs.
+
+Usage:
+    python tests/simulation/test_convergence.py [--seeds N] [--length N]
+"""
+
+import argparse
+import random
+import sys
+import unittest
+from contextlib import ExitStack
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+from unittest.mock import patch
+
+import yaml
+from lightkube.models.apps_v1 import StatefulSetSpec
+from lightkube.models.core_v1 import PodSpec, PodTemplateSpec
+from lightkube.models.meta_v1 import LabelSelector, ObjectMeta
+from lightkube.resources.apps_v1 import StatefulSet
+from ops import testing
+from ops.model import ActiveStatus
+
+from charm import UDROperatorCharm
+
+CONFIG_FILE_PATH = "/etc/udr/udrcfg.conf"
+SERVICE_NAME = "udr"
+STATEFULSET = StatefulSet(
+    metadata=ObjectMeta(name="udr-operator"),
+    spec=StatefulSetSpec(
+        selector=LabelSelector(),
+        serviceName="udr-operator-endpoints",
+        template=PodTemplateSpec(spec=PodSpec(containers=[])),
+    ),
+)
+BASE_EVENTS = ["database-created", "nrf-available", "pebble-ready"]
+EXTRA_EVENTS = [
+    "duplicate-nrf-relation-changed",
+    "duplicate-database-relation-changed",
+    "config-changed",
+    "update-status",
+    "container-unreachable",
+    "container-reachable",
+    "nrf-url-changed",
+    "database-url-changed",
+]
+SCENARIOS: Dict[str, List[str]] = {
+    "fresh-deploy": ["pebble-ready", "database-created", "nrf-available"],
+    "relations-before-pebble-ready": ["database-created", "nrf-available", "pebble-ready"],
+    "duplicate-relation-changed-storm": BASE_EVENTS
+    + ["duplicate-nrf-relation-changed"] * 3
+    + ["duplicate-database-relation-changed"] * 3
+    + ["config-changed", "update-status"],
+    "nrf-url-changed-after-active": BASE_EVENTS + ["nrf-url-changed", "update-status"],
+    "database-url-changed-after-active": BASE_EVENTS + ["database-url-changed"],
+    "urls-changed-while-unreachable": BASE_EVENTS
+    + ["container-unreachable", "nrf-url-changed", "database-url-changed", "update-status"]
+    + ["container-reachable"],
+    "unreachable-during-deploy": [
+        "database-created",
+        "container-unreachable",
+        "nrf-available",
+        "config-changed",
+        "container-reachable",
+        "pebble-ready",
+    ],
+}
+
+
+@dataclass
+class Counts:
+    """Work done by a charm while replaying a sequence."""
+
+    pushes: int = 0
+    replans: int = 0
+    restarts: int = 0
+
+
+@dataclass
+class Result:
+    """Outcome of a replayed sequence."""
+
+    name: str
+    events: List[str]
+    actual: Counts
+    minimum: Counts
+    errors: List[str] = field(default_factory=list)
+
+
+class Simulation:
+    """Replays one event sequence against a fresh Harness."""
+
+    def __init__(self):
+        self.harness = testing.Harness(UDROperatorCharm)
+        self.harness.set_model_name("simulation")
+        self.harness.update_config(
+            {
+                "preflight-probe-timeout": 0.0,
+                "restart-health-timeout": 0,
+                "warm-up-time-budget": 0,
+            }
+        )
+        self.harness.set_leader(True)
+        self.harness.begin()
+        self.harness.add_storage("udr-volume", attach=True)
+        self.harness.set_can_connect(SERVICE_NAME, False)
+        self.container = self.harness.charm.unit.get_container(SERVICE_NAME)
+        self.actual = Counts()
+        self.minimum = Counts()
+        self.reachable = False
+        self.urls: Dict[str, Optional[str]] = {"database": None, "nrf": None}
+        self.relation_ids: Dict[str, int] = {}
+        self._url_versions = {"database": 0, "nrf": 0}
+        self._ideal_urls: Optional[Tuple] = None
+        self._started_service: Optional[Dict] = None
+        self._count_container_calls()
+
+    def _count_container_calls(self) -> None:
+        """Wraps the charm's container so that pushes, replans and restarts are counted."""
+        charm_container = self.harness.charm._container
+        push, replan, restart = (
+            charm_container.push,
+            charm_container.replan,
+            charm_container.restart,
+        )
+
+        def counted_push(path, *args, **kwargs):
+            if str(path) == CONFIG_FILE_PATH:
+                self.actual.pushes += 1
+            return push(path, *args, **kwargs)
+
+        def counted_replan():
+            service = self.container.get_plan().services.get(SERVICE_NAME)
+            definition = service.to_dict() if service else None
+            if self._service_is_running() and definition != self._started_service:
+                self.actual.restarts += 1
+            self.actual.replans += 1
+            replan()
+            self._started_service = definition
+
+        def counted_restart(*service_names):
+            self.actual.restarts += 1
+            restart(*service_names)
+            self._started_service = self.container.get_plan().services[SERVICE_NAME].to_dict()
+
+        charm_container.push = counted_push
+        charm_container.replan = counted_replan
+        charm_container.restart = counted_restart
+
+    def _service_is_running(self) -> bool:
+        service = self.container.get_services(SERVICE_NAME).get(SERVICE_NAME)
+        return bool(service and service.is_running())
+
+    def _next_url(self, name: str) -> str:
+        self._url_versions[name] += 1
+        version = self._url_versions[name]
+        if name == "database":
+            return f"mongodb://mongodb-{version}.simulation.svc.cluster.local:27017"
+        return f"http://nrf-{version}.simulation.svc.cluster.local:29510"
+
+    def _publish_database_url(self) -> None:
+        url = self._next_url("database")
+        self.urls["database"] = url
+        self.harness.update_relation_data(
+            self.relation_ids["database"],
+            "mongodb-k8s",
+            {
+                "username": "udr",
+                "password": "password",
+                "endpoints": url.split("//", 1)[1],
+                "uris": url,
+            },
+        )
+
+    def _publish_nrf_url(self) -> None:
+        url = self._next_url("nrf")
+        self.urls["nrf"] = url
+        self.harness.update_relation_data(self.relation_ids["nrf"], "nrf-operator", {"url": url})
+
+    def _add_relation(self, name: str, remote_app: str) -> None:
+        self.relation_ids[name] = self.harness.add_relation(name, remote_app)
+        self.harness.add_relation_unit(self.relation_ids[name], f"{remote_app}/0")
+
+    def _duplicate_relation_changed(self, name: str) -> None:
+        relation = self.harness.model.get_relation(name, self.relation_ids[name])
+        self.harness.charm.on[name].relation_changed.emit(
+            relation, app=relation.app, unit=next(iter(relation.units))
+        )
+
+    def database_created(self) -> None:
+        """The database relation is joined and the database publishes its credentials."""
+        self._add_relation("database", "mongodb-k8s")
+        self._publish_database_url()
+
+    def nrf_available(self) -> None:
+        """The NRF relation is joined and the NRF publishes its URL."""
+        self._add_relation("nrf", "nrf-operator")
+        self._publish_nrf_url()
+
+    def pebble_ready(self) -> None:
+        """The workload container starts."""
+        self.reachable = True
+        self.harness.container_pebble_ready(SERVICE_NAME)
+
+    def container_unreachable(self) -> None:
+        """Pebble stops answering, e.g. while the node is under pressure."""
+        self.reachable = False
+        self.harness.set_can_connect(SERVICE_NAME, False)
+
+    def container_reachable(self) -> None:
+        """Pebble answers again. No event is emitted, deferred ones are re-emitted later."""
+        self.reachable = True
+        self.harness.set_can_connect(SERVICE_NAME, True)
+
+    def database_url_changed(self) -> None:
+        """The database moves to another endpoint."""
+        if "database" in self.relation_ids:
+            self._publish_database_url()
+
+    def nrf_url_changed(self) -> None:
+        """The NRF publishes another URL."""
+        if "nrf" in self.relation_ids:
+            self._publish_nrf_url()
+
+    def duplicate_database_relation_changed(self) -> None:
+        """Juju re-emits relation-changed on the database relation without data changes."""
+        if "database" in self.relation_ids:
+            self._duplicate_relation_changed("database")
+
+    def duplicate_nrf_relation_changed(self) -> None:
+        """Juju re-emits relation-changed on the NRF relation without data changes."""
+        if "nrf" in self.relation_ids:
+            self._duplicate_relation_changed("nrf")
+
+    def config_changed(self) -> None:
+        """Juju emits config-changed, e.g. after an agent restart."""
+        self.harness.charm.on.config_changed.emit()
+
+    def update_status(self) -> None:
+        """Juju emits update-status."""
+        self.harness.charm.on.update_status.emit()
+
+    def _step(self, event: str) -> None:
+        self.harness.framework.reemit()
+        step: Callable[[], None] = getattr(self, event.replace("-", "_"))
+        step()
+        self._update_minimum()
+
+    def _update_minimum(self) -> None:
+        """Does what the ideal charm would have done after the last event."""
+        urls = (self.urls["database"], self.urls["nrf"])
+        if not self.reachable or None in urls or urls == self._ideal_urls:
+            return
+        self.minimum.pushes += 1
+        if self._ideal_urls is None:
+            self.minimum.replans += 1
+        else:
+            self.minimum.restarts += 1
+        self._ideal_urls = urls
+
+    def run(self, name: str, events: List[str]) -> Result:
+        """Replays events, then lets the charm settle.
+
+        Args:
+            name: Sequence name.
+            events: Event names, as in `BASE_EVENTS` and `EXTRA_EVENTS`.
+
+        Returns:
+            Result: Counts and convergence errors.
+        """
+        events = list(events)
+        if "container-unreachable" in events:
+            events.append("container-reachable")
+        with ExitStack() as stack:
+            stack.enter_context(patch("charm.check_output", return_value=b"10.1.1.1"))
+            client = stack.enter_context(patch("lightkube.Client")).return_value
+            client.get.return_value = STATEFULSET
+            stack.enter_context(
+                patch(
+                    "charms.observability_libs.v1.kubernetes_service_patch.KubernetesServicePatch"
+                )
+            )
+            for event in events:
+                self._step(event)
+            self._step("update-status")
+        result = Result(name, events, self.actual, self.minimum)
+        result.errors = self._convergence_errors()
+        for counter in ("pushes", "replans", "restarts"):
+            actual, minimum = getattr(self.actual, counter), getattr(self.minimum, counter)
+            if actual > minimum:
+                result.errors.append(f"{actual} {counter} where {minimum} are necessary")
+        self.harness.cleanup()
+        return result
+
+    def _convergence_errors(self) -> List[str]:
+        errors = []
+        status = self.harness.charm.unit.status
+        if not isinstance(status, ActiveStatus):
+            errors.append(f"ended in {status.name} status: {status.message}")
+        if not self._service_is_running():
+            errors.append("udr service is not running")
+        if not self.container.exists(CONFIG_FILE_PATH):
+            return errors + ["config file is not written"]
+        configuration = yaml.safe_load(self.container.pull(CONFIG_FILE_PATH).read())
+        if configuration["configuration"]["nrfUri"] != self.urls["nrf"]:
+            errors.append("config file holds an outdated NRF URL")
+        if configuration["configuration"]["mongodb"]["url"] != self.urls["database"]:
+            errors.append("config file holds an outdated database URL")
+        return errors
+
+
+def random_sequence(seed: int, length: int) -> List[str]:
+    """Returns the base events in a random order, interleaved with random extra events.
+
+    Args:
+        seed: Random seed.
+        length: Number of extra events.
+
+    Returns:
+        List[str]: Event names.
+    """
+    generator = random.Random(seed)
+    events = generator.sample(BASE_EVENTS, len(BASE_EVENTS))
+    for extra_event in generator.choices(EXTRA_EVENTS, k=length):
+        events.insert(generator.randint(0, len(events)), extra_event)
+    return events
+
+
+def sequences(seeds: int, length: int) -> Dict[str, List[str]]:
+    """Returns the realistic scenarios followed by randomized sequences.
+
+    Args:
+        seeds: Number of randomized sequences.
+        length: Number of extra events in each randomized sequence.
+
+    Returns:
+        Dict[str, List[str]]: Event names, keyed on sequence name.
+    """
+    randomized = {f"random-{seed}": random_sequence(seed, length) for seed in range(seeds)}
+    return {**SCENARIOS, **randomized}
+
+
+class TestConvergence(unittest.TestCase):
+    def test_given_event_sequences_when_replayed_then_charm_converges_with_minimum_work(self):
+        for name, events in sequences(seeds=50, length=8).items():
+            with self.subTest(sequence=name):
+                result = Simulation().run(name, events)
+
+                self.assertEqual(result.errors, [], f"{name}: {', '.join(result.events)}")
+
+
+def main() -> None:
+    """Replays every sequence and prints the work done against the necessary minimum."""
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seeds", type=int, default=50)
+    parser.add_argument("--length", type=int, default=8)
+    args = parser.parse_args()
+    print(f"{'sequence':<36}{'events':>8}{'pushes':>10}{'replans':>10}{'restarts':>10}")
+    failed = False
+    for name, events in sequences(args.seeds, args.length).items():
+        result = Simulation().run(name, events)
+        print(
+            f"{name:<36}{len(result.events):>8}"
+            + "".join(
+                f"{getattr(result.actual, counter):>6}/{getattr(result.minimum, counter):<3}"
+                for counter in ("pushes", "replans", "restarts")
+            )
+        )
+        for error in result.errors:
+            print(f"    {error}")
+        failed = failed or bool(result.errors)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# Copyright 2022 Guillaume Belanger
+# See LICENSE file for licensing details.
+
+import json
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from pymongo.errors import ServerSelectionTimeoutError
+
+from cache_warmer import run
+
+
+class TestCacheWarmer(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.progress_path = Path(directory.name) / "progress.json"
+        self.params = {
+            "uri": "mongodb://1.2.3.4:27017",
+            "database": "free5gc",
+            "collections": ["policyData.ues.amData"],
+            "concurrency": 2,
+            "time_budget": 20,
+            "pebble_socket": "/charm/containers/udr/pebble.socket",
+            "marker_path": "/tmp/udr-warmed-up",
+            "progress_path": str(self.progress_path),
+        }
+
+    @patch("ops.pebble.Client")
+    @patch("cache_warmer.warm_up")
+    @patch("pymongo.MongoClient")
+    def test_given_database_when_run_then_cache_is_warmed_and_workload_is_marked_ready(
+        self, _, patch_warm_up, patch_pebble_client
+    ):
+        def warm_up(client, database_name, collections, concurrency, time_budget, progress):
+            progress(1, 2)
+            self.assertEqual(json.loads(self.progress_path.read_text())["completed"], 1)
+            progress(2, 2)
+            return {"indexes": 1, "collections": 1, "entries": 9, "complete": True}
+
+        patch_warm_up.side_effect = warm_up
+
+        run(self.params)
+
+        self.assertEqual(patch_warm_up.call_args.kwargs["time_budget"], 20)
+        patch_pebble_client.assert_called_with(socket_path="/charm/containers/udr/pebble.socket")
+        self.assertEqual(
+            patch_pebble_client.return_value.push.call_args.args[0], "/tmp/udr-warmed-up"
+        )
+        progress = json.loads(self.progress_path.read_text())
+        self.assertEqual(
+            (progress["completed"], progress["total"], progress["done"]), (2, 2, True)
+        )
+
+    @patch("ops.pebble.Client")
+    @patch("cache_warmer.warm_up")
+    @patch("pymongo.MongoClient")
+    def test_given_warm_up_starts_when_run_then_progress_is_written_before_the_first_scan(
+        self, _, patch_warm_up, __
+    ):
+        def warm_up(client, database_name, collections, concurrency, time_budget, progress):
+            self.assertEqual(
+                json.loads(self.progress_path.read_text()),
+                {"pid": os.getpid(), "completed": 0, "total": 0, "done": False},
+            )
+            return {"indexes": 0, "collections": 0, "entries": 0, "complete": True}
+
+        patch_warm_up.side_effect = warm_up
+
+        run(self.params)
+
+        patch_warm_up.assert_called_once()
+
+    @patch("ops.pebble.Client")
+    @patch("cache_warmer.warm_up")
+    @patch("pymongo.MongoClient")
+    def test_given_database_is_unreachable_when_run_then_workload_is_marked_ready(
+        self, _, patch_warm_up, patch_pebble_client
+    ):
+        patch_warm_up.side_effect = ServerSelectionTimeoutError("No servers found")
+
+        run(self.params)
+
+        patch_pebble_client.return_value.push.assert_called_once()
+        self.assertTrue(json.loads(self.progress_path.read_text())["done"])
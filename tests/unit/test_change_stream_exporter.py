@@ -0,0 +1,175 @@
+# Copyright 2022 Guillaume Belanger
+# See LICENSE file for licensing details.
+
+import json
+import unittest
+from unittest.mock import MagicMock, patch
+
+from pymongo.errors import OperationFailure
+
+from change_stream_exporter import ResumeTokenStore, export_batch, producer_config, watch
+
+
+class FakeCollection:
+    def __init__(self):
+        self.documents = {}
+
+    def find_one(self, query):
+        return self.documents.get(query["_id"])
+
+    def update_one(self, query, update, upsert=False):
+        self.documents.setdefault(query["_id"], {"_id": query["_id"]}).update(update["$set"])
+
+    def delete_one(self, query):
+        self.documents.pop(query["_id"], None)
+
+
+class FakeChangeStream:
+    def __init__(self, changes):
+        self.changes = list(changes)
+        self.resume_token = None
+
+    def try_next(self):
+        if not self.changes:
+            return None
+        change = self.changes.pop(0)
+        self.resume_token = change["_id"]
+        return change
+
+
+class FakeProducer:
+    def __init__(self, fail_on_flush=False):
+        self.pending = []
+        self.sent = []
+        self.fail_on_flush = fail_on_flush
+
+    def send(self, topic, key, value):
+        self.pending.append((topic, key, json.loads(value)))
+
+    def flush(self):
+        if self.fail_on_flush:
+            raise RuntimeError("broker unavailable")
+        self.sent += self.pending
+        self.pending = []
+
+
+def _change(number):
+    return {
+        "_id": {"_data": f"token-{number}"},
+        "operationType": "update",
+        "ns": {"db": "free5gc", "coll": "subscriptionData.sdmSubscriptions"},
+        "documentKey": {"_id": f"imsi-20893000000000{number}"},
+        "updateDescription": {"updatedFields": {"monitoredResourceUris": []}},
+    }
+
+
+class TestChangeStreamExporter(unittest.TestCase):
+    def setUp(self):
+        self.token_store = ResumeTokenStore(FakeCollection(), "udr-data-changes")
+
+    def test_given_changes_when_export_batch_then_records_are_published_and_token_is_saved(self):
+        stream = FakeChangeStream([_change(1), _change(2), _change(3)])
+        producer = FakeProducer()
+
+        published = export_batch(
+            stream, producer, "udr-data-changes", self.token_store, batch_size=2, timeout=1
+        )
+
+        self.assertEqual(published, 2)
+        self.assertEqual(
+            [key for _, key, _ in producer.sent],
+            [b"imsi-208930000000001", b"imsi-208930000000002"],
+        )
+        self.assertEqual(producer.sent[0][2]["collection"], "subscriptionData.sdmSubscriptions")
+        self.assertEqual(producer.sent[0][2]["operation"], "update")
+        self.assertEqual(self.token_store.load(), {"_data": "token-2"})
+
+    def test_given_flush_fails_when_export_batch_then_token_is_not_saved(self):
+        self.token_store.save({"_data": "token-0"})
+        stream = FakeChangeStream([_change(1)])
+
+        with self.assertRaises(RuntimeError):
+            export_batch(
+                stream,
+                FakeProducer(fail_on_flush=True),
+                "udr-data-changes",
+                self.token_store,
+                batch_size=10,
+                timeout=0.1,
+            )
+
+        self.assertEqual(self.token_store.load(), {"_data": "token-0"})
+
+    def test_given_no_changes_when_export_batch_then_nothing_is_published(self):
+        producer = FakeProducer()
+
+        published = export_batch(
+            FakeChangeStream([]), producer, "udr-data-changes", self.token_store, 10, 0.05
+        )
+
+        self.assertEqual(published, 0)
+        self.assertEqual(producer.sent, [])
+        self.assertIsNone(self.token_store.load())
+
+    def test_given_token_saved_by_previous_leader_when_watch_then_stream_resumes_after_it(self):
+        ResumeTokenStore(self.token_store.collection, "udr-data-changes").save(
+            {"_data": "token-2"}
+        )
+        database = MagicMock()
+
+        stream = watch(database, ["policyData.ues.amData"], self.token_store, 1000)
+
+        self.assertEqual(stream, database.watch.return_value)
+        self.assertEqual(database.watch.call_args.kwargs["resume_after"], {"_data": "token-2"})
+
+    def test_given_token_aged_out_of_oplog_when_watch_then_stream_starts_from_current_changes(
+        self,
+    ):
+        self.token_store.save({"_data": "token-0"})
+        database = MagicMock()
+        database.watch.side_effect = [OperationFailure("history lost", code=286), MagicMock()]
+
+        with self.assertLogs("change_stream_exporter", "ERROR"):
+            watch(database, ["policyData.ues.amData"], self.token_store, 1000)
+
+        self.assertNotIn("resume_after", database.watch.call_args.kwargs)
+        self.assertIsNone(self.token_store.load())
+
+    def test_given_other_operation_failure_when_watch_then_error_is_raised(self):
+        self.token_store.save({"_data": "token-0"})
+        database = MagicMock()
+        database.watch.side_effect = OperationFailure("unauthorized", code=13)
+
+        with self.assertRaises(OperationFailure):
+            watch(database, ["policyData.ues.amData"], self.token_store, 1000)
+
+        self.assertEqual(self.token_store.load(), {"_data": "token-0"})
+
+    def test_given_plaintext_kafka_when_producer_config_then_sasl_settings_come_from_params(self):
+        config = producer_config(self._params(security_protocol="SASL_PLAINTEXT", tls_ca=""))
+
+        self.assertEqual(config["security_protocol"], "SASL_PLAINTEXT")
+        self.assertEqual(config["sasl_mechanism"], "SCRAM-SHA-512")
+        self.assertEqual(config["bootstrap_servers"], ["10.0.0.1:9092", "10.0.0.2:9092"])
+        self.assertNotIn("ssl_context", config)
+
+    @patch("ssl.create_default_context")
+    def test_given_kafka_ca_when_producer_config_then_ssl_context_trusts_it(
+        self, patch_create_default_context
+    ):
+        config = producer_config(self._params(security_protocol="SASL_SSL", tls_ca="ca"))
+
+        patch_create_default_context.assert_called_with(cadata="ca")
+        self.assertEqual(config["ssl_context"], patch_create_default_context.return_value)
+
+    @staticmethod
+    def _params(**params):
+        return {
+            "bootstrap_servers": "10.0.0.1:9092,10.0.0.2:9092",
+            "compression": "gzip",
+            "sasl_mechanism": "SCRAM-SHA-512",
+            "username": "udr",
+            "password": "secret",
+            "batch_timeout_ms": 1000,
+            **params,
+        }
@@ -1,29 +1,78 @@
 # Copyright 2022 Guillaume Belanger
 # See LICENSE file for licensing details.
 
+import json
+import signal
+import socket
+import sys
+import tempfile
 import unittest
+from datetime import timedelta
+from pathlib import Path
 from unittest.mock import patch
 
+import yaml
+from charmlibs.interfaces.tls_certificates import (
+    Certificate,
+    CertificateRequestAttributes,
+    CertificateSigningRequest,
+    PrivateKey,
+)
+from charmlibs.interfaces.tls_certificates._tls_certificates import LIBID
+from lightkube.models.apps_v1 import StatefulSetSpec
+from lightkube.models.core_v1 import PodSpec, PodTemplateSpec, ServiceSpec
+from lightkube.models.meta_v1 import LabelSelector, ObjectMeta
+from lightkube.resources.apps_v1 import StatefulSet
+from lightkube.resources.core_v1 import Service
+from lightkube.types import PatchType
 from ops import testing
-from ops.model import ActiveStatus
+from ops.model import ActiveStatus, BlockedStatus, MaintenanceStatus, WaitingStatus
+from ops.pebble import Layer
 
-from charm import UDROperatorCharm
+from charm import UDROperatorCharm, config_diff, load_template, parse_duration
 
 
 class TestCharm(unittest.TestCase):
-    @patch(
-        "charm.KubernetesServicePatch",
-        lambda charm, ports: None,
-    )
-    def setUp(self):
+    @patch("charms.observability_libs.v1.kubernetes_service_patch.KubernetesServicePatch")
+    def setUp(self, patch_service_patcher):
         self.namespace = "whatever"
         self.harness = testing.Harness(UDROperatorCharm)
         self.harness.set_model_name(name=self.namespace)
+        self.harness.update_config(key_values={"warm-up-time-budget": 0})
         self.addCleanup(self.harness.cleanup)
+        warm_up_directory = tempfile.TemporaryDirectory()
+        self.addCleanup(warm_up_directory.cleanup)
+        self.warm_up_progress_path = Path(warm_up_directory.name) / "progress.json"
+        patch("charm.WARM_UP_PROGRESS_PATH", str(self.warm_up_progress_path)).start()
+        patch("charm.WARM_UP_LOG_PATH", f"{warm_up_directory.name}/warm-up.log").start()
+        self.addCleanup(patch.stopall)
         self.harness.begin()
+        self.harness.add_storage("udr-volume", attach=True)
+        self.harness.charm._service_patcher.service_name = "udr-operator"
+        self.harness.charm._service_patcher.service = Service(
+            metadata=ObjectMeta(name="udr-operator"), spec=ServiceSpec()
+        )
+
+    @staticmethod
+    def _statefulset(pod_spec: PodSpec = PodSpec(containers=[]), annotations=None) -> StatefulSet:
+        return StatefulSet(
+            metadata=ObjectMeta(name="udr-operator", annotations=annotations),
+            spec=StatefulSetSpec(
+                selector=LabelSelector(),
+                serviceName="udr-operator-endpoints",
+                template=PodTemplateSpec(spec=pod_spec),
+            ),
+        )
+
+    def _local_listener(self) -> int:
+        listener = socket.socket()
+        listener.bind(("127.0.0.1", 0))
+        listener.listen()
+        self.addCleanup(listener.close)
+        return listener.getsockname()[1]
 
     def _nrf_is_available(self) -> str:
-        nrf_url = "http://1.1.1.1"
+        nrf_url = f"http://127.0.0.1:{self._local_listener()}"
         nrf_relation_id = self.harness.add_relation("nrf", "nrf-operator")
         self.harness.add_relation_unit(
             relation_id=nrf_relation_id, remote_unit_name="nrf-operator/0"
@@ -33,8 +82,28 @@ class TestCharm(unittest.TestCase):
         )
         return nrf_url
 
+    def _workload_runs_outdated_layer(self) -> None:
+        self.harness.set_can_connect(container="udr", val=True)
+        container = self.harness.model.unit.get_container("udr")
+        container.add_layer(
+            "udr",
+            Layer(
+                {
+                    "services": {
+                        "udr": {
+                            "override": "replace",
+                            "startup": "enabled",
+                            "command": "/free5gc/udr/udr --udrcfg /etc/udr/udrcfg.conf",
+                        }
+                    }
+                }
+            ),
+            combine=True,
+        )
+        container.replan()
+
     def _database_is_available(self) -> str:
-        database_url = "http://1.1.1.1"
+        database_url = f"mongodb://127.0.0.1:{self._local_listener()}"
         database_username = "user1"
         database_password = "password1"
         database_relation_id = self.harness.add_relation("database", "mongodb-k8s")
@@ -66,20 +135,123 @@ class TestCharm(unittest.TestCase):
 
         nrf_url = self._nrf_is_available()
 
-        patch_push.assert_called_with(
+        patch_push.assert_any_call(
             path="/etc/udr/udrcfg.conf",
             source=f'configuration:\n  mongodb:\n    name: free5gc\n    url: { database_url }\n  nrfUri: { nrf_url }\n  plmnSupportList:\n  - plmnId:\n      mcc: "208"\n      mnc: "93"\n  - plmnId:\n      mcc: "333"\n      mnc: "88"\n  sbi:\n    bindingIPv4: 0.0.0.0\n    port: 29504\n    registerIPv4: { udr_hostname }\n    scheme: http\ninfo:\n  description: UDR initial local configuration\n  version: 1.0.0\nlogger:\n  AMF:\n    ReportCaller: false\n    debugLevel: info\n  AUSF:\n    ReportCaller: false\n    debugLevel: info\n  Aper:\n    ReportCaller: false\n    debugLevel: info\n  CommonConsumerTest:\n    ReportCaller: false\n    debugLevel: info\n  FSM:\n    ReportCaller: false\n    debugLevel: info\n  MongoDBLibrary:\n    ReportCaller: false\n    debugLevel: info\n  N3IWF:\n    ReportCaller: false\n    debugLevel: info\n  NAS:\n    ReportCaller: false\n    debugLevel: info\n  NGAP:\n    ReportCaller: false\n    debugLevel: info\n  NRF:\n    ReportCaller: false\n    debugLevel: info\n  NamfComm:\n    ReportCaller: false\n    debugLevel: info\n  NamfEventExposure:\n    ReportCaller: false\n    debugLevel: info\n  NsmfPDUSession:\n    ReportCaller: false\n    debugLevel: info\n  NudrDataRepository:\n    ReportCaller: false\n    debugLevel: info\n  OpenApi:\n    ReportCaller: false\n    debugLevel: info\n  PCF:\n    ReportCaller: false\n    debugLevel: info\n  PFCP:\n    ReportCaller: false\n    debugLevel: info\n  PathUtil:\n    ReportCaller: false\n    debugLevel: info\n  SMF:\n    ReportCaller: false\n    debugLevel: info\n  UDM:\n    ReportCaller: false\n    debugLevel: info\n  UDR:\n    ReportCaller: false\n    debugLevel: info\n  WEBUI:\n    ReportCaller: false\n    debugLevel: info',  # noqa: E501
         )
 
+    @patch("tracing.urllib.request.urlopen")
+    @patch("charm.check_output")
+    def test_given_tracing_relation_when_pebble_ready_then_readiness_gates_and_pebble_calls_are_traced(  # noqa: E501
+        self, patch_check_output, patch_urlopen
+    ):
+        patch_check_output.return_value = b"1.2.3.4"
+        relation_id = self.harness.add_relation("tracing", "tempo")
+        self.harness.update_relation_data(
+            relation_id,
+            "tempo",
+            {
+                "receivers": json.dumps(
+                    [{"protocol": {"name": "otlp_http"}, "url": "http://tempo:4318"}]
+                )
+            },
+        )
+        self._database_is_available()
+        self._nrf_is_available()
+        self.harness.framework.commit()
+
+        self.harness.container_pebble_ready("udr")
+        self.harness.framework.commit()
+
+        request = patch_urlopen.call_args.args[0]
+        self.assertEqual(request.full_url, "http://tempo:4318/v1/traces")
+        spans = json.loads(request.data)["resourceSpans"][0]["scopeSpans"][0]["spans"]
+        self.assertLessEqual(
+            {
+                "readiness.database_relations_status",
+                "readiness.nrf_data_is_available",
+                "readiness.dependencies_are_reachable",
+                "write_config_file",
+                "pebble.add_layer",
+                "pebble.replan",
+                "unit-get",
+            },
+            {span["name"] for span in spans},
+        )
+
+    @patch("charm.check_output")
+    def test_given_config_file_was_edited_when_drift_check_then_file_is_rewritten_and_workload_restarted(  # noqa: E501
+        self, patch_check_output
+    ):
+        self.harness.update_config(key_values={"restart-health-timeout": 0})
+        patch_check_output.return_value = b"1.2.3.4"
+        self._database_is_available()
+        self._nrf_is_available()
+        self.harness.container_pebble_ready("udr")
+        container = self.harness.model.unit.get_container("udr")
+        expected_content = container.pull("/etc/udr/udrcfg.conf").read()
+        container.push("/etc/udr/udrcfg.conf", "edited")
+
+        with patch("ops.model.Container.restart") as patch_restart:
+            self.harness.charm.on.update_status.emit()
+
+        self.assertEqual(container.pull("/etc/udr/udrcfg.conf").read(), expected_content)
+        patch_restart.assert_called_with("udr")
+        output = self.harness.run_action("drift-stats")
+        self.assertEqual(output.results["config-repairs"], 1)
+        self.assertEqual(output.results["plan-repairs"], 0)
+
+    @patch("charm.check_output")
+    def test_given_pebble_plan_was_overridden_when_drift_check_then_layer_is_reapplied(
+        self, patch_check_output
+    ):
+        self.harness.update_config(key_values={"restart-health-timeout": 0})
+        patch_check_output.return_value = b"1.2.3.4"
+        self._database_is_available()
+        self._nrf_is_available()
+        self.harness.container_pebble_ready("udr")
+        container = self.harness.model.unit.get_container("udr")
+        container.add_layer(
+            "udr",
+            Layer({"services": {"udr": {"override": "merge", "command": "/bin/sleep 1000"}}}),
+            combine=True,
+        )
+
+        self.harness.charm.on.update_status.emit()
+
+        self.assertEqual(
+            container.get_plan().services["udr"].command,
+            "/free5gc/udr/udr --udrcfg /etc/udr/udrcfg.conf",
+        )
+        output = self.harness.run_action("drift-stats")
+        self.assertEqual(output.results["plan-repairs"], 1)
+
+    @patch("charm.check_output")
+    def test_given_nothing_drifted_when_drift_check_then_nothing_is_pushed_or_replanned(
+        self, patch_check_output
+    ):
+        patch_check_output.return_value = b"1.2.3.4"
+        self._database_is_available()
+        self._nrf_is_available()
+        self.harness.container_pebble_ready("udr")
+
+        with patch("ops.model.Container.push") as patch_push, patch(
+            "ops.model.Container.replan"
+        ) as patch_replan:
+            self.harness.charm.on.update_status.emit()
+
+        patch_push.assert_not_called()
+        patch_replan.assert_not_called()
+        patch_check_output.reset_mock()
+        self.harness.charm.on.update_status.emit()
+        patch_check_output.assert_not_called()
+
     @patch("charm.check_output")
-    @patch("ops.model.Container.exists")
     def test_given_config_file_is_written_when_pebble_ready_then_pebble_plan_is_applied(
         self,
-        patch_exists,
         patch_check_output,
     ):
         pod_ip = "1.1.1.1"
-        patch_exists.return_value = True
         patch_check_output.return_value = pod_ip.encode()
         self._database_is_available()
         self._nrf_is_available()
@@ -100,25 +272,1277 @@ class TestCharm(unittest.TestCase):
                         "POD_IP": pod_ip,
                         "MANAGED_BY_CONFIG_POD": "true",
                     },
+                    "on-failure": "restart",
+                    "on-success": "restart",
+                    "backoff-delay": "500ms",
+                    "backoff-factor": 2.0,
+                    "backoff-limit": "5s",
+                    "kill-delay": "5s",
                 }
             },
+            "checks": {
+                "udr-sbi": {
+                    "override": "replace",
+                    "level": "ready",
+                    "period": "5s",
+                    "tcp": {"port": 29504},
+                },
+                "udr-warmup": {
+                    "override": "replace",
+                    "level": "ready",
+                    "period": "5s",
+                    "threshold": 1,
+                    "exec": {"command": "test -f /tmp/udr-warmed-up"},
+                },
+            },
         }
 
         updated_plan = self.harness.get_container_pebble_plan("udr").to_dict()
 
         self.assertEqual(expected_plan, updated_plan)
 
+    @patch("pathlib.Path.read_bytes", return_value=b"python3\0cache_warmer.py")
+    @patch("charm.Popen")
+    @patch("charm.check_output")
+    def test_given_warm_up_budget_when_workload_starts_then_cache_is_warmed_in_the_background(
+        self, patch_check_output, patch_popen, _
+    ):
+        patch_check_output.return_value = b"1.2.3.4"
+        patch_popen.return_value.pid = 1234
+        self.warm_up_progress_path.write_text(
+            json.dumps({"pid": 1000, "completed": 11, "total": 11, "done": True})
+        )
+        self.harness.update_config(key_values={"warm-up-time-budget": 20})
+        self._database_is_available()
+        self._nrf_is_available()
+
+        self.harness.container_pebble_ready("udr")
+
+        self.assertEqual(
+            patch_popen.call_args.args[0][1],
+            str(self.harness.charm.charm_dir / "src" / "cache_warmer.py"),
+        )
+        params = json.loads(patch_popen.return_value.stdin.write.call_args.args[0])
+        self.assertEqual(params["time_budget"], 20)
+        self.assertEqual(params["concurrency"], 4)
+        self.assertEqual(params["pebble_socket"], "/charm/containers/udr/pebble.socket")
+        self.assertEqual(params["marker_path"], "/tmp/udr-warmed-up")
+        container = self.harness.model.unit.get_container("udr")
+        self.assertFalse(container.exists("/tmp/udr-warmed-up"))
+        self.assertEqual(self.harness.model.unit.status, MaintenanceStatus("Warming up"))
+        self.assertEqual(self.harness.charm._stored.warm_up_pid, 1234)
+        self.assertFalse(self.warm_up_progress_path.exists())
+
+    @patch("pathlib.Path.read_bytes", return_value=b"python3\0cache_warmer.py")
+    def test_given_warm_up_is_running_when_update_status_then_progress_is_reported(self, _):
+        self.harness.set_can_connect(container="udr", val=True)
+        self.harness.charm._stored.warm_up_pid = 1234
+        self.harness.model.unit.status = MaintenanceStatus("Warming up")
+        self.warm_up_progress_path.write_text(
+            json.dumps({"pid": 1234, "completed": 3, "total": 11, "done": False})
+        )
+
+        self.harness.charm.on.update_status.emit()
+
+        self.assertEqual(
+            self.harness.model.unit.status, MaintenanceStatus("Warming up: 3/11 scans")
+        )
+
+    @patch("pathlib.Path.read_bytes", return_value=b"python3\0cache_warmer.py")
+    def test_given_warm_up_is_done_when_update_status_then_status_is_active(self, _):
+        self.harness.set_can_connect(container="udr", val=True)
+        self.harness.charm._stored.warm_up_pid = 1234
+        self.harness.model.unit.status = MaintenanceStatus("Warming up: 3/11 scans")
+        self.warm_up_progress_path.write_text(
+            json.dumps({"pid": 1234, "completed": 11, "total": 11, "done": True})
+        )
+
+        self.harness.charm.on.update_status.emit()
+
+        self.assertEqual(self.harness.model.unit.status, ActiveStatus())
+
+    @patch("os.kill")
+    @patch("pathlib.Path.read_bytes", return_value=b"python3\0other.py")
+    def test_given_warm_up_pid_was_reused_when_workload_restarts_then_process_is_not_killed(
+        self, _, patch_kill
+    ):
+        self.harness.set_can_connect(container="udr", val=True)
+        self.harness.charm._stored.warm_up_pid = 1234
+
+        self.harness.charm._clear_warm_up_marker()
+
+        patch_kill.assert_not_called()
+        self.assertEqual(self.harness.charm._stored.warm_up_pid, 0)
+
+    def test_given_health_timeout_shorter_than_warm_up_when_config_changed_then_status_is_blocked(  # noqa: E501
+        self,
+    ):
+        self.harness.update_config(
+            key_values={"warm-up-time-budget": 30, "restart-health-timeout": 30}
+        )
+
+        self.assertEqual(
+            self.harness.model.unit.status,
+            BlockedStatus(
+                "The following configurations are not valid: ['restart-health-timeout']"
+            ),
+        )
+
+    @patch("time.sleep")
+    @patch("charm.check_output")
+    def test_given_workload_is_running_when_stop_then_unit_fails_readiness_and_drains_before_stopping(  # noqa: E501
+        self, patch_check_output, patch_sleep
+    ):
+        patch_check_output.return_value = b"1.2.3.4"
+        self.harness.update_config(key_values={"drain-grace-period": 15})
+        self._database_is_available()
+        self._nrf_is_available()
+        self.harness.container_pebble_ready("udr")
+        container = self.harness.model.unit.get_container("udr")
+        self.assertTrue(container.exists("/tmp/udr-warmed-up"))
+
+        self.harness.charm.on.stop.emit()
+
+        patch_sleep.assert_called_once_with(15)
+        self.assertFalse(container.exists("/tmp/udr-warmed-up"))
+        self.assertFalse(container.get_service("udr").is_running())
+        self.assertEqual(self.harness.model.unit.status, MaintenanceStatus("Draining"))
+
+    def test_given_drain_and_kill_delay_exceed_pod_termination_grace_period_when_config_changed_then_status_is_blocked(  # noqa: E501
+        self,
+    ):
+        self.harness.update_config(
+            key_values={"drain-grace-period": 20, "workload-kill-delay": "10s"}
+        )
+
+        self.assertEqual(
+            self.harness.model.unit.status,
+            BlockedStatus("The following configurations are not valid: ['drain-grace-period']"),
+        )
+
+    @patch("time.sleep")
+    def test_given_workload_is_not_running_when_remove_then_nothing_is_drained(self, patch_sleep):
+        self.harness.set_can_connect(container="udr", val=True)
+
+        self.harness.charm.on.remove.emit()
+
+        patch_sleep.assert_not_called()
+
+    @patch("charm.check_output")
+    def test_given_pebble_returns_canonical_durations_when_config_changed_then_workload_is_not_restarted(  # noqa: E501
+        self, patch_check_output
+    ):
+        patch_check_output.return_value = b"1.2.3.4"
+        self.harness.update_config(key_values={"workload-backoff-limit": "90s"})
+        peer_relation_id = self.harness.add_relation("replicas", "udr-operator")
+        self.harness.add_relation_unit(peer_relation_id, "udr-operator/1")
+        self._database_is_available()
+        self._nrf_is_available()
+        self.harness.container_pebble_ready("udr")
+        layer = self.harness.charm._pebble_layer.to_dict()
+        layer["services"]["udr"]["backoff-limit"] = "1m30s"
+        self.harness.model.unit.get_container("udr").add_layer("udr", Layer(layer), combine=True)
+
+        self.harness.update_config(key_values={"workload-backoff-limit": "90s"})
+
+        self.assertEqual(self.harness.get_relation_data(peer_relation_id, "udr-operator/0"), {})
+        self.assertEqual(self.harness.model.unit.status, ActiveStatus())
+
+    def test_given_go_durations_when_parse_duration_then_seconds_are_returned(self):
+        self.assertEqual(parse_duration("1m30s"), parse_duration("90s"))
+        self.assertEqual(parse_duration("500ms"), 0.5)
+        self.assertEqual(parse_duration("1h0m0s"), 3600)
+
     @patch("charm.check_output")
-    @patch("ops.model.Container.exists")
     def test_given_config_file_is_written_when_pebble_ready_then_status_is_active(
-        self, patch_exists, patch_check_output
+        self, patch_check_output
+    ):
+        patch_check_output.return_value = b"1.2.3.4"
+
+        self._nrf_is_available()
+        self._database_is_available()
+
+        self.harness.container_pebble_ready("udr")
+
+        self.assertEqual(self.harness.model.unit.status, ActiveStatus())
+
+    def test_given_invalid_session_affinity_when_config_changed_then_status_is_blocked(self):
+        self.harness.update_config(key_values={"session-affinity": "Sticky"})
+
+        self.assertEqual(
+            self.harness.model.unit.status,
+            BlockedStatus("The following configurations are not valid: ['session-affinity']"),
+        )
+
+    @patch("lightkube.Client")
+    def test_given_zone_local_routing_when_config_changed_then_service_is_patched(
+        self, patch_client
+    ):
+        self.harness.update_config(
+            key_values={"topology-aware-routing": True, "internal-traffic-policy": "Local"}
+        )
+
+        patch_client.return_value.patch.assert_called_once()
+        args, kwargs = patch_client.return_value.patch.call_args
+        self.assertEqual(args[0], Service)
+        self.assertEqual(args[1], "udr-operator")
+        self.assertEqual(kwargs["patch_type"], PatchType.MERGE)
+        self.assertEqual(
+            args[2].metadata.annotations, {"service.kubernetes.io/topology-mode": "Auto"}
+        )
+        self.assertEqual(args[2].spec.internalTrafficPolicy, "Local")
+        self.assertEqual(args[2].spec.type, "ClusterIP")
+        self.assertIsNone(args[2].spec.externalTrafficPolicy)
+
+    @patch("lightkube.Client")
+    def test_given_load_balancer_service_when_config_changed_then_external_traffic_policy_is_set(
+        self, patch_client
+    ):
+        self.harness.update_config(
+            key_values={"service-type": "LoadBalancer", "external-traffic-policy": "Local"}
+        )
+
+        service = patch_client.return_value.patch.call_args.args[2]
+        self.assertEqual(service.spec.type, "LoadBalancer")
+        self.assertEqual(service.spec.externalTrafficPolicy, "Local")
+
+    @patch("lightkube.Client")
+    def test_given_service_was_modified_when_drift_check_then_service_is_patched_again(
+        self, patch_client
+    ):
+        self.harness.set_leader(True)
+        patch_client.return_value.get.return_value = self._statefulset()
+        patch_client.return_value.patch.return_value = Service(
+            metadata=ObjectMeta(name="udr-operator", resourceVersion="1")
+        )
+        self.harness.update_config(key_values={"internal-traffic-policy": "Local"})
+        patch_client.return_value.get.return_value = Service(
+            metadata=ObjectMeta(name="udr-operator", resourceVersion="2")
+        )
+        patch_client.return_value.patch.reset_mock()
+
+        self.harness.charm.on.update_status.emit()
+
+        patch_client.return_value.get.assert_called_with(Service, "udr-operator")
+        patch_client.return_value.patch.assert_called_once()
+        output = self.harness.run_action("drift-stats")
+        self.assertEqual(output.results["service-repairs"], 1)
+
+    @patch("lightkube.Client")
+    def test_given_service_is_unchanged_when_drift_check_then_service_is_not_patched(
+        self, patch_client
+    ):
+        self.harness.set_leader(True)
+        patch_client.return_value.get.return_value = self._statefulset()
+        patch_client.return_value.patch.return_value = Service(
+            metadata=ObjectMeta(name="udr-operator", resourceVersion="1")
+        )
+        self.harness.update_config(key_values={"internal-traffic-policy": "Local"})
+        patch_client.return_value.get.return_value = Service(
+            metadata=ObjectMeta(name="udr-operator", resourceVersion="1")
+        )
+        patch_client.return_value.patch.reset_mock()
+
+        self.harness.charm.on.update_status.emit()
+
+        patch_client.return_value.patch.assert_not_called()
+
+    @patch("lightkube.Client")
+    def test_given_placement_config_when_config_changed_then_statefulset_pod_template_is_patched(
+        self, patch_client
+    ):
+        self.harness.set_leader(True)
+        patch_client.return_value.get.return_value = self._statefulset()
+
+        self.harness.update_config(
+            key_values={
+                "pod-anti-affinity": "required",
+                "topology-spread": "zone",
+                "node-selector": "node-pool=core-network",
+                "tolerations": "dedicated=core-network:NoSchedule",
+                "priority-class-name": "core-network",
+            }
+        )
+
+        selector = {"matchLabels": {"app.kubernetes.io/name": "udr-operator"}}
+        owned = {
+            "fields": ["affinity", "topologySpreadConstraints", "priorityClassName"],
+            "nodeSelector": ["node-pool"],
+            "tolerations": [
+                {
+                    "effect": "NoSchedule",
+                    "key": "dedicated",
+                    "operator": "Equal",
+                    "value": "core-network",
+                }
+            ],
+        }
+        patch_client.return_value.patch.assert_any_call(
+            StatefulSet,
+            "udr-operator",
+            {
+                "metadata": {
+                    "annotations": {"udr-operator.charm/owned-placement": json.dumps(owned)}
+                },
+                "spec": {
+                    "template": {
+                        "spec": {
+                            "affinity": {
+                                "podAntiAffinity": {
+                                    "requiredDuringSchedulingIgnoredDuringExecution": [
+                                        {
+                                            "topologyKey": "kubernetes.io/hostname",
+                                            "labelSelector": selector,
+                                        }
+                                    ]
+                                }
+                            },
+                            "topologySpreadConstraints": [
+                                {
+                                    "maxSkew": 1,
+                                    "topologyKey": "topology.kubernetes.io/zone",
+                                    "whenUnsatisfiable": "ScheduleAnyway",
+                                    "labelSelector": selector,
+                                }
+                            ],
+                            "nodeSelector": {"node-pool": "core-network"},
+                            "tolerations": [
+                                {
+                                    "effect": "NoSchedule",
+                                    "key": "dedicated",
+                                    "operator": "Equal",
+                                    "value": "core-network",
+                                }
+                            ],
+                            "priorityClassName": "core-network",
+                        }
+                    }
+                },
+            },
+            namespace=self.namespace,
+            patch_type=PatchType.MERGE,
+        )
+
+    @patch("lightkube.Client")
+    def test_given_statefulset_has_placement_when_config_changed_then_it_is_not_patched(
+        self, patch_client
+    ):
+        self.harness.set_leader(True)
+        patch_client.return_value.get.return_value = self._statefulset(
+            PodSpec(containers=[], priorityClassName="core-network"),
+            annotations={
+                "udr-operator.charm/owned-placement": json.dumps(
+                    {"fields": ["priorityClassName"], "nodeSelector": [], "tolerations": []}
+                )
+            },
+        )
+
+        self.harness.update_config(key_values={"priority-class-name": "core-network"})
+
+        for call in patch_client.return_value.patch.call_args_list:
+            self.assertNotEqual(call.args[0], StatefulSet)
+
+    @patch("lightkube.Client")
+    def test_given_juju_node_selector_when_config_changed_then_only_charm_labels_are_changed(
+        self, patch_client
+    ):
+        self.harness.set_leader(True)
+        patch_client.return_value.get.return_value = self._statefulset(
+            PodSpec(containers=[], nodeSelector={"kubernetes.io/arch": "amd64"})
+        )
+
+        self.harness.update_config(key_values={"pod-anti-affinity": "", "node-selector": ""})
+
+        for call in patch_client.return_value.patch.call_args_list:
+            self.assertNotEqual(call.args[0], StatefulSet)
+
+        self.harness.update_config(key_values={"node-selector": "node-pool=core-network"})
+
+        body = patch_client.return_value.patch.call_args.args[2]
+        self.assertEqual(
+            body["spec"]["template"]["spec"],
+            {"nodeSelector": {"kubernetes.io/arch": "amd64", "node-pool": "core-network"}},
+        )
+        patch_client.return_value.get.return_value = self._statefulset(
+            PodSpec(
+                containers=[],
+                nodeSelector={"kubernetes.io/arch": "amd64", "node-pool": "core-network"},
+            ),
+            annotations=body["metadata"]["annotations"],
+        )
+
+        self.harness.update_config(key_values={"node-selector": ""})
+
+        body = patch_client.return_value.patch.call_args.args[2]
+        self.assertEqual(
+            body["spec"]["template"]["spec"],
+            {"nodeSelector": {"node-pool": None, "kubernetes.io/arch": "amd64"}},
+        )
+
+    def test_given_malformed_tolerations_when_config_changed_then_status_is_blocked(self):
+        self.harness.update_config(key_values={"tolerations": "dedicated=core-network:Never"})
+
+        self.assertEqual(
+            self.harness.model.unit.status,
+            BlockedStatus("The following configurations are not valid: ['tolerations']"),
+        )
+
+    @patch("charm.check_output")
+    def test_given_other_unit_holds_restart_lock_when_layer_changes_then_workload_is_not_restarted(  # noqa: E501
+        self, patch_check_output
     ):
-        patch_exists.return_value = True
         patch_check_output.return_value = b"1.2.3.4"
+        peer_relation_id = self.harness.add_relation("replicas", "udr-operator")
+        self.harness.add_relation_unit(peer_relation_id, "udr-operator/1")
+        self.harness.update_relation_data(
+            peer_relation_id, "udr-operator/1", {"state": "restarting"}
+        )
+        self.harness.update_relation_data(
+            peer_relation_id, "udr-operator", {"granted": '["udr-operator/1"]'}
+        )
+        self._workload_runs_outdated_layer()
+        self._database_is_available()
+        self._nrf_is_available()
+
+        self.harness.container_pebble_ready("udr")
 
+        self.assertEqual(
+            self.harness.model.unit.status, MaintenanceStatus("Waiting for restart lock")
+        )
+        self.assertEqual(
+            self.harness.get_relation_data(peer_relation_id, "udr-operator/0"),
+            {"state": "requested"},
+        )
+        plan = self.harness.get_container_pebble_plan("udr").to_dict()
+        self.assertNotIn("environment", plan["services"]["udr"])
+
+    @patch("charm.check_output")
+    def test_given_restart_lock_is_free_when_layer_changes_then_workload_is_restarted_and_lock_released(  # noqa: E501
+        self, patch_check_output
+    ):
+        patch_check_output.return_value = b"1.2.3.4"
+        self.harness.update_config(key_values={"restart-health-timeout": 0})
+        self.harness.set_leader(True)
+        peer_relation_id = self.harness.add_relation("replicas", "udr-operator")
+        self.harness.add_relation_unit(peer_relation_id, "udr-operator/1")
+        self._workload_runs_outdated_layer()
+        self._database_is_available()
         self._nrf_is_available()
+
+        self.harness.container_pebble_ready("udr")
+
+        self.assertEqual(self.harness.model.unit.status, ActiveStatus())
+        self.assertEqual(self.harness.get_relation_data(peer_relation_id, "udr-operator/0"), {})
+        self.assertEqual(
+            self.harness.get_relation_data(peer_relation_id, "udr-operator"), {"granted": "[]"}
+        )
+        plan = self.harness.get_container_pebble_plan("udr").to_dict()
+        self.assertEqual(plan["services"]["udr"]["environment"]["POD_IP"], "1.2.3.4")
+
+    @patch("charm.check_output")
+    def test_given_restart_is_queued_behind_other_unit_when_update_status_then_restart_is_kept_until_granted(  # noqa: E501
+        self, patch_check_output
+    ):
+        patch_check_output.return_value = b"1.2.3.4"
+        self.harness.update_config(key_values={"restart-health-timeout": 0})
+        self.harness.set_leader(True)
+        peer_relation_id = self.harness.add_relation("replicas", "udr-operator")
+        self.harness.add_relation_unit(peer_relation_id, "udr-operator/1")
         self._database_is_available()
+        self._nrf_is_available()
+        self.harness.container_pebble_ready("udr")
+        self.harness.update_relation_data(
+            peer_relation_id, "udr-operator/1", {"state": "requested"}
+        )
+        self.assertEqual(
+            self.harness.get_relation_data(peer_relation_id, "udr-operator"),
+            {"granted": '["udr-operator/1"]'},
+        )
+        patch_restart = patch("ops.model.Container.restart").start()
+        self.addCleanup(patch.stopall)
+        nrf_relation_id = self.harness.model.get_relation("nrf").id
+        self.harness.update_relation_data(
+            nrf_relation_id,
+            "nrf-operator",
+            {"url": f"http://127.0.0.1:{self._local_listener()}"},
+        )
+
+        self.harness.charm.on.update_status.emit()
+
+        self.assertEqual(
+            self.harness.get_relation_data(peer_relation_id, "udr-operator/0"),
+            {"state": "requested"},
+        )
+        self.assertEqual(
+            self.harness.model.unit.status, MaintenanceStatus("Waiting for restart lock")
+        )
+        patch_restart.assert_not_called()
+
+        self.harness.update_relation_data(peer_relation_id, "udr-operator/1", {"state": ""})
+
+        patch_restart.assert_called_once_with("udr")
+        self.assertEqual(self.harness.get_relation_data(peer_relation_id, "udr-operator/0"), {})
+        self.assertEqual(self.harness.model.unit.status, ActiveStatus())
+
+    def test_given_leader_when_lock_is_released_then_next_waiting_unit_is_granted(self):
+        self.harness.set_leader(True)
+        peer_relation_id = self.harness.add_relation("replicas", "udr-operator")
+        self.harness.add_relation_unit(peer_relation_id, "udr-operator/1")
+        self.harness.add_relation_unit(peer_relation_id, "udr-operator/2")
+        self.harness.update_relation_data(
+            peer_relation_id, "udr-operator/1", {"state": "restarting"}
+        )
+        self.harness.update_relation_data(
+            peer_relation_id, "udr-operator/2", {"state": "requested"}
+        )
+        self.harness.update_relation_data(
+            peer_relation_id, "udr-operator", {"granted": '["udr-operator/1"]'}
+        )
+
+        self.harness.update_relation_data(peer_relation_id, "udr-operator/1", {"state": ""})
+
+        self.assertEqual(
+            self.harness.get_relation_data(peer_relation_id, "udr-operator"),
+            {"granted": '["udr-operator/2"]'},
+        )
+
+    @patch("charm.check_output")
+    def test_given_database_host_is_unreachable_when_pebble_ready_then_status_is_waiting(
+        self, patch_check_output
+    ):
+        patch_check_output.return_value = b"1.2.3.4"
+        self.harness.update_config(key_values={"preflight-probe-timeout": 0.5})
+        self.harness.set_can_connect(container="udr", val=True)
+        self._nrf_is_available()
+        database_relation_id = self.harness.add_relation("database", "mongodb-k8s")
+        self.harness.add_relation_unit(database_relation_id, "mongodb-k8s/0")
+        self.harness.update_relation_data(
+            database_relation_id,
+            "mongodb-k8s",
+            {"username": "user1", "password": "password1", "uris": "mongodb://127.0.0.1:1"},
+        )
+
+        self.harness.container_pebble_ready("udr")
+
+        status = self.harness.model.unit.status
+        self.assertIsInstance(status, WaitingStatus)
+        self.assertIn("127.0.0.1:1 unreachable", status.message)
+        self.assertRegex(status.message, r"127.0.0.1:\d+ \d+\.\dms")
+        self.assertEqual(self.harness.get_container_pebble_plan("udr").to_dict(), {})
 
+    @patch("charm.check_output")
+    def test_given_workload_is_running_when_backoff_config_changes_then_layer_is_updated(
+        self, patch_check_output
+    ):
+        patch_check_output.return_value = b"1.2.3.4"
+        self.harness.update_config(key_values={"restart-health-timeout": 0})
+        self._database_is_available()
+        self._nrf_is_available()
         self.harness.container_pebble_ready("udr")
 
+        self.harness.update_config(
+            key_values={"workload-backoff-limit": "2s", "workload-kill-delay": "15s"}
+        )
+
+        service = self.harness.get_container_pebble_plan("udr").services["udr"]
+        self.assertEqual(service.backoff_limit, "2s")
+        self.assertEqual(service.kill_delay, "15s")
         self.assertEqual(self.harness.model.unit.status, ActiveStatus())
+
+    def test_given_invalid_backoff_delay_when_config_changed_then_status_is_blocked(self):
+        self.harness.update_config(key_values={"workload-backoff-delay": "soon"})
+
+        self.assertEqual(
+            self.harness.model.unit.status,
+            BlockedStatus(
+                "The following configurations are not valid: ['workload-backoff-delay']"
+            ),
+        )
+
+    def test_given_fresh_charm_when_update_status_then_service_patcher_is_not_constructed(self):
+        harness = testing.Harness(UDROperatorCharm)
+        self.addCleanup(harness.cleanup)
+        harness.begin()
+        lightkube_modules = [
+            name
+            for name in sys.modules
+            if name.split(".")[0] in ["lightkube", "kubernetes_placement"]
+            or name.endswith(".kubernetes_service_patch")
+        ]
+
+        with patch.dict(sys.modules):
+            for name in lightkube_modules:
+                del sys.modules[name]
+            harness.charm.on.update_status.emit()
+
+            self.assertNotIn("lightkube", sys.modules)
+        self.assertNotIn("_service_patcher", harness.charm.__dict__)
+
+    @patch("charm.check_output")
+    def test_given_workload_is_running_when_nrf_url_changes_then_config_file_is_updated(
+        self, patch_check_output
+    ):
+        patch_check_output.return_value = b"1.2.3.4"
+        self.harness.update_config(key_values={"restart-health-timeout": 0})
+        self._database_is_available()
+        self._nrf_is_available()
+        self.harness.container_pebble_ready("udr")
+        new_nrf_url = f"http://127.0.0.1:{self._local_listener()}"
+
+        nrf_relation_id = self.harness.model.get_relation("nrf").id
+        self.harness.update_relation_data(nrf_relation_id, "nrf-operator", {"url": new_nrf_url})
+
+        content = self.harness.model.unit.get_container("udr").pull("/etc/udr/udrcfg.conf").read()
+        self.assertIn(f"nrfUri: {new_nrf_url}", content)
+        self.assertEqual(self.harness.model.unit.status, ActiveStatus())
+
+    def test_given_template_is_unchanged_when_load_template_then_compiled_template_is_reused(self):
+        path = Path(self.harness.charm.charm_dir) / "src" / "templates" / "udrcfg.conf.j2"
+
+        self.assertIs(load_template(path), load_template(path))
+
+    def test_given_nested_changes_when_config_diff_then_changed_sections_are_returned(self):
+        current = {"configuration": {"nrfUri": "http://a", "sbi": {"port": 1}}, "info": {}}
+        desired = {"configuration": {"nrfUri": "http://b", "sbi": {"port": 1}}, "logger": {}}
+
+        self.assertEqual(config_diff(current, desired), ["configuration.nrfUri", "info", "logger"])
+
+    @patch("charm.check_output")
+    def test_given_fast_consistency_profile_when_pebble_ready_then_options_are_in_database_url(
+        self, patch_check_output
+    ):
+        patch_check_output.return_value = b"1.2.3.4"
+        self.harness.update_config(
+            key_values={"db-consistency-profile": "fast", "db-write-timeout": 500}
+        )
+        database_url = self._database_is_available()
+        self._nrf_is_available()
+
+        self.harness.container_pebble_ready("udr")
+
+        content = self.harness.model.unit.get_container("udr").pull("/etc/udr/udrcfg.conf").read()
+        self.assertIn(
+            f"url: {database_url}/?w=1&journal=false&readConcernLevel=local&wtimeoutMS=500",
+            content,
+        )
+
+    def test_given_invalid_consistency_profile_when_config_changed_then_status_is_blocked(self):
+        self.harness.update_config(key_values={"db-consistency-profile": "eventual"})
+
+        self.assertEqual(
+            self.harness.model.unit.status,
+            BlockedStatus(
+                "The following configurations are not valid: ['db-consistency-profile']"
+            ),
+        )
+
+    @patch("charm.check_output")
+    def test_given_compressors_when_pebble_ready_then_compression_options_are_in_database_url(
+        self, patch_check_output
+    ):
+        patch_check_output.return_value = b"1.2.3.4"
+        self.harness.update_config(
+            key_values={"db-compressors": "zstd,snappy,zlib", "db-zlib-compression-level": 6}
+        )
+        database_url = self._database_is_available()
+        self._nrf_is_available()
+
+        self.harness.container_pebble_ready("udr")
+
+        content = self.harness.model.unit.get_container("udr").pull("/etc/udr/udrcfg.conf").read()
+        self.assertIn(
+            f"url: {database_url}/?compressors=zstd,snappy,zlib&zlibCompressionLevel=6", content
+        )
+
+    @patch("pymongo.MongoClient")
+    def test_given_database_is_available_when_get_db_compression_action_then_negotiated_compressor_is_returned(  # noqa: E501
+        self, patch_mongo_client
+    ):
+        self.harness.update_config(key_values={"db-compressors": "zstd,snappy"})
+        self._database_is_available()
+        replies = {
+            "hello": {"isWritablePrimary": True, "compression": ["snappy"]},
+            "serverStatus": {
+                "network": {
+                    "compression": {
+                        "snappy": {"compressor": {"bytesIn": 0, "bytesOut": 0}},
+                        "zstd": {"compressor": {"bytesIn": 4000, "bytesOut": 1000}},
+                    }
+                }
+            },
+        }
+        command = patch_mongo_client.return_value.__enter__.return_value.admin.command
+        command.side_effect = lambda name, **kwargs: replies[name]
+
+        output = self.harness.run_action("get-db-compression")
+
+        command.assert_any_call("hello", compression=["zstd", "snappy"])
+        self.assertEqual(output.results["configured"], "zstd,snappy")
+        self.assertEqual(output.results["negotiated"], "snappy")
+        self.assertEqual(
+            output.results["server-stats"]["zstd"], {"bytes-in": 4000, "bytes-out": 1000}
+        )
+
+    def test_given_database_is_not_available_when_get_db_compression_action_then_action_fails(
+        self,
+    ):
+        with self.assertRaises(testing.ActionFailed):
+            self.harness.run_action("get-db-compression")
+
+    def _authentication_database_is_available(self) -> str:
+        database_url = f"mongodb://127.0.0.1:{self._local_listener()}"
+        relation_id = self.harness.add_relation("database", "mongodb-auth")
+        self.harness.add_relation_unit(relation_id=relation_id, remote_unit_name="mongodb-auth/0")
+        self.harness.update_relation_data(
+            relation_id=relation_id,
+            app_or_unit="mongodb-auth",
+            key_values={"username": "user2", "password": "password2", "uris": database_url},
+        )
+        return database_url
+
+    @patch("charm.check_output")
+    def test_given_authentication_database_related_first_when_pebble_ready_then_each_database_gets_its_own_url_and_pool(  # noqa: E501
+        self, patch_check_output
+    ):
+        patch_check_output.return_value = b"1.2.3.4"
+        self.harness.update_config(
+            key_values={
+                "authentication-db-application": "mongodb-auth",
+                "db-max-pool-size": 100,
+                "authentication-db-max-pool-size": 300,
+            }
+        )
+        authentication_database_url = self._authentication_database_is_available()
+        database_url = self._database_is_available()
+        self._nrf_is_available()
+
+        self.harness.container_pebble_ready("udr")
+
+        content = self.harness.model.unit.get_container("udr").pull("/etc/udr/udrcfg.conf").read()
+        self.assertEqual(
+            yaml.safe_load(content)["configuration"]["mongodb"],
+            {
+                "name": "free5gc",
+                "url": f"{database_url}/?maxPoolSize=100",
+                "authKeysDbName": "free5gc",
+                "authUrl": f"{authentication_database_url}/?maxPoolSize=300",
+            },
+        )
+
+    def test_given_authentication_database_is_not_created_when_pebble_ready_then_status_is_waiting(  # noqa: E501
+        self,
+    ):
+        self.harness.update_config(key_values={"authentication-db-application": "mongodb-auth"})
+        self._database_is_available()
+        self._nrf_is_available()
+        relation_id = self.harness.add_relation("database", "mongodb-auth")
+        self.harness.add_relation_unit(relation_id=relation_id, remote_unit_name="mongodb-auth/0")
+
+        self.harness.container_pebble_ready("udr")
+
+        self.assertEqual(
+            self.harness.model.unit.status,
+            WaitingStatus("Waiting for authentication database to be ready"),
+        )
+
+    def test_given_two_database_relations_and_no_authentication_application_when_pebble_ready_then_status_is_blocked(  # noqa: E501
+        self,
+    ):
+        self._database_is_available()
+        self._authentication_database_is_available()
+        self._nrf_is_available()
+
+        self.harness.container_pebble_ready("udr")
+
+        self.assertEqual(
+            self.harness.model.unit.status,
+            BlockedStatus(
+                "Set `authentication-db-application` to tell the database relations apart"
+            ),
+        )
+
+    def test_given_authentication_application_is_not_related_when_pebble_ready_then_status_is_blocked(  # noqa: E501
+        self,
+    ):
+        self.harness.update_config(key_values={"authentication-db-application": "mongodb-auth"})
+        self._database_is_available()
+        self._nrf_is_available()
+
+        self.harness.container_pebble_ready("udr")
+
+        self.assertEqual(
+            self.harness.model.unit.status,
+            BlockedStatus("Waiting for database relation to mongodb-auth"),
+        )
+
+    def test_given_min_pool_size_above_max_pool_size_when_config_changed_then_status_is_blocked(
+        self,
+    ):
+        self.harness.update_config(
+            key_values={
+                "authentication-db-max-pool-size": 10,
+                "authentication-db-min-pool-size": 20,
+            }
+        )
+
+        self.assertEqual(
+            self.harness.model.unit.status,
+            BlockedStatus(
+                "The following configurations are not valid: ['authentication-db-min-pool-size']"
+            ),
+        )
+
+    def test_given_leader_when_udr_relation_joined_then_sbi_urls_and_plmns_are_published(self):
+        self.harness.set_leader(True)
+
+        relation_id = self.harness.add_relation("udr", "udm")
+        self.harness.add_relation_unit(relation_id, "udm/0")
+
+        self.assertEqual(
+            self.harness.get_relation_data(relation_id, "udr-operator"),
+            {
+                "url": f"http://udr-operator.{self.namespace}.svc.cluster.local:29504",
+                "plmns": '[{"mcc": "208", "mnc": "93"}, {"mcc": "333", "mnc": "88"}]',
+            },
+        )
+        self.assertEqual(
+            self.harness.get_relation_data(relation_id, "udr-operator/0"),
+            {
+                "url": "http://udr-operator-0.udr-operator-endpoints."
+                f"{self.namespace}.svc.cluster.local:29504"
+            },
+        )
+
+    def test_given_non_leader_when_udr_relation_joined_then_only_unit_url_is_published(self):
+        relation_id = self.harness.add_relation("udr", "udm")
+        self.harness.add_relation_unit(relation_id, "udm/0")
+
+        self.assertEqual(self.harness.get_relation_data(relation_id, "udr-operator"), {})
+        self.assertIn("url", self.harness.get_relation_data(relation_id, "udr-operator/0"))
+
+    @classmethod
+    def setUpClass(cls):
+        cls.ca_private_key = PrivateKey.generate()
+        cls.ca = Certificate.generate_self_signed_ca(
+            CertificateRequestAttributes(common_name="ca.example.com", is_ca=True),
+            cls.ca_private_key,
+            timedelta(days=365),
+        )
+
+    def _certificate_is_available(self) -> int:
+        # Juju constructs the charm, and with it the requirer, for every hook once the relation
+        # exists, whereas Harness keeps the charm constructed before the relation.
+        self.harness.charm._certificates
+        relation_id = self.harness.add_relation("certificates", "tls-provider")
+        self.harness.add_relation_unit(relation_id, "tls-provider/0")
+        self._certificate_is_issued(relation_id)
+        return relation_id
+
+    def _certificate_signing_request(self, relation_id: int) -> CertificateSigningRequest:
+        requests = json.loads(
+            self.harness.get_relation_data(relation_id, "udr-operator/0")[
+                "certificate_signing_requests"
+            ]
+        )
+        self.assertEqual(len(requests), 1)
+        return CertificateSigningRequest.from_string(requests[0]["certificate_signing_request"])
+
+    def _certificate_is_issued(self, relation_id: int) -> Certificate:
+        csr = self._certificate_signing_request(relation_id)
+        certificate = Certificate.generate(csr, self.ca, self.ca_private_key, timedelta(days=90))
+        self.harness.update_relation_data(
+            relation_id,
+            "tls-provider",
+            {
+                "certificates": json.dumps(
+                    [
+                        {
+                            "certificate_signing_request": str(csr),
+                            "certificate": str(certificate),
+                            "ca": str(self.ca),
+                            "chain": [str(certificate), str(self.ca)],
+                        }
+                    ]
+                )
+            },
+        )
+        return certificate
+
+    @patch("charm.check_output")
+    def test_given_https_scheme_when_certificate_is_available_then_key_certificate_and_tls_config_are_pushed(  # noqa: E501
+        self, patch_check_output
+    ):
+        patch_check_output.return_value = b"1.2.3.4"
+        self.harness.update_config(key_values={"sbi-scheme": "https"})
+        self.harness.set_can_connect(container="udr", val=True)
+        self._database_is_available()
+        self._nrf_is_available()
+
+        relation_id = self._certificate_is_available()
+
+        csr = self._certificate_signing_request(relation_id)
+        hostname = f"udr-operator.{self.namespace}.svc.cluster.local"
+        self.assertEqual(csr.common_name, hostname)
+        self.assertEqual(
+            csr.sans_dns,
+            {
+                hostname,
+                f"udr-operator-0.udr-operator-endpoints.{self.namespace}.svc.cluster.local",
+            },
+        )
+        container = self.harness.model.unit.get_container("udr")
+        private_key = PrivateKey.from_string(container.pull("/etc/udr/udr.key").read())
+        self.assertTrue(csr.matches_private_key(private_key))
+        chain = container.pull("/etc/udr/udr.pem").read().split("-----END CERTIFICATE-----")
+        certificate = Certificate.from_string(chain[0] + "-----END CERTIFICATE-----")
+        self.assertEqual(certificate.common_name, hostname)
+        self.assertTrue(certificate.matches_private_key(private_key))
+        self.assertEqual(
+            Certificate.from_string(chain[1].strip() + "-----END CERTIFICATE-----"), self.ca
+        )
+        sbi = yaml.safe_load(container.pull("/etc/udr/udrcfg.conf").read())["configuration"]["sbi"]
+        self.assertEqual(sbi["scheme"], "https")
+        self.assertEqual(sbi["tls"], {"key": "/etc/udr/udr.key", "pem": "/etc/udr/udr.pem"})
+        self.assertEqual(self.harness.model.unit.status, ActiveStatus())
+
+    @patch("charm.check_output")
+    def test_given_https_scheme_and_no_certificates_relation_when_pebble_ready_then_status_is_blocked(  # noqa: E501
+        self, patch_check_output
+    ):
+        patch_check_output.return_value = b"1.2.3.4"
+        self.harness.update_config(key_values={"sbi-scheme": "https"})
+        self._database_is_available()
+        self._nrf_is_available()
+
+        self.harness.container_pebble_ready("udr")
+
+        self.assertEqual(
+            self.harness.model.unit.status,
+            BlockedStatus("Waiting for certificates relation to be created"),
+        )
+
+    @patch("charm.check_output")
+    def test_given_workload_serves_https_when_certificate_is_renewed_then_restart_lock_is_requested(  # noqa: E501
+        self, patch_check_output
+    ):
+        patch_check_output.return_value = b"1.2.3.4"
+        self.harness.update_config(key_values={"sbi-scheme": "https"})
+        peer_relation_id = self.harness.add_relation("replicas", "udr-operator")
+        self.harness.add_relation_unit(peer_relation_id, "udr-operator/1")
+        self._database_is_available()
+        self._nrf_is_available()
+        relation_id = self._certificate_is_available()
+        self.harness.container_pebble_ready("udr")
+        self.assertEqual(self.harness.model.unit.status, ActiveStatus())
+
+        renewed_certificate = self._certificate_is_issued(relation_id)
+
+        container = self.harness.model.unit.get_container("udr")
+        self.assertEqual(
+            container.pull("/etc/udr/udr.pem").read(), f"{renewed_certificate}\n{self.ca}\n"
+        )
+        self.assertEqual(
+            self.harness.model.unit.status, MaintenanceStatus("Waiting for restart lock")
+        )
+        self.assertEqual(
+            self.harness.get_relation_data(peer_relation_id, "udr-operator/0"),
+            {"state": "requested"},
+        )
+
+    def test_given_certificate_is_expiring_when_secret_expired_then_renewal_is_requested_with_same_private_key(  # noqa: E501
+        self,
+    ):
+        self.harness.update_config(key_values={"sbi-scheme": "https"})
+        relation_id = self._certificate_is_available()
+        csr = self._certificate_signing_request(relation_id)
+        private_key = self.harness.charm._certificates.private_key
+        label = f"{LIBID}-certificate-0-certificates-{csr.get_sha256_hex()}"
+        secret_info = self.harness.model.get_secret(label=label).get_info()
+
+        self.harness.trigger_secret_expiration(secret_info.id, secret_info.revision, label=label)
+
+        renewal_csr = self._certificate_signing_request(relation_id)
+        self.assertNotEqual(renewal_csr, csr)
+        self.assertTrue(renewal_csr.matches_private_key(private_key))
+
+    def test_given_https_scheme_when_udr_relation_joined_then_https_urls_are_published(self):
+        self.harness.update_config(key_values={"sbi-scheme": "https"})
+        self.harness.set_leader(True)
+
+        relation_id = self.harness.add_relation("udr", "udm")
+        self.harness.add_relation_unit(relation_id, "udm/0")
+
+        self.assertEqual(
+            self.harness.get_relation_data(relation_id, "udr-operator")["url"],
+            f"https://udr-operator.{self.namespace}.svc.cluster.local:29504",
+        )
+
+    def _kafka_topic_is_created(self, **extra_data: str) -> None:
+        kafka_relation_id = self.harness.add_relation("kafka", "kafka")
+        self.harness.add_relation_unit(kafka_relation_id, "kafka/0")
+        self.harness.update_relation_data(
+            kafka_relation_id,
+            "kafka",
+            {"username": "udr", "password": "secret", "endpoints": "10.0.0.1:9092", **extra_data},
+        )
+
+    @patch("charm.Popen")
+    @patch("charm.check_output")
+    def test_given_leader_and_change_stream_exporter_enabled_when_kafka_topic_created_then_exporter_runs_in_charm_container(  # noqa: E501
+        self, patch_check_output, patch_popen
+    ):
+        patch_check_output.return_value = b"1.2.3.4"
+        patch_popen.return_value.pid = 1234
+        self.harness.set_leader(True)
+        self.harness.update_config(key_values={"change-stream-exporter": True})
+        database_url = self._database_is_available()
+        self._nrf_is_available()
+        self.harness.container_pebble_ready("udr")
+
+        self._kafka_topic_is_created()
+
+        self.assertEqual(
+            patch_popen.call_args.args[0][1],
+            str(self.harness.charm.charm_dir / "src" / "change_stream_exporter.py"),
+        )
+        params = json.loads(patch_popen.return_value.stdin.write.call_args.args[0])
+        self.assertEqual(params["uri"], database_url)
+        self.assertEqual(params["bootstrap_servers"], "10.0.0.1:9092")
+        self.assertEqual(params["topic"], "udr-data-changes")
+        self.assertEqual(params["password"], "secret")
+        self.assertEqual(params["security_protocol"], "SASL_PLAINTEXT")
+        self.assertEqual(params["sasl_mechanism"], "SCRAM-SHA-512")
+        self.assertNotIn(
+            "secret", json.dumps(self.harness.get_container_pebble_plan("udr").to_dict())
+        )
+
+    def test_given_leader_when_kafka_relation_joins_then_producer_role_is_requested_for_topic(
+        self,
+    ):
+        self.harness.set_leader(True)
+
+        kafka_relation_id = self.harness.add_relation("kafka", "kafka")
+        self.harness.add_relation_unit(kafka_relation_id, "kafka/0")
+
+        self.assertEqual(
+            self.harness.get_relation_data(kafka_relation_id, "udr-operator"),
+            {"topic": "udr-data-changes", "extra-user-roles": "producer"},
+        )
+
+    @patch("charm.Popen")
+    @patch("charm.check_output")
+    def test_given_kafka_topic_created_when_change_stream_topic_changes_then_status_is_blocked(
+        self, patch_check_output, patch_popen
+    ):
+        patch_check_output.return_value = b"1.2.3.4"
+        patch_popen.return_value.pid = 1234
+        self.harness.set_leader(True)
+        self.harness.update_config(key_values={"change-stream-exporter": True})
+        self._database_is_available()
+        self._nrf_is_available()
+        self.harness.container_pebble_ready("udr")
+        self._kafka_topic_is_created()
+
+        self.harness.update_config(key_values={"change-stream-topic": "udr-changes"})
+
+        self.assertEqual(
+            self.harness.model.unit.status,
+            BlockedStatus("The following configurations are not valid: ['change-stream-topic']"),
+        )
+        params = json.loads(patch_popen.return_value.stdin.write.call_args.args[0])
+        self.assertEqual(params["topic"], "udr-data-changes")
+
+    @patch("charm.Popen")
+    @patch("charm.check_output")
+    def test_given_kafka_tls_is_enabled_when_kafka_topic_created_then_exporter_uses_sasl_ssl(
+        self, patch_check_output, patch_popen
+    ):
+        patch_check_output.return_value = b"1.2.3.4"
+        patch_popen.return_value.pid = 1234
+        self.harness.set_leader(True)
+        self.harness.update_config(key_values={"change-stream-exporter": True})
+        self._database_is_available()
+        self._nrf_is_available()
+        self.harness.container_pebble_ready("udr")
+
+        self._kafka_topic_is_created(tls="enabled", **{"tls-ca": "-----BEGIN CERTIFICATE-----"})
+
+        params = json.loads(patch_popen.return_value.stdin.write.call_args.args[0])
+        self.assertEqual(params["security_protocol"], "SASL_SSL")
+        self.assertEqual(params["tls_ca"], "-----BEGIN CERTIFICATE-----")
+
+    @patch("charm.Popen")
+    @patch("charm.check_output")
+    def test_given_unit_is_not_leader_when_kafka_topic_created_then_exporter_is_not_started(
+        self, patch_check_output, patch_popen
+    ):
+        patch_check_output.return_value = b"1.2.3.4"
+        self.harness.update_config(key_values={"change-stream-exporter": True})
+        self._database_is_available()
+        self._nrf_is_available()
+        self.harness.container_pebble_ready("udr")
+
+        self._kafka_topic_is_created()
+
+        patch_popen.assert_not_called()
+
+    @patch("os.kill")
+    @patch("charm.Popen")
+    @patch("charm.check_output")
+    def test_given_exporter_runs_when_leadership_is_lost_then_exporter_is_stopped_on_update_status(  # noqa: E501
+        self, patch_check_output, patch_popen, patch_kill
+    ):
+        patch_check_output.return_value = b"1.2.3.4"
+        patch_popen.return_value.pid = 1234
+        self.harness.set_leader(True)
+        self.harness.update_config(key_values={"change-stream-exporter": True})
+        self._database_is_available()
+        self._nrf_is_available()
+        self.harness.container_pebble_ready("udr")
+        self._kafka_topic_is_created()
+        self.harness.set_leader(False)
+
+        with patch("pathlib.Path.read_bytes", return_value=b"python3\0change_stream_exporter.py"):
+            self.harness.charm.on.update_status.emit()
+
+        patch_kill.assert_called_with(1234, signal.SIGTERM)
+        self.assertEqual(self.harness.charm._stored.exporter_pid, 0)
+
+    @patch("charm.Popen")
+    @patch("charm.check_output")
+    def test_given_change_stream_exporter_disabled_when_kafka_topic_created_then_exporter_is_not_started(  # noqa: E501
+        self, patch_check_output, patch_popen
+    ):
+        patch_check_output.return_value = b"1.2.3.4"
+        self.harness.set_leader(True)
+        self._database_is_available()
+        self._nrf_is_available()
+        self.harness.container_pebble_ready("udr")
+
+        self._kafka_topic_is_created()
+
+        patch_popen.assert_not_called()
+
+    @patch("charm.purge_stale")
+    @patch("pymongo.MongoClient")
+    def test_given_retention_rules_when_purge_stale_action_in_dry_run_then_report_is_returned(
+        self, patch_mongo_client, patch_purge_stale
+    ):
+        self.harness.update_config(
+            key_values={"retention-rules": "subscriptionData.sdmSubscriptions=30d"}
+        )
+        self._database_is_available()
+        patch_purge_stale.return_value = {
+            "subscriptionData.sdmSubscriptions": {"documents": 12, "reclaimed-bytes": 2400}
+        }
+
+        output = self.harness.run_action("purge-stale", {"dry-run": True})
+
+        self.assertEqual(patch_purge_stale.call_args.kwargs["dry_run"], True)
+        self.assertEqual(
+            patch_purge_stale.call_args.kwargs["rules"],
+            {"subscriptionData.sdmSubscriptions": timedelta(days=30)},
+        )
+        self.assertEqual(
+            json.loads(output.results["collections"]),
+            {"subscriptionData.sdmSubscriptions": {"documents": 12, "reclaimed-bytes": 2400}},
+        )
+        self.assertEqual(output.results["documents"], 12)
+        self.assertEqual(output.results["reclaimed-bytes"], 2400)
+
+    def test_given_no_retention_rules_when_purge_stale_action_then_action_fails(self):
+        with self.assertRaises(testing.ActionFailed):
+            self.harness.run_action("purge-stale")
+
+    @patch("charm.purge_stale")
+    @patch("pymongo.MongoClient")
+    def test_given_leader_with_retention_rules_when_update_status_twice_then_purge_runs_once_per_interval(  # noqa: E501
+        self, patch_mongo_client, patch_purge_stale
+    ):
+        self.harness.set_leader(True)
+        self.harness.update_config(key_values={"retention-rules": "policyData.subsToNotify=7d"})
+        self._database_is_available()
+        patch_purge_stale.return_value = {}
+
+        self.harness.charm.on.update_status.emit()
+        self.harness.charm.on.update_status.emit()
+
+        patch_purge_stale.assert_called_once()
+        self.assertEqual(patch_purge_stale.call_args.kwargs["time_budget"], 10)
+
+    @patch("charm.shard_collections")
+    @patch("charm.is_sharded_cluster")
+    @patch("pymongo.MongoClient")
+    def test_given_sharded_cluster_when_shard_collections_action_then_report_is_returned(
+        self, _, patch_is_sharded_cluster, patch_shard_collections
+    ):
+        self._database_is_available()
+        patch_is_sharded_cluster.return_value = True
+        patch_shard_collections.return_value = {
+            "collections": {"policyData.ues.amData": "pre-split"},
+            "shards": 2,
+            "balancer-mode": "full",
+            "balancer-running": False,
+        }
+
+        output = self.harness.run_action("shard-collections")
+
+        self.assertEqual(
+            json.loads(output.results["collections"]), {"policyData.ues.amData": "pre-split"}
+        )
+        self.assertEqual(output.results["shards"], 2)
+        self.assertEqual(output.results["balancer-mode"], "full")
+        self.assertEqual(patch_shard_collections.call_args.kwargs["chunks_per_shard"], 2)
+
+    @patch("charm.is_sharded_cluster")
+    @patch("pymongo.MongoClient")
+    def test_given_replica_set_when_shard_collections_action_then_action_fails(
+        self, _, patch_is_sharded_cluster
+    ):
+        self._database_is_available()
+        patch_is_sharded_cluster.return_value = False
+
+        with self.assertRaises(testing.ActionFailed) as context:
+            self.harness.run_action("shard-collections")
+
+        self.assertIn("not a sharded cluster", context.exception.message)
+
+    @patch("charm.shard_collections")
+    @patch("charm.is_sharded_cluster")
+    @patch("pymongo.MongoClient")
+    def test_given_auto_shard_when_database_is_created_then_collections_are_sharded_once(
+        self, _, patch_is_sharded_cluster, patch_shard_collections
+    ):
+        patch_is_sharded_cluster.return_value = True
+        self.harness.set_leader(True)
+        self.harness.update_config(key_values={"db-auto-shard": True})
+
+        self._database_is_available()
+        self.harness.update_config(key_values={"db-initial-chunks-per-shard": 4})
+
+        patch_shard_collections.assert_called_once()
+
+    @patch("charm.working_set_report")
+    @patch("pymongo.MongoClient")
+    def test_given_database_is_available_when_db_stats_action_then_working_set_is_reported(
+        self, patch_mongo_client, patch_working_set_report
+    ):
+        self._database_is_available()
+        patch_working_set_report.return_value = {
+            "collections": {"policyData.ues.amData": {"documents": 10}},
+            "total-data-size": 1000,
+            "total-index-size": 3072,
+            "cache-size": 2000,
+            "working-set-fits-in-cache": False,
+            "unused-indexes": ["policyData.ues.amData.ueId_1"],
+            "collection-scans": {},
+        }
+
+        output = self.harness.run_action("db-stats")
+
+        self.assertEqual(output.results["working-set-fits-in-cache"], False)
+        self.assertEqual(output.results["unused-indexes"], "policyData.ues.amData.ueId_1")
+        self.assertEqual(
+            json.loads(output.results["collections"]),
+            {"policyData.ues.amData": {"documents": 10}},
+        )
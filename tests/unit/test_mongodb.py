@@ -0,0 +1,297 @@
+# Copyright 2022 Guillaume Belanger
+# See LICENSE file for licensing details.
+
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock, patch
+
+from bson import ObjectId
+
+from mongodb import (
+    parse_retention_rules,
+    purge_stale,
+    shard_collections,
+    stale_filter,
+    warm_up,
+    with_options,
+    working_set_report,
+)
+
+
+class FakeCursor(list):
+    def limit(self, count):
+        return FakeCursor(self[:count])
+
+
+class FakeDeleteResult:
+    def __init__(self, deleted_count):
+        self.deleted_count = deleted_count
+
+
+class FakeCollection:
+    def __init__(self, ids):
+        self.ids = list(ids)
+
+    def _stale(self, query):
+        return [_id for _id in self.ids if _id < query["_id"]["$lt"]]
+
+    def count_documents(self, query):
+        return len(self._stale(query))
+
+    def find(self, query, projection):
+        return FakeCursor({"_id": _id} for _id in self._stale(query))
+
+    def delete_many(self, query):
+        deleted = [_id for _id in self.ids if _id in query["_id"]["$in"]]
+        self.ids = [_id for _id in self.ids if _id not in deleted]
+        return FakeDeleteResult(len(deleted))
+
+
+class FakeDatabase(dict):
+    def command(self, name, collection):
+        return {"avgObjSize": 200}
+
+
+def _object_id(days_ago):
+    return ObjectId.from_datetime(datetime.now(timezone.utc) - timedelta(days=days_ago))
+
+
+class TestMongoDB(unittest.TestCase):
+    def test_given_uri_with_options_when_with_options_then_options_are_overridden(self):
+        uri = "mongodb://user:pass@h1:27017,h2:27017/free5gc?replicaSet=rs0&w=majority"
+
+        self.assertEqual(
+            with_options(uri, {"w": "1", "wtimeoutMS": "100"}),
+            "mongodb://user:pass@h1:27017,h2:27017/free5gc?replicaSet=rs0&w=1&wtimeoutMS=100",
+        )
+
+    def test_given_rules_when_parse_retention_rules_then_periods_are_returned(self):
+        self.assertEqual(
+            parse_retention_rules("a=30d, b=12h"),
+            {"a": timedelta(days=30), "b": timedelta(hours=12)},
+        )
+
+    def test_given_malformed_rule_when_parse_retention_rules_then_value_error_is_raised(self):
+        with self.assertRaises(ValueError):
+            parse_retention_rules("a=30 days")
+
+    @patch("time.sleep")
+    def test_given_stale_documents_when_purge_stale_then_they_are_removed_in_batches(
+        self, patch_sleep
+    ):
+        collection = FakeCollection(
+            [_object_id(40), _object_id(35), _object_id(31), _object_id(1)]
+        )
+        database = FakeDatabase(sdm=collection)
+
+        report = purge_stale(
+            database, {"sdm": timedelta(days=30)}, batch_size=2, batches_per_second=5
+        )
+
+        self.assertEqual(report, {"sdm": {"documents": 3, "reclaimed-bytes": 600}})
+        self.assertEqual(len(collection.ids), 1)
+        self.assertEqual(patch_sleep.call_count, 2)
+        patch_sleep.assert_called_with(0.2)
+
+    def test_given_dry_run_when_purge_stale_then_nothing_is_removed(self):
+        collection = FakeCollection([_object_id(40), _object_id(1)])
+
+        report = purge_stale(
+            FakeDatabase(sdm=collection),
+            {"sdm": timedelta(days=30)},
+            batch_size=2,
+            batches_per_second=5,
+            dry_run=True,
+        )
+
+        self.assertEqual(report["sdm"]["documents"], 1)
+        self.assertEqual(len(collection.ids), 2)
+
+    def test_given_subscription_collection_when_stale_filter_then_expiry_time_is_compared(
+        self,
+    ):
+        cutoff = datetime(2026, 9, 19, 10, 30, tzinfo=timezone.utc)
+
+        self.assertEqual(
+            stale_filter("subscriptionData.sdmSubscriptions", cutoff),
+            {
+                "$or": [
+                    {"expires": {"$lt": cutoff}},
+                    {"expires": {"$lt": "2026-09-19T10:30:00Z"}},
+                ]
+            },
+        )
+        self.assertEqual(
+            stale_filter("policyData.subsToNotify", cutoff)["$or"][1],
+            {"expiry": {"$lt": "2026-09-19T10:30:00Z"}},
+        )
+
+    def test_given_collection_without_expiry_when_stale_filter_then_creation_time_is_compared(
+        self,
+    ):
+        cutoff = datetime(2026, 9, 19, 10, 30, tzinfo=timezone.utc)
+
+        self.assertEqual(
+            stale_filter("subscriptionData.contextData.amf3gppAccess", cutoff),
+            {"_id": {"$lt": ObjectId.from_datetime(cutoff)}},
+        )
+
+    def test_given_subscription_collection_when_purge_stale_then_expired_subscriptions_are_counted(  # noqa: E501
+        self,
+    ):
+        database = MagicMock()
+        database.command.return_value = {"avgObjSize": 200}
+        collection = database["subscriptionData.eeSubscriptions"]
+        collection.count_documents.return_value = 4
+
+        report = purge_stale(
+            database,
+            {"subscriptionData.eeSubscriptions": timedelta(days=1)},
+            batch_size=2,
+            batches_per_second=5,
+            dry_run=True,
+        )
+
+        query = collection.count_documents.call_args.args[0]
+        self.assertEqual([list(condition) for condition in query["$or"]], [["expiry"], ["expiry"]])
+        self.assertEqual(report["subscriptionData.eeSubscriptions"]["documents"], 4)
+
+    def test_given_collections_when_working_set_report_then_sizes_and_unused_indexes_are_reported(
+        self,
+    ):
+        client = MagicMock()
+        database = client.__getitem__.return_value
+        database.name = "free5gc"
+        database.list_collection_names.return_value = ["policyData.ues.amData"]
+        database.command.return_value = {
+            "count": 10,
+            "avgObjSize": 100,
+            "size": 1000,
+            "storageSize": 4096,
+            "indexSizes": {"_id_": 2048, "ueId_1": 1024},
+        }
+        database.__getitem__.return_value.aggregate.side_effect = [
+            [
+                {"name": "_id_", "accesses": {"ops": 0}},
+                {"name": "ueId_1", "accesses": {"ops": 0}},
+            ],
+            [{"_id": "free5gc.policyData.ues.amData", "count": 3}],
+        ]
+        client.admin.command.return_value = {
+            "wiredTiger": {"cache": {"maximum bytes configured": 2000}}
+        }
+
+        report = working_set_report(
+            client, "free5gc", ["policyData.ues.amData", "policyData.ues.smData"]
+        )
+
+        self.assertEqual(list(report["collections"]), ["policyData.ues.amData"])
+        self.assertEqual(report["collections"]["policyData.ues.amData"]["documents"], 10)
+        self.assertEqual(report["total-data-size"], 1000)
+        self.assertEqual(report["total-index-size"], 3072)
+        self.assertFalse(report["working-set-fits-in-cache"])
+        self.assertEqual(report["unused-indexes"], ["policyData.ues.amData.ueId_1"])
+        self.assertEqual(report["collection-scans"], {"policyData.ues.amData": 3})
+
+    def test_given_sharded_and_empty_collections_when_shard_collections_then_only_unsharded_ones_are_sharded(  # noqa: E501
+        self,
+    ):
+        client = MagicMock()
+        client.admin.command.side_effect = lambda command, *args: {
+            "listShards": {"shards": [{"_id": "shard0"}, {"_id": "shard1"}]},
+            "balancerStatus": {"mode": "full", "inBalancerRound": False},
+        }.get(command if isinstance(command, str) else "shardCollection", {"ok": 1})
+        client.config.__getitem__.return_value.find.return_value = [
+            {"_id": "free5gc.policyData.ues.amData"}
+        ]
+        database = client.__getitem__.return_value
+        database.__getitem__.return_value.estimated_document_count.side_effect = [0, 5]
+
+        report = shard_collections(
+            client,
+            "free5gc",
+            ["policyData.ues.amData", "policyData.ues.smData", "subscriptionData.eeSubscriptions"],
+            chunks_per_shard=4,
+        )
+
+        self.assertEqual(
+            report["collections"],
+            {
+                "policyData.ues.amData": "already-sharded",
+                "policyData.ues.smData": "pre-split",
+                "subscriptionData.eeSubscriptions": "sharded",
+            },
+        )
+        self.assertEqual(report["shards"], 2)
+        self.assertEqual(report["balancer-mode"], "full")
+        self.assertFalse(report["balancer-running"])
+        client.admin.command.assert_any_call("enableSharding", "free5gc")
+        client.admin.command.assert_any_call(
+            {
+                "shardCollection": "free5gc.policyData.ues.smData",
+                "key": {"ueId": "hashed"},
+                "numInitialChunks": 8,
+            }
+        )
+        client.admin.command.assert_any_call(
+            {
+                "shardCollection": "free5gc.subscriptionData.eeSubscriptions",
+                "key": {"ueId": "hashed"},
+            }
+        )
+        database.__getitem__.return_value.create_index.assert_called_once_with(
+            [("ueId", "hashed")]
+        )
+
+    def test_given_collections_when_warm_up_then_most_used_indexes_are_scanned_before_documents(
+        self,
+    ):
+        client = MagicMock()
+        database = client.__getitem__.return_value
+        database.list_collection_names.return_value = ["policyData.ues.amData"]
+        collection = database.__getitem__.return_value
+        collection.aggregate.return_value = [
+            {"name": "_id_", "key": {"_id": 1}, "accesses": {"ops": 1}},
+            {"name": "ueId_1", "key": {"ueId": 1}, "accesses": {"ops": 50}},
+        ]
+        collection.find.return_value = [{}, {}, {}]
+        progress = MagicMock()
+
+        report = warm_up(
+            client,
+            "free5gc",
+            ["policyData.ues.amData", "policyData.ues.smData"],
+            concurrency=1,
+            time_budget=10,
+            progress=progress,
+        )
+
+        self.assertEqual(report, {"indexes": 2, "collections": 1, "entries": 9, "complete": True})
+        self.assertEqual(
+            [call.kwargs for call in collection.find.call_args_list],
+            [
+                {
+                    "filter": {},
+                    "projection": {"_id": 0, "ueId": 1},
+                    "hint": "ueId_1",
+                    "batch_size": 1000,
+                },
+                {"filter": {}, "projection": {"_id": 1}, "hint": "_id_", "batch_size": 1000},
+                {"filter": {}, "batch_size": 1000},
+            ],
+        )
+        progress.assert_called_with(3, 3)
+
+    def test_given_time_budget_is_spent_when_warm_up_then_scans_stop(self):
+        client = MagicMock()
+        database = client.__getitem__.return_value
+        database.list_collection_names.return_value = ["policyData.ues.amData"]
+        database.__getitem__.return_value.aggregate.return_value = []
+        database.__getitem__.return_value.find.return_value = [{}, {}, {}]
+
+        report = warm_up(
+            client, "free5gc", ["policyData.ues.amData"], concurrency=2, time_budget=0
+        )
+
+        self.assertEqual(report["entries"], 0)
+        self.assertFalse(report["complete"])
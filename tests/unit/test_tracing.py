@@ -0,0 +1,151 @@
+# Copyright 2022 Guillaume Belanger
+# See LICENSE file for licensing details.
+
+import json
+import os
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from typing import List
+from unittest.mock import patch
+
+from ops.charm import CharmBase
+from ops.testing import Harness
+
+from tracing import Tracer, traced
+
+METADATA = """
+name: traced-charm
+requires:
+  tracing:
+    interface: tracing
+"""
+
+
+class TracedCharm(CharmBase):
+    def __init__(self, *args):
+        super().__init__(*args)
+        self._tracer = Tracer(self, relation_name="tracing")
+        self.framework.observe(self.on.config_changed, self._on_config_changed)
+
+    def _on_config_changed(self, event):
+        with self._tracer.span("outer", option="value"):
+            self._inner()
+
+    @traced("inner")
+    def _inner(self):
+        pass
+
+
+class OTLPCollector(HTTPServer):
+    """Local stand-in of an OTLP/HTTP collector recording the exported spans."""
+
+    def __init__(self):
+        self.requests: List[dict] = []
+        collector = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):  # noqa: N802
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                collector.requests.append({"path": self.path, "body": json.loads(body)})
+                self.send_response(200)
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        super().__init__(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def spans(self) -> List[dict]:
+        return [
+            span
+            for request in self.requests
+            for resource_spans in request["body"]["resourceSpans"]
+            for scope_spans in resource_spans["scopeSpans"]
+            for span in scope_spans["spans"]
+        ]
+
+
+class TestTracing(unittest.TestCase):
+    def setUp(self):
+        self.collector = OTLPCollector()
+        self.addCleanup(self.collector.server_close)
+        self.addCleanup(self.collector.shutdown)
+        self.harness = Harness(TracedCharm, meta=METADATA)
+        self.addCleanup(self.harness.cleanup)
+        self.harness.set_leader(True)
+        self.harness.begin()
+
+    def _collector_is_related(self):
+        relation_id = self.harness.add_relation("tracing", "tempo")
+        url = f"http://127.0.0.1:{self.collector.server_port}"
+        self.harness.update_relation_data(
+            relation_id,
+            "tempo",
+            {"receivers": json.dumps([{"protocol": {"name": "otlp_http"}, "url": url}])},
+        )
+        self.harness.framework.commit()
+        self.collector.requests.clear()
+        return relation_id
+
+    def test_given_tracing_relation_when_joined_then_otlp_http_receiver_is_requested(self):
+        relation_id = self.harness.add_relation("tracing", "tempo")
+        self.harness.add_relation_unit(relation_id, "tempo/0")
+
+        self.assertEqual(
+            self.harness.get_relation_data(relation_id, "traced-charm")["receivers"],
+            '["otlp_http"]',
+        )
+
+    @patch.dict(os.environ, {"JUJU_DISPATCH_PATH": "hooks/config-changed"})
+    def test_given_collector_when_dispatch_commits_then_nested_spans_are_exported_in_one_batch(
+        self,
+    ):
+        self._collector_is_related()
+
+        self.harness.update_config({})
+        self.harness.framework.commit()
+
+        self.assertEqual(len(self.collector.requests), 1)
+        self.assertEqual(self.collector.requests[0]["path"], "/v1/traces")
+        spans = {span["name"]: span for span in self.collector.spans}
+        self.assertEqual(set(spans), {"config-changed", "outer", "inner"})
+        self.assertNotIn("parentSpanId", spans["config-changed"])
+        self.assertEqual(spans["outer"]["parentSpanId"], spans["config-changed"]["spanId"])
+        self.assertEqual(spans["inner"]["parentSpanId"], spans["outer"]["spanId"])
+        self.assertEqual(
+            spans["outer"]["attributes"], [{"key": "option", "value": {"stringValue": "value"}}]
+        )
+        self.assertEqual(len({span["traceId"] for span in spans.values()}), 1)
+
+    def test_given_collector_when_span_raises_then_error_status_is_exported(self):
+        self._collector_is_related()
+
+        with self.assertRaises(ValueError):
+            with self.harness.charm._tracer.span("failing"):
+                raise ValueError("boom")
+        self.harness.framework.commit()
+
+        (failing,) = [span for span in self.collector.spans if span["name"] == "failing"]
+        self.assertEqual(failing["status"], {"code": 2, "message": "ValueError: boom"})
+
+    def test_given_no_collector_when_dispatch_commits_then_nothing_is_recorded_or_exported(self):
+        self.harness.update_config({})
+        self.harness.framework.commit()
+
+        self.assertIs(
+            self.harness.charm._tracer.span("outer"), self.harness.charm._tracer.span("inner")
+        )
+        self.assertEqual(self.collector.requests, [])
+
+    def test_given_collector_is_removed_when_dispatch_commits_then_nothing_is_exported(self):
+        relation_id = self._collector_is_related()
+        self.harness.remove_relation(relation_id)
+
+        self.harness.update_config({})
+        self.harness.framework.commit()
+
+        self.assertFalse(self.harness.charm._tracer.enabled)
+        self.assertEqual(self.collector.requests, [])
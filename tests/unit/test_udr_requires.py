@@ -0,0 +1,101 @@
+# Copyright 2022 Guillaume Belanger
+# See LICENSE file for licensing details.
+
+import json
+import unittest
+
+from charms.udr_operator.v0.udr import UDRAvailableEvent, UDRRequires
+from ops import testing
+from ops.charm import CharmBase
+
+METADATA = """
+name: udr-requirer
+requires:
+  udr:
+    interface: udr
+"""
+
+
+class UDRRequirerCharm(CharmBase):
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.udr_requires = UDRRequires(self, "udr")
+        self.udr_urls = []
+        self.framework.observe(self.udr_requires.on.udr_available, self._on_udr_available)
+
+    def _on_udr_available(self, event: UDRAvailableEvent) -> None:
+        self.udr_urls.append(event.url)
+
+
+class TestUDRRequires(unittest.TestCase):
+    def setUp(self):
+        self.harness = testing.Harness(UDRRequirerCharm, meta=METADATA)
+        self.addCleanup(self.harness.cleanup)
+        self.harness.begin()
+
+    def _udr_relation(self) -> int:
+        relation_id = self.harness.add_relation("udr", "udr-operator")
+        self.harness.add_relation_unit(relation_id, "udr-operator/0")
+        self.harness.add_relation_unit(relation_id, "udr-operator/1")
+        return relation_id
+
+    def test_given_udr_publishes_url_when_relation_changed_then_udr_available_is_emitted(self):
+        relation_id = self._udr_relation()
+
+        self.harness.update_relation_data(
+            relation_id, "udr-operator", {"url": "http://udr-operator.whatever:29504"}
+        )
+
+        self.assertEqual(self.harness.charm.udr_urls, ["http://udr-operator.whatever:29504"])
+
+    def test_given_udr_publishes_no_url_when_relation_changed_then_udr_available_is_not_emitted(  # noqa: E501
+        self,
+    ):
+        relation_id = self._udr_relation()
+
+        self.harness.update_relation_data(relation_id, "udr-operator", {"plmns": "[]"})
+
+        self.assertEqual(self.harness.charm.udr_urls, [])
+
+    def test_given_app_data_when_get_udr_url_and_plmns_then_they_are_returned(self):
+        relation_id = self._udr_relation()
+        self.harness.update_relation_data(
+            relation_id,
+            "udr-operator",
+            {
+                "url": "http://udr-operator.whatever:29504",
+                "plmns": json.dumps([{"mcc": "208", "mnc": "93"}]),
+            },
+        )
+
+        self.assertEqual(
+            self.harness.charm.udr_requires.get_udr_url(), "http://udr-operator.whatever:29504"
+        )
+        self.assertEqual(
+            self.harness.charm.udr_requires.get_udr_plmns(), [{"mcc": "208", "mnc": "93"}]
+        )
+
+    def test_given_no_relation_when_get_udr_url_and_plmns_then_nothing_is_returned(self):
+        self.assertIsNone(self.harness.charm.udr_requires.get_udr_url())
+        self.assertEqual(self.harness.charm.udr_requires.get_udr_plmns(), [])
+        self.assertEqual(self.harness.charm.udr_requires.get_udr_unit_urls(), [])
+
+    def test_given_unit_data_when_get_udr_unit_urls_then_urls_of_units_that_set_one_are_returned(  # noqa: E501
+        self,
+    ):
+        relation_id = self._udr_relation()
+        self.harness.add_relation_unit(relation_id, "udr-operator/2")
+        for unit_number in [1, 0]:
+            self.harness.update_relation_data(
+                relation_id,
+                f"udr-operator/{unit_number}",
+                {"url": f"http://udr-operator-{unit_number}.udr-operator-endpoints:29504"},
+            )
+
+        self.assertEqual(
+            self.harness.charm.udr_requires.get_udr_unit_urls(),
+            [
+                "http://udr-operator-0.udr-operator-endpoints:29504",
+                "http://udr-operator-1.udr-operator-endpoints:29504",
+            ],
+        )